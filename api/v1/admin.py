@@ -2,19 +2,36 @@
 Admin endpoints for ThirdEye
 Provides authentication and report management for administrators
 """
-from fastapi import APIRouter, HTTPException, Depends
+import os
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from datetime import datetime
+from typing import Literal, Optional, List
 from middleware.admin_auth import (
     verify_admin_password,
     create_admin_session,
     require_admin_auth,
     revoke_admin_session,
 )
-from nodes.supabase_store import get_supabase_client
+from nodes.report_store import ADMIN_REPORT_LIST_COLUMNS, ReportFilter, get_report_store
+from nodes.violations import DETECTABLE_VIOLATIONS
+from utils.blobs import with_image_urls, with_listing_urls
+from utils.export import EXPORT_FORMATS, check_format, encode, iter_batches, resolve_columns
+from utils.report_stats import get_report_stats, invalidate_report_stats
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+ADMIN_BULK_MAX_BATCH = int(os.getenv("ADMIN_BULK_MAX_BATCH", "500"))
+
+# Column updates applied by each review action
+REVIEW_ACTIONS = {
+    "flag": {"needs_manual_verification": True},
+    "unflag": {"needs_manual_verification": False},
+    "approve": {"admin_approved": True, "admin_reviewed": True, "needs_manual_verification": False},
+    "reject": {"admin_approved": False, "admin_reviewed": True},
+}
+
 
 class LoginRequest(BaseModel):
     password: str
@@ -31,11 +48,32 @@ class LogoutRequest(BaseModel):
     token: str
 
 
-class ReportFilter(BaseModel):
-    flagged_only: Optional[bool] = None
-    has_violations: Optional[bool] = None
-    limit: Optional[int] = 50
-    offset: Optional[int] = 0
+class BulkReviewRequest(BaseModel):
+    action: Literal["flag", "unflag", "approve", "reject"]
+    ids: Optional[List[int]] = None
+    filter: Optional[ReportFilter] = None
+    cursor: Optional[str] = None
+
+
+def report_filter(
+    flagged_only: Optional[bool] = None,
+    has_violations: Optional[bool] = None,
+    pending_approval: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    category: Optional[str] = None,
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+) -> ReportFilter:
+    """ReportFilter from query parameters"""
+    return ReportFilter(
+        flagged_only=flagged_only,
+        has_violations=has_violations,
+        pending_approval=pending_approval,
+        date_from=date_from,
+        date_to=date_to,
+        category=category,
+        min_confidence=min_confidence,
+    )
 
 
 @router.post("/login")
@@ -70,49 +108,81 @@ async def admin_logout(request: LogoutRequest):
 
 @router.get("/reports")
 async def get_all_reports(
-    flagged_only: Optional[bool] = None,
-    has_violations: Optional[bool] = None,
-    limit: int = 50,
-    offset: int = 0,
+    filters: ReportFilter = Depends(report_filter),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     _token: str = Depends(require_admin_auth)
 ):
     """
-    Get all reports with optional filtering
+    Get a page of reports with optional filtering, newest first
+    date_from is inclusive and date_to exclusive; category matches any of a
+    report's violations
+    Pass the returned next_cursor back as cursor for the following page;
+    the full record comes from /admin/reports/{report_id}
     Requires admin authentication
     """
     try:
-        supabase = get_supabase_client()
-        
-        # Build query
-        query = supabase.table("violation_reports").select("*")
-        
-        # Apply filters
-        if flagged_only is True:
-            query = query.eq("needs_manual_verification", True)
-        
-        if has_violations is not None:
-            query = query.eq("is_violation", has_violations)
-        
-        # Order by most recent first
-        query = query.order("reported_timestamp", desc=True)
-        
-        # Apply pagination
-        query = query.range(offset, offset + limit - 1)
-        
-        result = query.execute()
+        # Most recent first, resuming after the cursor
+        try:
+            rows, next_cursor = await get_report_store().list_reports(ADMIN_REPORT_LIST_COLUMNS, filters, cursor, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
-            "reports": result.data,
-            "count": len(result.data),
-            "offset": offset,
-            "limit": limit
+            "reports": [with_listing_urls(row) for row in rows],
+            "count": len(rows),
+            "limit": limit,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching reports: {str(e)}")
 
 
+@router.get("/export")
+async def export_reports(
+    format: Literal["ndjson", "csv", "parquet"] = "ndjson",
+    columns: Optional[str] = Query(None, description="Comma-separated columns; all when omitted"),
+    include_images: bool = False,
+    filters: ReportFilter = Depends(report_filter),
+    _token: str = Depends(require_admin_auth)
+):
+    """
+    Stream every report matching the filters, newest first
+    Rows are read and sent in batches, so the response can cover the whole
+    table without holding it in memory
+    Requires admin authentication
+    """
+    try:
+        check_format(format)
+        selected = resolve_columns(columns.split(",") if columns else None, include_images)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    batches = iter_batches(get_report_store(), selected, filters)
+    filename = f"violation_reports-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        encode(format, batches, selected),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/categories")
+async def get_categories(_token: str = Depends(require_admin_auth)):
+    """
+    Violation categories accepted by the category filter
+    Requires admin authentication
+    """
+    return {
+        "success": True,
+        "categories": sorted({v["category"] for v in DETECTABLE_VIOLATIONS})
+    }
+
+
 @router.get("/reports/{report_id}")
 async def get_report_detail(
     report_id: int,
@@ -123,15 +193,14 @@ async def get_report_detail(
     Requires admin authentication
     """
     try:
-        supabase = get_supabase_client()
-        result = supabase.table("violation_reports").select("*").eq("id", report_id).execute()
+        report = await get_report_store().get(report_id)
         
-        if not result.data:
+        if report is None:
             raise HTTPException(status_code=404, detail="Report not found")
         
         return {
             "success": True,
-            "report": result.data[0]
+            "report": with_image_urls(report)
         }
         
     except HTTPException:
@@ -151,19 +220,18 @@ async def flag_report(
     Requires admin authentication
     """
     try:
-        supabase = get_supabase_client()
-        
-        result = supabase.table("violation_reports").update({
+        rows = await get_report_store().update([report_id], {
             "needs_manual_verification": flagged
-        }).eq("id", report_id).execute()
+        })
+        invalidate_report_stats()
         
-        if not result.data:
+        if not rows:
             raise HTTPException(status_code=404, detail="Report not found")
         
         return {
             "success": True,
             "message": f"Report {'flagged' if flagged else 'unflagged'} successfully",
-            "report": result.data[0]
+            "report": rows[0]
         }
         
     except HTTPException:
@@ -183,8 +251,6 @@ async def approve_report(
     Requires admin authentication
     """
     try:
-        supabase = get_supabase_client()
-        
         update_data = {
             "admin_approved": approved,
             "admin_reviewed": True
@@ -194,15 +260,16 @@ async def approve_report(
         if approved:
             update_data["needs_manual_verification"] = False
         
-        result = supabase.table("violation_reports").update(update_data).eq("id", report_id).execute()
+        rows = await get_report_store().update([report_id], update_data)
+        invalidate_report_stats()
         
-        if not result.data:
+        if not rows:
             raise HTTPException(status_code=404, detail="Report not found")
         
         return {
             "success": True,
             "message": f"Report {'approved' if approved else 'rejected'} successfully",
-            "report": result.data[0]
+            "report": rows[0]
         }
         
     except HTTPException:
@@ -211,45 +278,73 @@ async def approve_report(
         raise HTTPException(status_code=500, detail=f"Error approving report: {str(e)}")
 
 
-@router.get("/stats")
-async def get_stats(_token: str = Depends(require_admin_auth)):
+@router.post("/reports/bulk")
+async def bulk_review(
+    request: BulkReviewRequest,
+    _token: str = Depends(require_admin_auth)
+):
     """
-    Get overall statistics for the admin dashboard
+    Flag, unflag, approve or reject many reports in one update
+    Takes either ids or a filter. A filter is applied to its matches in
+    batches of ADMIN_BULK_MAX_BATCH, newest first; repeat the request with
+    the returned next_cursor until it comes back null
     Requires admin authentication
     """
+    if (request.ids is None) == (request.filter is None):
+        raise HTTPException(status_code=400, detail="Provide either ids or filter")
+    if request.ids is not None and len(request.ids) > ADMIN_BULK_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {ADMIN_BULK_MAX_BATCH} ids per request")
+    
     try:
-        supabase = get_supabase_client()
+        store = get_report_store()
         
-        # Get total reports
-        total_result = supabase.table("violation_reports").select("id", count="exact").execute()
-        total_reports = total_result.count or 0
+        next_cursor = None
+        if request.filter is not None:
+            # Walk the matches by cursor so rows that still match after the update are not revisited
+            try:
+                matched, next_cursor = await store.list_reports(
+                    "id,reported_timestamp", request.filter, request.cursor, ADMIN_BULK_MAX_BATCH
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            ids = [row["id"] for row in matched]
+        else:
+            ids = list(dict.fromkeys(request.ids))
         
-        # Get reports with violations
-        violations_result = supabase.table("violation_reports").select("id", count="exact").eq("is_violation", True).execute()
-        reports_with_violations = violations_result.count or 0
+        updated = set()
+        if ids:
+            rows = await store.update(ids, REVIEW_ACTIONS[request.action], columns="id")
+            updated = {row["id"] for row in rows}
+            invalidate_report_stats()
         
-        # Get flagged reports
-        flagged_result = supabase.table("violation_reports").select("id", count="exact").eq("needs_manual_verification", True).execute()
-        flagged_reports = flagged_result.count or 0
-        
-        # Get approved reports
-        approved_result = supabase.table("violation_reports").select("id", count="exact").eq("admin_approved", True).execute()
-        approved_reports = approved_result.count or 0
-        
-        # Get pending approval (violations that haven't been reviewed)
-        pending_result = supabase.table("violation_reports").select("id", count="exact").eq("is_violation", True).eq("admin_reviewed", False).execute()
-        pending_approval = pending_result.count or 0
+        return {
+            "success": True,
+            "action": request.action,
+            "updated": len(updated),
+            "next_cursor": next_cursor,
+            "results": [
+                {"id": report_id, "status": "updated" if report_id in updated else "not_found"}
+                for report_id in ids
+            ]
+        }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating reports: {str(e)}")
+
+
+@router.get("/stats")
+async def get_stats(_token: str = Depends(require_admin_auth)):
+    """
+    Get overall statistics for the admin dashboard
+    Served from a short-lived cache that report writes invalidate
+    Requires admin authentication
+    """
+    try:
         return {
             "success": True,
-            "stats": {
-                "total_reports": total_reports,
-                "reports_with_violations": reports_with_violations,
-                "flagged_reports": flagged_reports,
-                "reports_without_violations": total_reports - reports_with_violations,
-                "approved_reports": approved_reports,
-                "pending_approval": pending_approval
-            }
+            "stats": await get_report_stats(get_report_store())
         }
         
     except Exception as e:
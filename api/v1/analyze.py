@@ -1,61 +1,210 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-import base64
+from fastapi import APIRouter, BackgroundTasks, File, Query, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import json
+from typing import AsyncIterator, Literal, Optional
 from langchain_core.runnables import RunnableLambda
-from nodes.vision import analyse_image
-from nodes.violations import match_violations
-from nodes.supabase_store import store_report
+from nodes.vision import analyse_image, aanalyse_image
+from nodes.violations import match_violations, amatch_violations
+from nodes.supabase_store import ReportResult, store_report, astore_report
+from nodes.summarizer import astream_summary
+from utils.images import NormalizedImage, normalize_image
+from utils.jobs import get_job_store
 
 router = APIRouter(prefix="/analyze")
 
+ANALYSIS_STAGES = ["vision", "violations", "storage"]
+
+
+def build_analysis_chain(data_uri: str, job_id: Optional[str] = None, plate_crop_uri: Optional[str] = None):
+    """
+    Build the vision -> violations -> storage chain used by the web upload.
+    When job_id is given, each stage reports its progress to the job store.
+    """
+    jobs = get_job_store() if job_id else None
+
+    def mark(stage: str, status: str):
+        if jobs:
+            jobs.set_stage(job_id, stage, status)
+
+    def staged(stage: str, func, afunc):
+        def run(data):
+            mark(stage, "running")
+            out = func(data)
+            mark(stage, "done")
+            return out
+
+        async def arun(data):
+            # Job stores may make network calls (Supabase); keep them off the event loop
+            await asyncio.to_thread(mark, stage, "running")
+            out = await afunc(data)
+            await asyncio.to_thread(mark, stage, "done")
+            return out
+
+        return RunnableLambda(run, afunc=arun, name=stage)
+
+    def analyse_with_context(image_url: str):
+        result = analyse_image(image_url, plate_crop_uri)
+        return {
+            "analysis": result,
+            "reporter_phone": None,
+            "reported_image": data_uri,
+        }
+
+    async def aanalyse_with_context(image_url: str):
+        result = await aanalyse_image(image_url, plate_crop_uri)
+        return {
+            "analysis": result,
+            "reporter_phone": None,
+            "reported_image": data_uri,
+        }
+
+    def add_violations(data: dict):
+        violations = match_violations(data["analysis"])
+        return {**data, "violations": violations}
+
+    async def aadd_violations(data: dict):
+        violations = await amatch_violations(data["analysis"])
+        return {**data, "violations": violations}
+
+    return (
+        staged("vision", analyse_with_context, aanalyse_with_context)
+        | staged("violations", add_violations, aadd_violations)
+        | staged("storage", store_report, astore_report)
+    )
+
+
+def format_analysis_result(report_result: ReportResult) -> dict:
+    return {
+        **report_result.analysis.model_dump(),
+        "violations": [v.model_dump() for v in report_result.violations],
+        "report_id": report_result.report_id,
+        "report_success": report_result.success,
+    }
+
+
+async def run_analysis_job(job_id: str, data_uri: str, plate_crop_uri: Optional[str] = None):
+    jobs = get_job_store()
+    try:
+        report_result = await build_analysis_chain(data_uri, job_id, plate_crop_uri).ainvoke(data_uri)
+        await asyncio.to_thread(jobs.succeed, job_id, format_analysis_result(report_result))
+    except Exception as e:
+        await asyncio.to_thread(jobs.fail, job_id, f"Error processing image: {str(e)}")
+
 
 @router.post("")
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    mode: Literal["sync", "async"] = Query("sync"),
+):
     """
     Analyze an uploaded image for traffic violations using the same structure
     as the WhatsApp bot chain, and store the report.
     Returns structured data suitable for the web UI.
+
+    With mode=async the request returns a job id immediately; poll
+    GET /api/v1/analyze/{job_id} for stage progress and the final result.
+    Job state lives in the JOB_STORE backend, which is the shared Supabase
+    table when Supabase is configured, so any instance can answer the poll.
+    The job itself still runs in a background task of the submitting
+    invocation, within its time limit.
     """
     try:
         if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
 
         contents = await file.read()
-        b64 = base64.b64encode(contents).decode("utf-8")
-        data_uri = f"data:{file.content_type};base64,{b64}"
-
-        def analyse_with_context(image_url: str):
-            result = analyse_image(image_url)
-            return {
-                "analysis": result,
-                "reporter_phone": None,
-                "reported_image": data_uri,
-            }
-
-        def add_violations(data: dict):
-            violations = match_violations(data["analysis"])
-            return {**data, "violations": violations}
+        # Downsizing and re-encoding is CPU-bound; keep it off the event loop
+        image = await asyncio.to_thread(normalize_image, contents, file.content_type)
+        data_uri = image.data_uri
 
-        chain = (
-            RunnableLambda(analyse_with_context)
-            | RunnableLambda(add_violations)
-            | RunnableLambda(store_report)
-        )
+        if mode == "async":
+            job = await asyncio.to_thread(get_job_store().create, ANALYSIS_STAGES)
+            background_tasks.add_task(run_analysis_job, job.id, data_uri, image.plate_crop_uri)
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "success": True,
+                    "job_id": job.id,
+                    "status": job.status,
+                    "status_url": f"/api/v1/analyze/{job.id}",
+                },
+            )
 
-        report_result = chain.invoke(data_uri)
+        report_result = await build_analysis_chain(data_uri, plate_crop_uri=image.plate_crop_uri).ainvoke(data_uri)
 
         return JSONResponse(
             content={
                 "success": True,
-                "result": {
-                    **report_result.analysis.model_dump(),
-                    "violations": [v.model_dump() for v in report_result.violations],
-                    "report_id": report_result.report_id,
-                    "report_success": report_result.success,
-                },
+                "result": format_analysis_result(report_result),
             }
         )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_analysis(image: NormalizedImage) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for each stage of the pipeline as it completes,
+    followed by the summary streamed token by token
+    """
+    yield _sse("accepted", {"bytes": image.bytes, "width": image.width, "height": image.height})
+    try:
+        analysis = await aanalyse_image(image.data_uri, image.plate_crop_uri)
+        yield _sse("analysis", analysis.model_dump())
+
+        violations = await amatch_violations(analysis)
+        yield _sse("violations", {"violations": [v.model_dump() for v in violations]})
+
+        report_result = await astore_report({
+            "analysis": analysis,
+            "violations": violations,
+            "reporter_phone": None,
+            "reported_image": image.data_uri,
+        })
+        yield _sse("report", {"report_id": report_result.report_id, "report_success": report_result.success})
+
+        summary = []
+        async for token in astream_summary(report_result):
+            summary.append(token)
+            yield _sse("summary", {"text": token})
+
+        yield _sse("done", {"result": {**format_analysis_result(report_result), "summary": "".join(summary)}})
+    except Exception as e:
+        yield _sse("error", {"detail": f"Error processing image: {str(e)}"})
+
+
+@router.post("/stream")
+async def analyze_image_stream(file: UploadFile = File(...)):
+    """
+    Analyze an uploaded image and stream stage results as Server-Sent Events:
+    accepted, analysis, violations, report, summary (repeated), then done or error
+    """
+    if not file.content_type or not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+
+    contents = await file.read()
+    image = await asyncio.to_thread(normalize_image, contents, file.content_type)
+    return StreamingResponse(
+        stream_analysis(image),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{job_id}")
+async def get_analysis_job(job_id: str):
+    """
+    Status, per-stage progress and (once finished) the result of an async analysis job
+    """
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "job": job.model_dump()}
@@ -1,8 +1,47 @@
-from fastapi import APIRouter
+import asyncio
+from fastapi import APIRouter, Depends
+from middleware.admin_auth import require_metrics_auth
+from nodes.report_store import REPORT_COLUMNS, REPORT_STORE, get_report_store
+from nodes.violations import MATCH_STATS
+from nodes.violation_rules import RULE_STATS
+from utils.analysis_cache import get_analysis_cache
+from utils.idempotency import get_idempotency_store
+from utils.llm_cache import llm_cache_stats
+from utils.work_queue import get_work_queue
 
 router = APIRouter(prefix="/health")
 
 
+# The bare liveness check stays public for load balancers and uptime probes;
+# the detailed routes expose queue, cache and schema internals and need a token
 @router.get("")
 async def health():
     return {"status": "ok"}
+
+
+@router.get("/queue")
+async def queue_health(_token: str = Depends(require_metrics_auth)):
+    queue = get_work_queue()
+    # stats() runs several SQLite queries; keep them off the event loop
+    return {"status": "ok", "queue": await asyncio.to_thread(queue.stats) if queue else None}
+
+
+@router.get("/webhook")
+async def webhook_health(_token: str = Depends(require_metrics_auth)):
+    return {"status": "ok", "idempotency": await asyncio.to_thread(get_idempotency_store().stats)}
+
+
+@router.get("/cache")
+async def cache_health(_token: str = Depends(require_metrics_auth)):
+    return {"status": "ok", "analysis_cache": get_analysis_cache().stats(), "llm_cache": llm_cache_stats()}
+
+
+@router.get("/matching")
+async def matching_health(_token: str = Depends(require_metrics_auth)):
+    return {"status": "ok", "violation_matching": MATCH_STATS.stats(), "violation_rules": RULE_STATS.stats()}
+
+
+@router.get("/schema")
+async def schema_health(_token: str = Depends(require_metrics_auth)):
+    columns = await asyncio.to_thread(get_report_store().columns)
+    return {"status": "ok", "report_store": REPORT_STORE, "missing_columns": sorted(set(REPORT_COLUMNS) - columns)}
@@ -0,0 +1,26 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from utils.blobs import KEY_PATTERN, content_type_for, get_blob_store
+
+router = APIRouter(prefix="/images", tags=["images"])
+
+# Keys are content hashes, so a URL never changes what it points to
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@router.get("/{key:path}")
+async def get_image(key: str, request: Request):
+    match = KEY_PATTERN.match(key)
+    if match is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = f'"{match.group(2)}"'
+    headers = {"Cache-Control": IMMUTABLE, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    data = await asyncio.to_thread(get_blob_store().get, key)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(content=data, media_type=content_type_for(key), headers=headers)
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from middleware.admin_auth import require_metrics_auth
+from nodes.violations import MATCH_STATS
+from nodes.violation_rules import RULE_STATS
+from utils.analysis_cache import get_analysis_cache
+from utils.idempotency import get_idempotency_store
+from utils.llm_cache import llm_cache_stats
+from utils.metrics import render_prometheus
+from utils.report_stats import REPORT_STATS
+from utils.work_queue import get_work_queue
+
+router = APIRouter(prefix="/metrics")
+
+# Component stats() sources folded into the exposition as gauges
+STATS_SOURCES = {
+    "violation_matching": lambda: MATCH_STATS.stats(),
+    "violation_rules": lambda: RULE_STATS.stats(),
+    "analysis_cache": lambda: get_analysis_cache().stats(),
+    "llm_cache": llm_cache_stats,
+    "idempotency": lambda: get_idempotency_store().stats(),
+    "queue": lambda: get_work_queue().stats() if get_work_queue() else {},
+    "report_stats": lambda: REPORT_STATS.stats(),
+}
+
+
+def collect_stats() -> dict[str, dict]:
+    components = {}
+    for name, source in STATS_SOURCES.items():
+        try:
+            components[name] = source()
+        except Exception:
+            # One unavailable backend should not blank the whole scrape
+            continue
+    return components
+
+
+@router.get("", response_class=PlainTextResponse)
+def metrics(_token: str = Depends(require_metrics_auth)):
+    """Prometheus text exposition of stage, model and component metrics"""
+    return PlainTextResponse(render_prometheus(collect_stats()), media_type="text/plain; version=0.0.4")
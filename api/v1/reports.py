@@ -1,16 +1,21 @@
+from typing import Optional
 from fastapi import APIRouter, Query
 from fastapi.responses import JSONResponse
-from nodes.supabase_store import get_supabase_client
+from nodes.report_store import REPORT_LIST_COLUMNS, get_report_store
+from utils.blobs import with_listing_urls
 
 router = APIRouter(prefix="/reports")
 
 
 @router.get("")
-async def list_reports(limit: int = Query(100, ge=1, le=1000)):
+async def list_reports(limit: int = Query(100, ge=1, le=500), cursor: Optional[str] = None):
+    # The body stays a plain list; the cursor for the next page travels in X-Next-Cursor.
+    # limit stays under the PostgREST max-rows cap, or the look-ahead row (and the cursor) is lost
     try:
-        sb = get_supabase_client()
-        res = sb.table("violation_reports").select("*").order("reported_timestamp", desc=True).limit(limit).execute()
-        data = res.data or []
-        return JSONResponse(content=data)
+        rows, next_cursor = await get_report_store().list_reports(REPORT_LIST_COLUMNS, cursor=cursor, limit=limit)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return JSONResponse(content=[with_listing_urls(row) for row in rows], headers=headers)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -1,7 +1,12 @@
+import asyncio
+
 from fastapi import APIRouter, Request, BackgroundTasks
 from fastapi.responses import PlainTextResponse
 from middleware import verify_webhook_token
-from utils.whatsapp import handle_image
+from utils.idempotency import get_idempotency_store
+from utils.whatsapp import process_image
+from utils.work_queue import get_work_queue
+from utils.worker import WHATSAPP_IMAGE_JOB, WORKER_MODE, drain_queue
 
 router = APIRouter(prefix="/webhook/whatsapp")
 
@@ -15,6 +20,9 @@ async def verify_webhook(request: Request):
 @router.post("")
 async def receive_webhook(request: Request, background_tasks: BackgroundTasks):
     body = await request.json()
+    queue = get_work_queue()
+    seen = get_idempotency_store()
+    enqueued = 0
     
     entries = body.get("entry", [])
     for entry in entries:
@@ -27,8 +35,30 @@ async def receive_webhook(request: Request, background_tasks: BackgroundTasks):
                 
                 wa_id = msg.get("from")
                 media_id = msg["image"].get("id")
+                if not (wa_id and media_id):
+                    continue
+                
+                # Meta redelivers payloads it thinks were not acknowledged.
+                # The stores do blocking I/O (SQLite or Supabase); keep it off the event loop
+                key = f"whatsapp:{msg['id']}" if msg.get("id") else None
+                if key and not await asyncio.to_thread(seen.claim, key):
+                    continue
                 
-                if wa_id and media_id:
-                    background_tasks.add_task(handle_image, wa_id, media_id)
+                if queue is None:
+                    # No writable queue (e.g. serverless); process after responding
+                    background_tasks.add_task(process_image, wa_id, media_id)
+                    continue
+                try:
+                    await asyncio.to_thread(queue.enqueue, WHATSAPP_IMAGE_JOB, {"wa_id": wa_id, "media_id": media_id})
+                except Exception:
+                    # Not handed off: let Meta's redelivery of this message through
+                    if key:
+                        await asyncio.to_thread(seen.release, key)
+                    raise
+                enqueued += 1
+    
+    # Without a separate worker process, drain the queue here after responding
+    if enqueued and WORKER_MODE == "inline":
+        background_tasks.add_task(drain_queue)
     
     return {"status": "ok"}
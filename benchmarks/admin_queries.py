@@ -0,0 +1,182 @@
+"""
+Admin listing queries on a large synthetic violation_reports table
+
+Builds a SQLite copy of the table and times the queries get_all_reports
+issues (same filters, same keyset cursor shape, same ordering) for the first
+page and for a page --depth pages in, before and after creating the SQLite
+report store's copies of the ADMIN_MIGRATION.md indexes. SQLite has no GIN
+index, so the category filter is only a baseline here. Also shows how many pending items the old approach
+(fetch the newest 100, filter in the browser) could see.
+
+Usage: python -m benchmarks.admin_queries [--rows 200000] [--page-size 50] [--depth 200]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from nodes.report_store import SQLITE_INDEXES
+from nodes.violations import DETECTABLE_VIOLATIONS
+
+COLUMNS = (
+    "id, reported_timestamp, license_plate, violations, confidence_score, short_description, "
+    "is_violation, title, needs_manual_verification, admin_reviewed, admin_approved"
+)
+
+def build(path: str, rows: int, seed: int = 7) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE violation_reports ("
+        "id INTEGER PRIMARY KEY, reported_timestamp TEXT NOT NULL, license_plate TEXT, violations TEXT, "
+        "confidence_score REAL, short_description TEXT, is_violation INTEGER, title TEXT, "
+        "needs_manual_verification INTEGER, admin_reviewed INTEGER, admin_approved INTEGER, "
+        "detailed_description TEXT, reported_image TEXT)"
+    )
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+
+    def row(i: int):
+        is_violation = rng.random() < 0.8
+        confidence = round(rng.random(), 3)
+        # Older reports have mostly been reviewed; the queue is the recent tail
+        reviewed = is_violation and rng.random() < (0.98 if i < rows * 0.9 else 0.3)
+        violation = rng.choice(DETECTABLE_VIOLATIONS)
+        violations = [{"id": violation["id"], "name": violation["name"], "category": violation["category"]}]
+        return (
+            (start + timedelta(seconds=i * 90 + rng.randrange(60))).isoformat(),
+            f"KA{i % 100:02d}AB{i % 10000:04d}",
+            json.dumps(violations if is_violation else []),
+            confidence,
+            "Synthetic report",
+            int(is_violation),
+            violation["name"] if is_violation else "No violation",
+            int(is_violation and confidence < 0.6),
+            int(reviewed),
+            int(reviewed and rng.random() < 0.7),
+            "Synthetic detailed description " * 8,
+            f"images/{i:064x}.jpg",
+        )
+
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO violation_reports (reported_timestamp, license_plate, violations, confidence_score, "
+        "short_description, is_violation, title, needs_manual_verification, admin_reviewed, admin_approved, "
+        "detailed_description, reported_image) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (row(i) for i in range(rows)),
+    )
+    conn.execute("COMMIT")
+    return conn
+
+
+def filters(conn: sqlite3.Connection) -> dict[str, tuple[str, tuple]]:
+    """The WHERE clauses _apply_filters produces, keyed by filter"""
+    newest = conn.execute("SELECT MAX(reported_timestamp) FROM violation_reports").fetchone()[0]
+    range_end = datetime.fromisoformat(newest) - timedelta(days=30)
+    range_start = range_end - timedelta(days=30)
+    return {
+        "none": ("1 = 1", ()),
+        "pending_approval": ("is_violation = 1 AND admin_reviewed = 0", ()),
+        "flagged_only": ("needs_manual_verification = 1", ()),
+        "has_violations": ("is_violation = 1", ()),
+        "date_range (30 days)": (
+            "reported_timestamp >= ? AND reported_timestamp < ?",
+            (range_start.isoformat(), range_end.isoformat()),
+        ),
+        "min_confidence=0.95": ("confidence_score >= ?", (0.95,)),
+        "category=Parking": (
+            "EXISTS (SELECT 1 FROM json_each(violations) WHERE json_extract(value, '$.category') = ?)",
+            ("Parking",),
+        ),
+    }
+
+
+def page(conn, where: str, params: tuple, size: int, cursor=None) -> list:
+    sql = f"SELECT {COLUMNS} FROM violation_reports WHERE {where}"
+    if cursor:
+        # Same shape as utils.pagination.apply_cursor
+        sql += " AND reported_timestamp <= ? AND (reported_timestamp < ? OR (reported_timestamp = ? AND id < ?))"
+        params = params + (cursor[0], cursor[0], cursor[0], cursor[1])
+    sql += " ORDER BY reported_timestamp DESC, id DESC LIMIT ?"
+    return conn.execute(sql, params + (size + 1,)).fetchall()
+
+
+def deep_cursor(conn, where: str, params: tuple, size: int, depth: int):
+    row = conn.execute(
+        f"SELECT reported_timestamp, id FROM violation_reports WHERE {where} "
+        "ORDER BY reported_timestamp DESC, id DESC LIMIT 1 OFFSET ?",
+        params + (size * depth - 1,),
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def measure(conn, size: int, depth: int, repeat: int) -> dict[str, tuple[float, float]]:
+    results = {}
+    for name, (where, params) in filters(conn).items():
+        cursor = deep_cursor(conn, where, params, size, depth)
+        first = timed(lambda: page(conn, where, params, size), repeat)
+        deep = timed(lambda: page(conn, where, params, size, cursor), repeat) if cursor else float("nan")
+        results[name] = (first, deep)
+    return results
+
+
+def run(path: str, args) -> None:
+    started = time.perf_counter()
+    conn = build(path, args.rows)
+    print(f"built {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+    pending_total = conn.execute(
+        "SELECT COUNT(*) FROM violation_reports WHERE is_violation = 1 AND admin_reviewed = 0"
+    ).fetchone()[0]
+    newest = conn.execute(
+        "SELECT is_violation, admin_reviewed FROM violation_reports ORDER BY reported_timestamp DESC, id DESC LIMIT 100"
+    ).fetchall()
+    visible = sum(1 for is_violation, reviewed in newest if is_violation and not reviewed)
+    print(f"client-side pending filter: {visible} of {pending_total} pending reports visible in the newest 100\n")
+
+    before = measure(conn, args.page_size, args.depth, args.repeat)
+    for statement in SQLITE_INDEXES:
+        conn.execute(statement)
+    conn.execute("ANALYZE")
+    after = measure(conn, args.page_size, args.depth, args.repeat)
+
+    print(f"{'filter':22} {'first page ms':>24} {f'page {args.depth} ms':>24}")
+    print(f"{'':22} {'no index':>11} {'indexed':>12} {'no index':>11} {'indexed':>12}")
+    for name in before:
+        (f0, d0), (f1, d1) = before[name], after[name]
+        print(f"{name:22} {f0:11.2f} {f1:12.2f} {d0:11.2f} {d1:12.2f}")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=200, help="page number for the deep-page timing")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="thirdeye-admin-queries-")
+    try:
+        run(os.path.join(scratch, "reports.sqlite3"), args)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
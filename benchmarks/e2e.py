@@ -0,0 +1,229 @@
+"""
+Offline end-to-end benchmark for the analyze, webhook and admin endpoints
+
+Runs the ASGI app in-process against the fakes in benchmarks.fakes: no
+Google, Supabase or Meta credentials are needed. Each scenario fires
+--requests requests at --concurrency and reports p50/p95/p99 latency and
+requests per second. For the webhook scenario a worker pool drains the queue
+alongside, and the time until every reply reaches the Graph stub is reported
+as end-to-end throughput.
+
+Results are written to benchmarks/results/ and compared against the previous
+run of the same scenario.
+
+Usage: python -m benchmarks.e2e [--scenario all] [--requests 200] [--concurrency 20]
+"""
+import os
+import tempfile
+
+# Queue, job and idempotency settings are read at import; point them at a
+# scratch directory before the app is imported
+_SCRATCH = tempfile.mkdtemp(prefix="thirdeye-e2e-")
+os.environ.update({
+    "QUEUE_PATH": os.path.join(_SCRATCH, "queue.sqlite3"),
+    "BLOB_STORE": "local",
+    "BLOB_PATH": os.path.join(_SCRATCH, "blobs"),
+    "JOB_STORE": "memory",
+    "IDEMPOTENCY_STORE": "memory",
+    "WORKER_MODE": "external",
+    "QUEUE_POLL_SECONDS": "0.05",
+    "WABA_TOKEN": "bench",
+    "WABA_PHONE_NUMBER_ID": "1000",
+})
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from benchmarks.fakes import SAMPLE_IMAGE, GraphStub, install, seed_reports
+
+RESULTS_DIR = Path(__file__).parent / "results"
+SCENARIOS = ["analyze", "webhook", "admin"]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def summarize(latencies: list[float], errors: int, wall: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        "rps": round(len(values) / wall, 2) if wall else 0.0,
+    }
+
+
+async def drive(n: int, concurrency: int, request: Callable[[int], Awaitable[httpx.Response]]) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(n))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                res = await request(i)
+                res.raise_for_status()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def bench_analyze(client: httpx.AsyncClient, args) -> dict:
+    def upload(i: int):
+        return client.post(
+            "/api/v1/analyze",
+            files={"file": ("sample.jpg", SAMPLE_IMAGE + i.to_bytes(4, "big"), "image/jpeg")},
+        )
+
+    return {"POST /api/v1/analyze": await drive(args.requests, args.concurrency, upload)}
+
+
+def _webhook_payload(i: int) -> dict:
+    message = {"id": f"wamid.bench.{i}", "from": f"9190000{i:05d}", "type": "image", "image": {"id": f"media{i}"}}
+    return {"entry": [{"changes": [{"value": {"messages": [message]}}]}]}
+
+
+async def bench_webhook(client: httpx.AsyncClient, args, graph: GraphStub) -> dict:
+    from utils.worker import run_worker
+
+    sent_before = graph.sent
+    worker = asyncio.create_task(run_worker(concurrency=args.concurrency))
+    start = time.perf_counter()
+    try:
+        acks = await drive(args.requests, args.concurrency, lambda i: client.post("/api/v1/webhook/whatsapp", json=_webhook_payload(i)))
+        deadline = time.perf_counter() + args.timeout
+        while graph.sent - sent_before < args.requests - acks["errors"] and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        wall = time.perf_counter() - start
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    delivered = graph.sent - sent_before
+    return {
+        "POST /api/v1/webhook/whatsapp": acks,
+        "webhook to reply": {
+            "requests": args.requests,
+            "delivered": delivered,
+            "seconds": round(wall, 3),
+            "rps": round(delivered / wall, 2) if wall else 0.0,
+        },
+    }
+
+
+async def bench_admin(client: httpx.AsyncClient, args, db) -> dict:
+    seed_reports(db, args.seed_reports)
+    from middleware.admin_auth import ADMIN_PASSWORD
+
+    login = await client.post("/api/v1/admin/login", json={"password": ADMIN_PASSWORD})
+    login.raise_for_status()
+    headers = {"Authorization": f"Bearer {login.json()['token']}"}
+    ids = [row["id"] for row in db.tables["violation_reports"]]
+
+    # Walk the listing once so the timed requests can hit pages at every depth
+    cursors = [None]
+    while True:
+        page = await client.get("/api/v1/admin/reports", params={"limit": 50, "cursor": cursors[-1]}, headers=headers)
+        next_cursor = page.json().get("next_cursor")
+        if not next_cursor:
+            break
+        cursors.append(next_cursor)
+
+    endpoints = {
+        "GET /api/v1/admin/reports": lambda i: client.get("/api/v1/admin/reports", params={"limit": 50, "cursor": cursors[i % len(cursors)]}, headers=headers),
+        "GET /api/v1/admin/reports/{id}": lambda i: client.get(f"/api/v1/admin/reports/{ids[i % len(ids)]}", headers=headers),
+        "PATCH /api/v1/admin/reports/{id}/approve": lambda i: client.patch(f"/api/v1/admin/reports/{ids[i % len(ids)]}/approve", params={"approved": i % 2 == 0}, headers=headers),
+        "GET /api/v1/admin/stats": lambda i: client.get("/api/v1/admin/stats", headers=headers),
+        "GET /api/v1/reports": lambda i: client.get("/api/v1/reports", params={"limit": 100}),
+    }
+    return {name: await drive(args.requests, args.concurrency, request) for name, request in endpoints.items()}
+
+
+def _previous(scenario: str) -> Optional[dict]:
+    runs = sorted(RESULTS_DIR.glob(f"{scenario}-*.json"))
+    return json.loads(runs[-1].read_text()) if runs else None
+
+
+def report(scenario: str, results: dict, previous: Optional[dict]) -> None:
+    print(f"\n== {scenario} ==")
+    before = (previous or {}).get("results", {})
+    for name, stats in results.items():
+        line = "  ".join(f"{k}={v}" for k, v in stats.items())
+        print(f"{name:42} {line}")
+        old = before.get(name)
+        if old and "p50_ms" in stats and old.get("p50_ms"):
+            print(f"{'':42} vs previous: p50 {stats['p50_ms'] - old['p50_ms']:+.2f} ms, "
+                  f"p95 {stats['p95_ms'] - old['p95_ms']:+.2f} ms, rps {stats['rps'] - old['rps']:+.2f}")
+
+
+def save(scenario: str, results: dict, args) -> Path:
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = RESULTS_DIR / f"{scenario}-{stamp}.json"
+    path.write_text(json.dumps({"scenario": scenario, "timestamp": stamp, "config": vars(args), "results": results}, indent=2))
+    return path
+
+
+async def run(args):
+    with GraphStub(args.graph_latency) as graph:
+        db = install(args.vision_latency, args.llm_latency, args.embed_latency, args.db_latency, graph.url)
+        from server import app
+
+        scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            for scenario in scenarios:
+                if scenario == "analyze":
+                    results = await bench_analyze(client, args)
+                elif scenario == "webhook":
+                    results = await bench_webhook(client, args, graph)
+                else:
+                    results = await bench_admin(client, args, db)
+                previous = _previous(scenario)
+                report(scenario, results, previous)
+                if not args.no_save:
+                    print(f"saved to {save(scenario, results, args)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS + ["all"], default="all")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--vision-latency", type=float, default=0.8, help="fake vision model latency (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake validator/summary latency (s)")
+    parser.add_argument("--embed-latency", type=float, default=0.1, help="fake embeddings latency (s)")
+    parser.add_argument("--db-latency", type=float, default=0.03, help="in-memory Supabase latency per query (s)")
+    parser.add_argument("--graph-latency", type=float, default=0.05, help="Graph API stub latency (s)")
+    parser.add_argument("--seed-reports", type=int, default=2000, help="reports seeded for the admin scenario")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Offline evaluation of the violation rule engine
+
+Runs the labelled cases in benchmarks/data/rule_eval_cases.json through the
+catalogue rules and compares every accept/reject decision with the expected
+verdict. Escalated candidates and the validator-only baseline are scored with
+the per-candidate validator's verdicts on every case, recorded once from real
+calls in benchmarks/data/rule_eval_verdicts.json together with the validator
+model. --live calls the validator instead and --record (re)writes that file
+from the live run; re-record whenever cases are added. A missing or
+incomplete file is an error, since the comparison is meaningless without a
+verdict for every candidate; --rules-only skips it and reports the rules alone.
+Reports agreement, validator calls with and without rules, and per-rule hits.
+
+Usage: python -m benchmarks.eval_rules [--cases PATH] [--verdicts PATH] [--live [--record] | --rules-only]
+"""
+import argparse
+import json
+from collections import Counter
+from pathlib import Path
+
+from config import VIOLATION_VALIDATOR_MODEL
+from nodes.violation_rules import evaluate
+from nodes.violations import DETECTABLE_VIOLATIONS, resolve_violation, validate_violation
+from nodes.vision import ImageAnalysisResult
+
+DEFAULT_CASES = Path(__file__).parent / "data" / "rule_eval_cases.json"
+DEFAULT_VERDICTS = Path(__file__).parent / "data" / "rule_eval_verdicts.json"
+
+
+def _load_verdicts(path: Path, keys: list[str]) -> dict[str, bool]:
+    if not path.exists():
+        raise SystemExit(f"{path} not found; record the validator baseline with --live --record, or pass --rules-only")
+    recorded = json.loads(path.read_text())
+    missing = [k for k in keys if k not in recorded["verdicts"]]
+    if missing:
+        raise SystemExit(f"{path} has no verdict for {len(missing)} candidates ({', '.join(missing[:5])}); re-record with --live --record")
+    if recorded["validator"] != VIOLATION_VALIDATOR_MODEL:
+        print(f"note: verdicts were recorded with {recorded['validator']}, the validator is now {VIOLATION_VALIDATOR_MODEL}")
+    return recorded["verdicts"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=Path, default=DEFAULT_CASES)
+    parser.add_argument("--verdicts", type=Path, default=DEFAULT_VERDICTS, help="recorded validator verdicts")
+    parser.add_argument("--live", action="store_true", help="call the real validator for escalations and the baseline")
+    parser.add_argument("--record", action="store_true", help="with --live, save the verdicts to --verdicts")
+    parser.add_argument("--rules-only", action="store_true", help="score only the candidates the rules settle")
+    args = parser.parse_args()
+    if args.record and not args.live:
+        parser.error("--record needs --live")
+    if args.rules_only and args.live:
+        parser.error("--rules-only and --live are exclusive")
+
+    cases = json.loads(args.cases.read_text())
+    keys = [f"{case['id']}:{name}" for case in cases for name in case["labels"]]
+    recorded = {} if args.live or args.rules_only else _load_verdicts(args.verdicts, keys)
+    verdicts: dict[str, bool] = {}
+    rules_by_id = {v["id"]: v.get("rules") for v in DETECTABLE_VIOLATIONS}
+
+    hits: Counter[str] = Counter()
+    settled = settled_correct = 0
+    total = rules_correct = baseline_correct = 0
+    calls_without_rules = calls_with_rules = 0
+    mistakes = []
+
+    for case in cases:
+        analysis = ImageAnalysisResult.model_validate(case["analysis"])
+        for name, expected in case["labels"].items():
+            candidate = resolve_violation(name)
+            decision = evaluate(rules_by_id.get(candidate.id), candidate.name, analysis)
+            hits[f"{candidate.name}: {decision.decision} ({decision.reason})"] += 1
+            total += 1
+            calls_without_rules += 1
+
+            key = f"{case['id']}:{name}"
+            if args.live:
+                validator_verdict = verdicts[key] = validate_violation(candidate, analysis)
+            else:
+                validator_verdict = recorded.get(key)
+            # None only with --rules-only, which prints no accuracy
+            if validator_verdict is not None:
+                baseline_correct += validator_verdict == expected
+
+            if decision.decision == "escalate":
+                calls_with_rules += 1
+                verdict = validator_verdict
+            else:
+                settled += 1
+                verdict = decision.decision == "accept"
+                settled_correct += verdict == expected
+                if verdict != expected:
+                    mistakes.append(f"{case['id']}: {name} -> {decision.decision} ({decision.reason}), expected {expected}")
+            if verdict is not None:
+                rules_correct += verdict == expected
+
+    if args.record:
+        recording = {"validator": VIOLATION_VALIDATOR_MODEL, "verdicts": verdicts}
+        args.verdicts.write_text(json.dumps(recording, indent=2, sort_keys=True) + "\n")
+        print(f"recorded {len(verdicts)} validator verdicts to {args.verdicts}")
+
+    print(f"candidates:                 {total}")
+    print(f"settled by rules:           {settled} ({settled / total:.0%})")
+    print(f"rule agreement on settled:  {settled_correct}/{settled}")
+    if not args.rules_only:
+        print(f"accuracy validator only:    {baseline_correct / total:.1%}")
+        print(f"accuracy rules + validator: {rules_correct / total:.1%}")
+    print(f"per-candidate validations:  {calls_without_rules} -> {calls_with_rules}")
+    print()
+    print("per-rule hits:")
+    for key, count in sorted(hits.items()):
+        print(f"  {count:3}  {key}")
+    if mistakes:
+        print()
+        print("disagreements:")
+        for m in mistakes:
+            print(f"  {m}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,542 @@
+"""
+Offline stand-ins for Google, Supabase and the WhatsApp Graph API
+
+- FakeChatModel: plugs into utils.lazy via set_model_factories, sleeps for a
+  configurable latency and answers with canned ImageAnalysisResult, validator
+  and summary outputs, including usage metadata for the metrics layer.
+- SlowFakeEmbeddings: deterministic embeddings with a per-call latency.
+- InMemorySupabase: the subset of the supabase-py query builder the app uses,
+  plus rpc() for the Postgres functions in FUNCTIONS.
+- GraphStub: a local HTTP server answering media lookups, media downloads
+  and message sends.
+
+install() wires all of them into the app modules.
+"""
+import asyncio
+import json
+import re
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from postgrest.exceptions import APIError
+
+from nodes.vision import ImageAnalysisResult
+
+CASES = Path(__file__).parent / "data" / "rule_eval_cases.json"
+
+# Smallest valid JPEG-ish payload is enough: normalization passes undecodable bytes through
+SAMPLE_IMAGE = b"\xff\xd8\xff\xe0" + b"\x00" * 256 + b"\xff\xd9"
+
+
+def sample_analyses() -> list[ImageAnalysisResult]:
+    return [ImageAnalysisResult.model_validate(case["analysis"]) for case in json.loads(CASES.read_text())]
+
+
+def _text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in message.content)
+
+
+class FakeChatModel(BaseChatModel):
+    model_id: str = "fake"
+    latency: float = 0.0
+    analyses: list[ImageAnalysisResult] = []
+    summary: str = "A vehicle was reported for a traffic violation and the report was recorded."
+    # Set by with_structured_output; selects the canned answer
+    schema_name: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    @property
+    def _identifying_params(self) -> dict:
+        # Part of the LLM string, so the response cache tells schemas apart
+        return {"model": self.model_id, "schema": self.schema_name}
+
+    def _content(self, messages: list[BaseMessage]) -> str:
+        prompt = _text(messages[-1])
+        if self.schema_name == "ImageAnalysisResult":
+            # The same image always gets the same analysis
+            analysis = self.analyses[zlib.crc32(str(messages[-1].content).encode()) % len(self.analyses)]
+            return analysis.model_dump_json()
+        if self.schema_name == "ValidationResult":
+            return json.dumps({"is_valid": True})
+        if self.schema_name == "BatchValidationResult":
+            ids = [int(i) for i in re.findall(r'"id": (\d+)', prompt.split("Candidate violations:", 1)[-1])]
+            return json.dumps({"verdicts": [{"id": i, "is_valid": True} for i in ids]})
+        return self.summary
+
+    def _result(self, messages: list[BaseMessage]) -> ChatResult:
+        content = self._content(messages)
+        input_tokens = sum(len(_text(m)) for m in messages) // 4
+        output_tokens = len(content) // 4
+        message = AIMessage(
+            content=content,
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def with_structured_output(self, schema, **kwargs):
+        model = self.model_copy(update={"schema_name": schema.__name__})
+        return model | RunnableLambda(lambda message: schema.model_validate_json(message.content))
+
+
+class SlowFakeEmbeddings(DeterministicFakeEmbedding):
+    latency: float = 0.0
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+
+def _sort_key(value):
+    return (value is None, value)
+
+
+_OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+
+def _json_contains(container, contained) -> bool:
+    """Postgres jsonb @> semantics"""
+    if isinstance(contained, dict):
+        return isinstance(container, dict) and all(
+            k in container and _json_contains(container[k], v) for k, v in contained.items()
+        )
+    if isinstance(contained, list):
+        return isinstance(container, list) and all(
+            any(_json_contains(item, want) for item in container) for want in contained
+        )
+    return container == contained
+
+
+def _split_terms(text: str) -> list[str]:
+    # Top-level commas only; commas inside and(...) or quoted values belong to the term
+    terms, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            terms.append(text[start:i])
+            start = i + 1
+    terms.append(text[start:])
+    return terms
+
+
+def _logic_filter(text: str):
+    """A row predicate for a PostgREST or=(...) expression, comparison operators only"""
+    tests = []
+    for term in _split_terms(text):
+        if term.startswith(("and(", "or(")):
+            group, _, inner = term.partition("(")
+            parts = [_logic_filter(t) for t in _split_terms(inner[:-1])]
+            combine = all if group == "and" else any
+            tests.append(lambda row, parts=parts, combine=combine: combine(p(row) for p in parts))
+            continue
+        column, op, value = term.split(".", 2)
+        value = value[1:-1] if value.startswith('"') else value
+
+        def test(row, column=column, compare=_OPERATORS[op], value=value):
+            actual = row.get(column)
+            if actual is None:
+                return False
+            return compare(actual, type(actual)(value) if not isinstance(actual, str) else value)
+
+        tests.append(test)
+    return lambda row: any(t(row) for t in tests)
+
+
+class InMemoryQuery:
+    def __init__(self, db: "InMemorySupabase", table: str):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.count = None
+        self.payload: Any = None
+        self.filters = []
+        self.ordering = []
+        self.bounds: Optional[tuple[int, int]] = None
+
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.columns, self.count = columns, count
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id", ignore_duplicates: bool = False, **_kwargs):
+        self.action, self.payload = "upsert", rows
+        self.conflict_key, self.ignore_duplicates = on_conflict or "id", ignore_duplicates
+        return self
+
+    def update(self, values: dict):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def _filter(self, column: str, test):
+        self.filters.append(lambda row: test(row.get(column)))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v == value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v != value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def in_(self, column, values):
+        values = list(values)
+        return self._filter(column, lambda v: v in values)
+
+    def is_(self, column, value):
+        expected = None if value in (None, "null") else value
+        return self._filter(column, lambda v: v is expected or v == expected)
+
+    def contains(self, column, value):
+        expected = json.loads(value) if isinstance(value, str) else value
+        return self._filter(column, lambda v: v is not None and _json_contains(v, expected))
+
+    def or_(self, filters: str):
+        self.filters.append(_logic_filter(filters))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, n: int):
+        self.bounds = (0, n - 1)
+        return self
+
+    def range(self, start: int, end: int):
+        self.bounds = (start, end)
+        return self
+
+    def _project(self, row: dict) -> dict:
+        if self.columns.strip() == "*":
+            return dict(row)
+        return {c.strip(): row.get(c.strip()) for c in self.columns.split(",")}
+
+    def execute(self):
+        time.sleep(self.db.latency)
+        return self._run()
+
+    def _check_columns(self):
+        """Fail like PostgREST when the query names a column the table lacks"""
+        missing = self.db.missing_columns.get(self.table)
+        if not missing:
+            return
+        if self.action in ("insert", "update"):
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            for column in sorted({c for row in payload for c in row} & missing):
+                raise APIError({"code": "PGRST204", "message": f"Could not find the '{column}' column of '{self.table}'"})
+        if self.columns.strip() != "*":
+            for column in sorted({c.strip() for c in self.columns.split(",")} & missing):
+                raise APIError({"code": "42703", "message": f"column {self.table}.{column} does not exist"})
+
+    def _run(self):
+        self._check_columns()
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table, [])
+            if self.action == "insert":
+                inserted = []
+                for row in self.payload if isinstance(self.payload, list) else [self.payload]:
+                    self.db.next_id += 1
+                    inserted.append({"id": self.db.next_id, **row})
+                rows.extend(inserted)
+                return SimpleNamespace(data=[dict(r) for r in inserted], count=None)
+            if self.action == "upsert":
+                # Like PostgREST, only rows written come back; ignored duplicates do not
+                written = []
+                for row in self.payload if isinstance(self.payload, list) else [self.payload]:
+                    existing = next((r for r in rows if r.get(self.conflict_key) == row.get(self.conflict_key)), None)
+                    if existing is None:
+                        rows.append(dict(row))
+                        written.append(dict(row))
+                    elif not self.ignore_duplicates:
+                        existing.update(row)
+                        written.append(dict(existing))
+                return SimpleNamespace(data=written, count=None)
+
+            matched = [r for r in rows if all(f(r) for f in self.filters)]
+            if self.action == "update":
+                for r in matched:
+                    r.update(self.payload)
+                return SimpleNamespace(data=[self._project(r) for r in matched], count=None)
+            if self.action == "delete":
+                doomed = {id(r) for r in matched}
+                self.db.tables[self.table] = [r for r in rows if id(r) not in doomed]
+                return SimpleNamespace(data=[dict(r) for r in matched], count=None)
+
+            for column, desc in reversed(self.ordering):
+                matched.sort(key=lambda r: _sort_key(r.get(column)), reverse=desc)
+            total = len(matched)
+            if self.bounds:
+                matched = matched[self.bounds[0]:self.bounds[1] + 1]
+            return SimpleNamespace(data=[self._project(r) for r in matched], count=total if self.count else None)
+
+
+class AsyncInMemoryQuery(InMemoryQuery):
+    async def execute(self):
+        await asyncio.sleep(self.db.latency)
+        return self._run()
+
+
+def _report_stats(tables: dict) -> dict:
+    rows = tables.get("violation_reports", [])
+    return {
+        "total_reports": len(rows),
+        "reports_with_violations": sum(1 for r in rows if r.get("is_violation") is True),
+        "flagged_reports": sum(1 for r in rows if r.get("needs_manual_verification") is True),
+        "approved_reports": sum(1 for r in rows if r.get("admin_approved") is True),
+        "pending_approval": sum(1 for r in rows if r.get("is_violation") is True and r.get("admin_reviewed") is False),
+    }
+
+
+# Postgres functions the app calls through rpc(), each over the whole table set
+FUNCTIONS = {"report_stats": _report_stats}
+
+
+class InMemoryRpc:
+    def __init__(self, db: "InMemorySupabase", name: str, params: Optional[dict] = None):
+        self.db = db
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        time.sleep(self.db.latency)
+        return self._run()
+
+    def _run(self):
+        if self.name not in self.db.functions:
+            raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{self.name}"})
+        with self.db.lock:
+            return SimpleNamespace(data=self.db.functions[self.name](self.db.tables, **self.params), count=None)
+
+
+class AsyncInMemoryRpc(InMemoryRpc):
+    async def execute(self):
+        await asyncio.sleep(self.db.latency)
+        return self._run()
+
+
+class InMemorySupabase:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        functions: Optional[dict] = None,
+        missing_columns: Optional[dict[str, set[str]]] = None,
+    ):
+        self.latency = latency
+        self.tables: dict[str, list[dict]] = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.functions = FUNCTIONS if functions is None else functions
+        # Columns each table lacks, to stand in for a database without the migrations
+        self.missing_columns = missing_columns or {}
+
+    def table(self, name: str) -> InMemoryQuery:
+        return InMemoryQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> InMemoryRpc:
+        return InMemoryRpc(self, name, params)
+
+
+class AsyncInMemorySupabase:
+    """Async view over the same tables, standing in for get_async_supabase_client"""
+
+    def __init__(self, db: InMemorySupabase):
+        self.db = db
+
+    def table(self, name: str) -> AsyncInMemoryQuery:
+        return AsyncInMemoryQuery(self.db, name)
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> AsyncInMemoryRpc:
+        return AsyncInMemoryRpc(self.db, name, params)
+
+
+class GraphStub:
+    """WhatsApp Graph API on 127.0.0.1; counts the messages it was asked to send"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                time.sleep(stub.latency)
+                parts = self.path.strip("/").split("/")
+                if parts[0] == "media" and len(parts) == 2:
+                    # Distinct bytes per media id so the analysis cache cannot short-circuit the run
+                    self._reply(200, SAMPLE_IMAGE + parts[1].encode(), "image/jpeg")
+                else:
+                    self._reply(200, json.dumps({"url": f"{stub.url}/media/{parts[-1]}"}).encode())
+
+            def do_POST(self):
+                time.sleep(stub.latency)
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.sent += 1
+                self._reply(200, json.dumps({"messages": [{"id": f"wamid.{stub.sent}"}]}).encode())
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "GraphStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def install(
+    vision_latency: float = 0.0,
+    llm_latency: float = 0.0,
+    embed_latency: float = 0.0,
+    db_latency: float = 0.0,
+    graph_url: Optional[str] = None,
+) -> InMemorySupabase:
+    """Point the app at the fakes; returns the in-memory database"""
+    import nodes.supabase_store as supabase_store
+    import nodes.violations as violations
+    import utils.whatsapp as whatsapp
+    from config import VISION_MODEL
+    from nodes.violation_index import load_or_build_index
+    from utils.lazy import embeddings_model, set_model_factories
+
+    analyses = sample_analyses()
+
+    def chat(model_id: str, **kwargs):
+        latency = vision_latency if model_id == VISION_MODEL else llm_latency
+        return FakeChatModel(model_id=model_id, latency=latency, analyses=analyses, **kwargs)
+
+    set_model_factories(chat=chat, embeddings=lambda _model_id: SlowFakeEmbeddings(size=768, latency=embed_latency))
+
+    # Build the fake index in a scratch directory so the real one under data/ is untouched
+    index_dir = Path(tempfile.mkdtemp(prefix="thirdeye-bench-"))
+    violations._VECTOR_STORE = load_or_build_index(
+        violations.get_violation_documents(),
+        embeddings_model("fake-embeddings"),
+        "fake-embeddings",
+        index_dir / "violation_embeddings.npy",
+    )
+
+    db = InMemorySupabase(db_latency)
+    async_db = AsyncInMemorySupabase(db)
+
+    async def get_async_client():
+        return async_db
+
+    # SupabaseReportStore looks both getters up on supabase_store at call time
+    supabase_store.get_supabase_client = lambda: db
+    supabase_store.get_async_supabase_client = get_async_client
+
+    if graph_url:
+        whatsapp.GRAPH_BASE = graph_url
+    return db
+
+
+def seed_reports(db: InMemorySupabase, count: int) -> None:
+    """Synthetic violation_reports rows shaped like store_report's inserts"""
+    from datetime import datetime, timedelta
+
+    from nodes.violations import DETECTABLE_VIOLATIONS
+
+    analyses = sample_analyses()
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        analysis = analyses[i % len(analyses)]
+        violation = DETECTABLE_VIOLATIONS[i % len(DETECTABLE_VIOLATIONS)]
+        rows.append({
+            "reporter_phone": f"9190000{i:05d}",
+            "reported_timestamp": (now - timedelta(minutes=i)).isoformat(),
+            "reported_image": "data:image/jpeg;base64,/9j/4AAQ",
+            "license_plate": analysis.license_plate,
+            "license_plate_confidence": analysis.license_plate_confidence,
+            "is_india_location": analysis.is_india_location,
+            "location_confidence": analysis.location_confidence,
+            "violations": [
+                {k: violation[k] for k in ("id", "name", "category", "description", "fine_amount", "section")}
+            ] if analysis.is_violation else [],
+            "confidence_score": analysis.confidence_score,
+            "short_description": analysis.short_description,
+            "is_violation": analysis.is_violation,
+            "detailed_description": analysis.detailed_description,
+            "title": analysis.title or "Traffic Violation Report",
+            "needs_manual_verification": analysis.confidence_score < 0.7,
+            "admin_reviewed": False,
+            "admin_approved": None,
+        })
+    db.table("violation_reports").insert(rows).execute()
@@ -0,0 +1,111 @@
+"""
+Bytes and latency before/after image normalization
+
+Runs a sample image set (a directory of photos, or synthetic 12 MP
+phone-sized JPEGs when none is given) through the raw base64 path and through
+utils.images.normalize_image, and reports payload size and preparation time.
+With --live the vision model is also called on both variants (needs
+GOOGLE_API_KEY) to compare end-to-end vision latency.
+
+Usage: python -m benchmarks.image_normalization [--images DIR] [--live]
+"""
+import argparse
+import base64
+import io
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from utils.images import bytes_to_data_uri, normalize_image
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def synthetic_images(count: int) -> list[tuple[str, bytes, str]]:
+    rng = np.random.default_rng(0)
+    images = []
+    for i in range(count):
+        # Smooth gradients plus sensor-like noise compress roughly like real photos
+        y, x = np.mgrid[0:3024, 0:4032]
+        base = np.stack([(x + i * 97) % 256, (y + i * 53) % 256, ((x + y) // 2) % 256], axis=-1)
+        noise = rng.normal(0, 12, base.shape)
+        arr = np.clip(base + noise, 0, 255).astype("uint8")
+        out = io.BytesIO()
+        Image.fromarray(arr).save(out, format="JPEG", quality=92)
+        images.append((f"synthetic-{i}.jpg", out.getvalue(), "image/jpeg"))
+    return images
+
+
+def load_images(directory: Path) -> list[tuple[str, bytes, str]]:
+    images = []
+    for p in sorted(directory.iterdir()):
+        if p.suffix.lower() in IMAGE_SUFFIXES:
+            mime = "image/png" if p.suffix.lower() == ".png" else "image/webp" if p.suffix.lower() == ".webp" else "image/jpeg"
+            images.append((p.name, p.read_bytes(), mime))
+    return images
+
+
+def time_vision(data_uri: str) -> float:
+    from nodes.vision import get_structured_model, _build_messages
+
+    start = time.perf_counter()
+    get_structured_model().invoke(_build_messages(data_uri))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=Path, help="directory of sample photos")
+    parser.add_argument("--synthetic", type=int, default=5, help="synthetic images when --images is not given")
+    parser.add_argument("--live", action="store_true", help="also time the real vision call")
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_images(args.synthetic)
+    if not images:
+        print("No images found")
+        return
+
+    rows = []
+    for name, data, mime in images:
+        start = time.perf_counter()
+        raw_uri = bytes_to_data_uri(data, mime)
+        raw_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        normalized = normalize_image(data, mime)
+        norm_time = time.perf_counter() - start
+
+        row = {
+            "name": name,
+            "raw_bytes": len(raw_uri),
+            "norm_bytes": len(normalized.data_uri),
+            "raw_ms": raw_time * 1000,
+            "norm_ms": norm_time * 1000,
+        }
+        if args.live:
+            row["raw_vision_ms"] = time_vision(raw_uri) * 1000
+            row["norm_vision_ms"] = time_vision(normalized.data_uri) * 1000
+        rows.append(row)
+        print(
+            f"{name:28} {row['raw_bytes'] / 1024:9.1f} KB -> {row['norm_bytes'] / 1024:8.1f} KB  "
+            f"prep {row['raw_ms']:6.1f} -> {row['norm_ms']:6.1f} ms"
+            + (f"  vision {row['raw_vision_ms']:7.0f} -> {row['norm_vision_ms']:7.0f} ms" if args.live else "")
+        )
+
+    raw_total = sum(r["raw_bytes"] for r in rows)
+    norm_total = sum(r["norm_bytes"] for r in rows)
+    print()
+    print(f"data URI bytes:     {raw_total / 1024:.1f} KB -> {norm_total / 1024:.1f} KB ({norm_total / raw_total:.1%})")
+    print(f"median prep time:   {statistics.median(r['raw_ms'] for r in rows):.1f} ms -> {statistics.median(r['norm_ms'] for r in rows):.1f} ms")
+    if args.live:
+        print(
+            f"median vision time: {statistics.median(r['raw_vision_ms'] for r in rows):.0f} ms -> "
+            f"{statistics.median(r['norm_vision_ms'] for r in rows):.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Concurrency load test for POST /api/v1/analyze
+
+Replaces the vision model, vector store, validator and Supabase client with
+stubs that sleep for a fixed time, then fires concurrent uploads through the
+ASGI app. With the async pipeline the wall time stays close to a single
+request's latency; a blocking pipeline would take roughly N times as long and
+starve /api/v1/health while it runs.
+
+Usage: python -m benchmarks.load_analyze [--requests 20] [--latency 0.2]
+"""
+import argparse
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+from langchain_core.documents import Document
+
+import nodes.supabase_store as supabase_store
+import nodes.violations as violations
+import nodes.vision as vision
+from nodes.report_store import get_report_store
+from nodes.violations import DETECTABLE_VIOLATIONS, ViolationsResult, create_violation_document
+from nodes.vision import ImageAnalysisResult
+
+# Smallest valid JPEG-ish payload is enough: the stubs never decode it
+SAMPLE_IMAGE = b"\xff\xd8\xff\xe0" + b"\x00" * 256 + b"\xff\xd9"
+
+
+def sample_image(n: int) -> bytes:
+    # Distinct bytes per upload so the analysis cache cannot short-circuit the run
+    return SAMPLE_IMAGE + n.to_bytes(4, "big")
+
+SAMPLE_ANALYSIS = ImageAnalysisResult(
+    vehicle_detected=True,
+    is_violation=True,
+    license_plate="KA01AB1234",
+    license_plate_confidence=0.9,
+    is_india_location=True,
+    location_confidence=0.95,
+    title="Helmet Missing",
+    short_description="Rider without a helmet.",
+    detailed_description="A motorcycle rider is not wearing a helmet.",
+    violations=["Helmet Missing"],
+    confidence_score=0.9,
+)
+
+
+class SleepyRunnable:
+    def __init__(self, latency: float, result):
+        self.latency = latency
+        self.result = result
+
+    def invoke(self, *_args, **_kwargs):
+        time.sleep(self.latency)
+        return self.result
+
+    async def ainvoke(self, *_args, **_kwargs):
+        await asyncio.sleep(self.latency)
+        return self.result
+
+
+class SleepyVectorStore:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.docs = [create_violation_document(v) for v in DETECTABLE_VIOLATIONS]
+
+    def _search(self, query: str, k: int) -> list[Document]:
+        return [d for d in self.docs if d.metadata["name"] == query][:k] or self.docs[:k]
+
+    def similarity_search(self, query: str, k: int = 4):
+        time.sleep(self.latency)
+        return self._search(query, k)
+
+    async def asimilarity_search(self, query: str, k: int = 4):
+        await asyncio.sleep(self.latency)
+        return self._search(query, k)
+
+
+class SleepyQuery:
+    def __init__(self, db: "SleepySupabase"):
+        self.db = db
+        self.action = "select"
+
+    def select(self, *_args, **_kwargs):
+        return self
+
+    def limit(self, _n: int):
+        return self
+
+    def insert(self, _row: dict):
+        self.action = "insert"
+        return self
+
+    def execute(self):
+        time.sleep(self.db.latency)
+        if self.action == "select":
+            # Only the report store's column probe selects; every column is present
+            return SimpleNamespace(data=[], count=None)
+        with self.db.lock:
+            self.db.next_id += 1
+            return SimpleNamespace(data=[{"id": self.db.next_id}], count=None)
+
+
+class SleepySupabase:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def table(self, _name: str):
+        return SleepyQuery(self)
+
+
+def install_stubs(latency: float):
+    vision.get_structured_model = lambda: SleepyRunnable(latency, SAMPLE_ANALYSIS)
+    violations.get_validator = lambda: SleepyRunnable(latency / 4, SimpleNamespace(is_valid=True))
+    violations._VECTOR_STORE = SleepyVectorStore(latency / 4)
+    db = SleepySupabase(latency / 4)
+    supabase_store.get_supabase_client = lambda: db
+    # Probe the report columns now rather than inside the first timed upload
+    get_report_store().columns()
+
+
+async def run(requests: int, latency: float):
+    from server import app
+
+    install_stubs(latency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_upload(n: int):
+            start = time.perf_counter()
+            res = await client.post(
+                "/api/v1/analyze",
+                files={"file": ("sample.jpg", sample_image(n), "image/jpeg")},
+            )
+            res.raise_for_status()
+            # A failed insert still answers 200; make sure storage actually ran
+            assert res.json()["result"]["report_success"], res.json()["result"]
+            return time.perf_counter() - start
+
+        async def health_probe():
+            # Give the uploads a head start so the probe lands mid-pipeline
+            await asyncio.sleep(latency / 2)
+            start = time.perf_counter()
+            (await client.get("/api/v1/health")).raise_for_status()
+            return time.perf_counter() - start
+
+        single = await one_upload(0)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(health_probe(), *[one_upload(n) for n in range(1, requests + 1)])
+        wall = time.perf_counter() - start
+
+    health_latency, latencies = results[0], results[1:]
+    serial_estimate = single * requests
+    print(f"requests:            {requests}")
+    print(f"single request:      {single * 1000:.1f} ms")
+    print(f"concurrent wall:     {wall * 1000:.1f} ms")
+    print(f"serial estimate:     {serial_estimate * 1000:.1f} ms")
+    print(f"overlap factor:      {serial_estimate / wall:.1f}x")
+    print(f"max request latency: {max(latencies) * 1000:.1f} ms")
+    print(f"health during load:  {health_latency * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub vision latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.latency))
+
+
+if __name__ == "__main__":
+    main()
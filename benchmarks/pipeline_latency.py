@@ -0,0 +1,109 @@
+"""
+End-to-end latency of the WhatsApp chain, linear versus DAG
+
+Runs main.chain and a strictly linear vision -> violations -> storage ->
+summary pipe over the same node functions, with the vision, validator,
+summary and Supabase calls replaced by stubs that sleep for a fixed time.
+The LLM summary path is forced so the overlap with storage is visible.
+
+Usage: python -m benchmarks.pipeline_latency [--runs 10] [--vision-latency 0.4]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+from langchain_core.runnables import RunnableLambda
+
+import nodes.summarizer as summarizer
+import nodes.supabase_store as supabase_store
+import nodes.violations as violations
+import nodes.vision as vision
+from benchmarks.load_analyze import SAMPLE_ANALYSIS, SleepyRunnable, SleepySupabase, SleepyVectorStore, sample_image
+from nodes.report_store import get_report_store
+from utils.images import bytes_to_data_uri
+
+
+def install_stubs(vision_latency: float, llm_latency: float, db_latency: float):
+    vision.ANALYSIS_CACHE_ENABLED = False
+    vision.get_structured_model = lambda: SleepyRunnable(vision_latency, SAMPLE_ANALYSIS)
+    violations.get_validator = lambda: SleepyRunnable(llm_latency / 2, SimpleNamespace(is_valid=True))
+    violations._VECTOR_STORE = SleepyVectorStore(0)
+    db = SleepySupabase(db_latency)
+    supabase_store.get_supabase_client = lambda: db
+    summarizer.SUMMARY_MODE = "llm"
+    summary = SleepyRunnable(llm_latency, SimpleNamespace(content="A rider without a helmet was reported."))
+    summarizer.chat_model = lambda _model: summary
+    # Probe the report columns now rather than inside the first timed run
+    get_report_store().columns()
+
+
+async def checked_store_report(data: dict):
+    # A failed insert returns quickly and would flatter both chains; refuse to time it
+    report = await supabase_store.astore_report(data)
+    assert report.success, f"store_report failed: {report.error}"
+    return report
+
+
+def linear_chain():
+    # The pipeline as it was before the DAG: every stage waits for the previous one
+    from main import prepare_input
+
+    async def aanalyse(data: dict):
+        return {**data, "analysis": await vision.aanalyse_image(data["image_url"], data["plate_crop_image"])}
+
+    async def aadd_violations(data: dict):
+        return {**data, "violations": await violations.amatch_violations(data["analysis"])}
+
+    return (
+        RunnableLambda(prepare_input)
+        | RunnableLambda(aanalyse)
+        | RunnableLambda(aadd_violations)
+        | RunnableLambda(checked_store_report)
+        | RunnableLambda(summarizer.asummarize)
+    )
+
+
+async def time_chain(runnable, runs: int) -> list[float]:
+    latencies = []
+    # One untimed run absorbs one-off client construction
+    await runnable.ainvoke({"image_url": bytes_to_data_uri(sample_image(runs), "image/jpeg")})
+    for n in range(runs):
+        image_url = bytes_to_data_uri(sample_image(n), "image/jpeg")
+        start = time.perf_counter()
+        await runnable.ainvoke({"image_url": image_url, "reporter_phone": "919999999999"})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run(runs: int, vision_latency: float, llm_latency: float, db_latency: float):
+    install_stubs(vision_latency, llm_latency, db_latency)
+    import main
+
+    # Same DAG as main.chain, built over the checked storage stage
+    main.astore_report = checked_store_report
+    dag_chain = main.build_chain()
+
+    linear = await time_chain(linear_chain(), runs)
+    dag = await time_chain(dag_chain, runs)
+
+    print(f"runs:         {runs}")
+    print(f"stub latency: vision {vision_latency * 1000:.0f} ms, llm {llm_latency * 1000:.0f} ms, db {db_latency * 1000:.0f} ms")
+    for label, latencies in (("linear", linear), ("dag", dag)):
+        print(f"{label + ':':13} p50 {statistics.median(latencies) * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms")
+    print(f"saved:        {(statistics.median(linear) - statistics.median(dag)) * 1000:.1f} ms per report")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--vision-latency", type=float, default=0.4)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="summary latency; validator gets half")
+    parser.add_argument("--db-latency", type=float, default=0.15)
+    args = parser.parse_args()
+    asyncio.run(run(args.runs, args.vision_latency, args.llm_latency, args.db_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Latency of template summaries versus the LLM summarizer
+
+Builds report results from the labelled cases in
+benchmarks/data/rule_eval_cases.json, routes them the way SUMMARY_MODE=auto
+would and times the template renderer. The LLM path is timed against the
+real SUMMARY_MODEL with --live (needs GOOGLE_API_KEY); otherwise
+--llm-latency stands in for it.
+
+Usage: python -m benchmarks.summary_latency [--live] [--llm-latency 1.5]
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from nodes.summarizer import _build_messages
+from nodes.summary_templates import needs_llm_summary, render_template_summary
+from nodes.supabase_store import ReportResult
+from nodes.violations import resolve_violation
+from nodes.vision import ImageAnalysisResult
+
+CASES = Path(__file__).parent / "data" / "rule_eval_cases.json"
+
+
+def load_reports() -> list[ReportResult]:
+    reports = []
+    for i, case in enumerate(json.loads(CASES.read_text())):
+        reports.append(ReportResult(
+            success=True,
+            report_id=i + 1,
+            analysis=ImageAnalysisResult.model_validate(case["analysis"]),
+            violations=[resolve_violation(name) for name, ok in case["labels"].items() if ok],
+        ))
+    return reports
+
+
+def time_llm(report: ReportResult) -> float:
+    from config import SUMMARY_MODEL
+    from utils.lazy import chat_model
+
+    start = time.perf_counter()
+    chat_model(SUMMARY_MODEL).invoke(_build_messages(report))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="time the real summary model")
+    parser.add_argument("--llm-latency", type=float, default=1.5, help="assumed LLM latency (s) without --live")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    reports = load_reports()
+    templated = [r for r in reports if not needs_llm_summary(r)]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for r in templated:
+            render_template_summary(r)
+    template_latency = (time.perf_counter() - start) / (args.repeat * len(templated))
+
+    if args.live:
+        llm_latency = statistics.mean(time_llm(r) for r in reports)
+    else:
+        llm_latency = args.llm_latency
+
+    share = len(templated) / len(reports)
+    auto_latency = share * template_latency + (1 - share) * llm_latency
+    print(f"reports:                    {len(reports)}")
+    print(f"served by template (auto):  {len(templated)} ({share:.0%})")
+    print(f"template render:            {template_latency * 1e6:.1f} us")
+    print(f"LLM summary:                {llm_latency * 1000:.0f} ms{'' if args.live else ' (assumed)'}")
+    print(f"mean per report, llm mode:  {llm_latency * 1000:.0f} ms")
+    print(f"mean per report, auto mode: {auto_latency * 1000:.0f} ms")
+    print()
+    print("sample:", render_template_summary(templated[0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cold-start and query latency of the violation index
+
+Compares the previous InMemoryVectorStore (embeds the whole catalogue on
+every cold start) with the memory-mapped NumPy index built ahead of time.
+Embeddings are faked with a fixed per-call latency standing in for the
+remote embeddings API.
+
+Usage: python -m benchmarks.violation_index [--api-latency 0.3] [--queries 2000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from benchmarks.fakes import SlowFakeEmbeddings
+from nodes.violation_index import build_index, load_or_build_index
+from nodes.violations import get_violation_documents
+
+MODEL_ID = "fake-embeddings"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--api-latency", type=float, default=0.3, help="simulated embeddings API latency (s)")
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    docs = get_violation_documents()
+    emb = SlowFakeEmbeddings(size=args.dimensions, latency=args.api_latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "violation_embeddings.npy"
+        build_index(docs, emb, MODEL_ID, path)
+        emb.calls = 0
+
+        start = time.perf_counter()
+        store = InMemoryVectorStore(emb)
+        store.add_documents(documents=docs)
+        legacy_cold = time.perf_counter() - start
+        legacy_calls = emb.calls
+        emb.calls = 0
+
+        start = time.perf_counter()
+        index = load_or_build_index(docs, emb, MODEL_ID, path)
+        index_cold = time.perf_counter() - start
+        index_calls = emb.calls
+
+        emb.latency = 0.0
+        queries = [emb.embed_query(d.metadata["name"]) for d in docs]
+
+        start = time.perf_counter()
+        for i in range(args.queries):
+            store.similarity_search_by_vector(queries[i % len(queries)], k=2)
+        legacy_query = (time.perf_counter() - start) / args.queries
+
+        start = time.perf_counter()
+        for i in range(args.queries):
+            index.similarity_search_by_vector(queries[i % len(queries)], k=2)
+        index_query = (time.perf_counter() - start) / args.queries
+
+        agree = all(
+            [d.metadata["id"] for d in store.similarity_search_by_vector(q, k=2)]
+            == [d.metadata["id"] for d in index.similarity_search_by_vector(q, k=2)]
+            for q in queries
+        )
+
+    print(f"cold start   InMemoryVectorStore: {legacy_cold * 1000:8.1f} ms ({legacy_calls} embedding calls)")
+    print(f"cold start   mmap NumPy index:    {index_cold * 1000:8.1f} ms ({index_calls} embedding calls)")
+    print(f"search/query InMemoryVectorStore: {legacy_query * 1e6:8.1f} us")
+    print(f"search/query mmap NumPy index:    {index_query * 1e6:8.1f} us")
+    print(f"top-2 results identical:          {agree}")
+
+
+if __name__ == "__main__":
+    main()
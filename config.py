@@ -1,4 +1,11 @@
 VISION_MODEL = "google_genai:gemini-2.5-flash"
 VIOLATION_VALIDATOR_MODEL = "google_genai:gemini-2.0-flash-lite"
 SUMMARY_MODEL = "google_genai:gemini-2.5-flash-lite"
-GENAI_EMBEDDINGS_MODEL = "text-embedding-004"
\ No newline at end of file
+GENAI_EMBEDDINGS_MODEL = "text-embedding-004"
+
+# Estimated USD per 1M tokens, used for the cost counters on /api/v1/metrics
+MODEL_COSTS = {
+    "google_genai:gemini-2.5-flash": {"input": 0.30, "output": 2.50},
+    "google_genai:gemini-2.5-flash-lite": {"input": 0.10, "output": 0.40},
+    "google_genai:gemini-2.0-flash-lite": {"input": 0.075, "output": 0.30},
+}
@@ -1,3 +1,4 @@
+import asyncio
 from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableParallel
 
 try:
@@ -6,34 +7,118 @@ try:
 except ImportError:
     pass
 
-from nodes.vision import analyse_image
-from nodes.violations import match_violations
-from nodes.supabase_store import store_report
-from nodes.summarizer import summarize
-
-
-def build_chain(reporter_phone: str = None, reported_image: str = None):
-    def analyse_with_context(image_url: str):
-        result = analyse_image(image_url)
-        return {
-            "analysis": result,
-            "reporter_phone": reporter_phone,
-            "reported_image": reported_image or image_url
-        }
-    
-    def add_violations(data: dict):
-        violations = match_violations(data["analysis"])
-        return {
-            **data,
-            "violations": violations
-        }
-    
+from nodes.vision import analyse_image, aanalyse_image
+from nodes.violations import match_violations, amatch_violations, get_validator, get_batch_validator
+from nodes.supabase_store import store_report, astore_report
+from nodes.summarizer import draft_summary, adraft_summary, finalize_summary
+from config import SUMMARY_MODEL
+from utils.lazy import chat_model
+
+
+def prepare_input(inputs) -> dict:
+    """
+    Accepts an image URL or a dict with image_url and optionally
+    plate_crop_image, reporter_phone and reported_image
+    """
+    if isinstance(inputs, str):
+        inputs = {"image_url": inputs}
+    image_url = inputs["image_url"]
+    return {
+        "image_url": image_url,
+        "plate_crop_image": inputs.get("plate_crop_image"),
+        "reporter_phone": inputs.get("reporter_phone"),
+        "reported_image": inputs.get("reported_image") or image_url,
+    }
+
+
+def analyse(data: dict):
+    return analyse_image(data["image_url"], data["plate_crop_image"])
+
+
+async def aanalyse(data: dict):
+    return await aanalyse_image(data["image_url"], data["plate_crop_image"])
+
+
+_WARMED = False
+
+
+def _warm_models():
+    get_validator()
+    get_batch_validator()
+    chat_model(SUMMARY_MODEL)
+
+
+def warm_up(_data: dict) -> bool:
+    # Image-independent setup that would otherwise sit behind the vision call.
+    # Attempted once per process; the stage that needs a resource reports any error.
+    # The violation index is left to load lazily: only names the catalogue
+    # cannot resolve need it, and a missing index file would mean embedding calls.
+    global _WARMED
+    if _WARMED:
+        return False
+    _WARMED = True
+    try:
+        _warm_models()
+        return True
+    except Exception:
+        return False
+
+
+async def awarm_up(_data: dict) -> bool:
+    global _WARMED
+    if _WARMED:
+        return False
+    _WARMED = True
+    try:
+        await asyncio.to_thread(_warm_models)
+        return True
+    except Exception:
+        return False
+
+
+def add_violations(data: dict):
+    return match_violations(data["analysis"])
+
+
+async def aadd_violations(data: dict):
+    return await amatch_violations(data["analysis"])
+
+
+def finalize(data: dict) -> str:
+    return finalize_summary(data["draft"], data["report"])
+
+
+def build_analysis_chain():
+    """image -> (vision || warm-up) -> violations; everything up to storage"""
     return (
-        RunnableLambda(analyse_with_context)
-        | RunnableLambda(add_violations)
-        | RunnableLambda(store_report)
-        | RunnableLambda(summarize)
+        RunnableLambda(prepare_input)
+        | RunnablePassthrough.assign(
+            analysis=RunnableLambda(analyse, afunc=aanalyse),
+            warm=RunnableLambda(warm_up, afunc=awarm_up),
+        )
+        | RunnablePassthrough.assign(violations=RunnableLambda(add_violations, afunc=aadd_violations))
     )
 
 
+def build_report_chain():
+    """
+    (storage || draft summary) -> summary
+
+    The summary is drafted while the report is stored and the report status
+    is appended once the insert returns.
+    """
+    return (
+        RunnableParallel(
+            report=RunnableLambda(store_report, afunc=astore_report),
+            draft=RunnableLambda(draft_summary, afunc=adraft_summary),
+        )
+        | RunnableLambda(finalize)
+    )
+
+
+def build_chain():
+    """image -> (vision || warm-up) -> violations -> (storage || draft summary) -> summary"""
+    return build_analysis_chain() | build_report_chain()
+
+
 chain = build_chain()
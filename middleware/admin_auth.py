@@ -13,6 +13,8 @@ _active_sessions = {}
 
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
 SESSION_DURATION_HOURS = 24
+# Static bearer token for scrapers of /metrics and /health/*, which cannot hold an admin session
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
 
 def generate_session_token() -> str:
@@ -69,6 +71,28 @@ async def require_admin_auth(authorization: Optional[str] = Header(None)) -> str
     Expects Authorization header with format: Bearer <token>
     Returns the token if valid, raises HTTPException otherwise
     """
+    token = _bearer_token(authorization)
+    if not verify_admin_session(token):
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    
+    return token
+
+
+async def require_metrics_auth(authorization: Optional[str] = Header(None)) -> str:
+    """
+    Dependency for the operational endpoints (metrics and detailed health)
+    Accepts METRICS_TOKEN as a bearer token, or an admin session token
+    """
+    token = _bearer_token(authorization)
+    if METRICS_TOKEN and secrets.compare_digest(token, METRICS_TOKEN):
+        return token
+    if not verify_admin_session(token):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    return token
+
+
+def _bearer_token(authorization: Optional[str]) -> str:
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header required")
     
@@ -76,8 +100,4 @@ async def require_admin_auth(authorization: Optional[str] = Header(None)) -> str
     if len(parts) != 2 or parts[0].lower() != "bearer":
         raise HTTPException(status_code=401, detail="Invalid authorization header format")
     
-    token = parts[1]
-    if not verify_admin_session(token):
-        raise HTTPException(status_code=401, detail="Invalid or expired session")
-    
-    return token
+    return parts[1]
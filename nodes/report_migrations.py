@@ -0,0 +1,237 @@
+"""
+Versioned schema migrations for violation_reports
+
+MIGRATIONS holds the SQL from ADMIN_MIGRATION.md as numbered steps. Each
+statement is idempotent (IF NOT EXISTS, CREATE OR REPLACE), so a database
+migrated by hand from that file can be brought under the runner safely.
+Applied versions are recorded in schema_migrations.
+
+The Supabase REST API cannot run DDL. Applying migrations therefore needs a
+direct Postgres connection (SUPABASE_DB_URL, the connection string from the
+project's database settings) and psycopg. Without them, --sql prints the
+statements for the SQL editor. The SQLite report store creates the current
+schema itself.
+
+Usage: python -m nodes.report_migrations [--status | --sql | --apply]
+"""
+import os
+import argparse
+from pydantic import BaseModel
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
+
+
+class Migration(BaseModel):
+    version: int
+    name: str
+    sql: str
+    # Columns this step adds to violation_reports; the report store probes for them
+    columns: list[str] = []
+
+
+MIGRATIONS = [
+    Migration(
+        version=1,
+        name="report_analysis_columns",
+        columns=["license_plate_confidence", "is_india_location", "location_confidence", "needs_manual_verification"],
+        sql="""
+ALTER TABLE violation_reports
+ADD COLUMN IF NOT EXISTS license_plate_confidence DOUBLE PRECISION,
+ADD COLUMN IF NOT EXISTS is_india_location BOOLEAN,
+ADD COLUMN IF NOT EXISTS location_confidence DOUBLE PRECISION,
+ADD COLUMN IF NOT EXISTS needs_manual_verification BOOLEAN DEFAULT FALSE;
+""",
+    ),
+    Migration(
+        version=2,
+        name="admin_review_columns",
+        columns=["admin_reviewed", "admin_approved"],
+        sql="""
+ALTER TABLE violation_reports
+ADD COLUMN IF NOT EXISTS admin_reviewed BOOLEAN DEFAULT FALSE,
+ADD COLUMN IF NOT EXISTS admin_approved BOOLEAN DEFAULT FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_admin_reviewed ON violation_reports(admin_reviewed);
+CREATE INDEX IF NOT EXISTS idx_admin_approved ON violation_reports(admin_approved);
+CREATE INDEX IF NOT EXISTS idx_needs_verification ON violation_reports(needs_manual_verification);
+""",
+    ),
+    Migration(
+        version=3,
+        name="report_stats_function",
+        sql="""
+CREATE OR REPLACE FUNCTION report_stats()
+RETURNS TABLE (
+    total_reports BIGINT,
+    reports_with_violations BIGINT,
+    flagged_reports BIGINT,
+    approved_reports BIGINT,
+    pending_approval BIGINT
+)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        COUNT(*),
+        COUNT(*) FILTER (WHERE is_violation),
+        COUNT(*) FILTER (WHERE needs_manual_verification),
+        COUNT(*) FILTER (WHERE admin_approved),
+        COUNT(*) FILTER (WHERE is_violation AND NOT admin_reviewed)
+    FROM violation_reports;
+$$;
+""",
+    ),
+    Migration(
+        version=4,
+        name="review_queue_indexes",
+        sql="""
+CREATE INDEX IF NOT EXISTS idx_reports_timestamp_id
+ON violation_reports (reported_timestamp DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_reports_pending
+ON violation_reports (reported_timestamp DESC, id DESC)
+WHERE is_violation AND NOT admin_reviewed;
+
+CREATE INDEX IF NOT EXISTS idx_reports_flagged
+ON violation_reports (reported_timestamp DESC, id DESC)
+WHERE needs_manual_verification;
+
+CREATE INDEX IF NOT EXISTS idx_reports_violation_timestamp
+ON violation_reports (is_violation, reported_timestamp DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_reports_confidence
+ON violation_reports (confidence_score);
+""",
+    ),
+    Migration(
+        version=5,
+        name="violations_gin_index",
+        # Needs violations to be jsonb; on a json column this step fails and the runner stops here
+        sql="""
+CREATE INDEX IF NOT EXISTS idx_reports_violations
+ON violation_reports USING GIN (violations jsonb_path_ops);
+""",
+    ),
+    Migration(
+        version=6,
+        name="analysis_jobs_table",
+        # Shared state for submit-and-poll uploads (utils.jobs.SupabaseJobStore)
+        sql="""
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id TEXT PRIMARY KEY,
+    data JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_created ON analysis_jobs (created_at);
+""",
+    ),
+    Migration(
+        version=7,
+        name="webhook_idempotency_keys",
+        # Message ids claimed by the WhatsApp webhook (utils.idempotency.SupabaseIdempotencyStore)
+        sql="""
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    seen_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_seen ON idempotency_keys (seen_at);
+""",
+    ),
+]
+
+SCHEMA_MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+
+def _connect():
+    if psycopg is None:
+        raise RuntimeError('Applying migrations needs psycopg: pip install "psycopg[binary]"')
+    if not SUPABASE_DB_URL:
+        raise RuntimeError("Applying migrations needs SUPABASE_DB_URL (the Postgres connection string)")
+    return psycopg.connect(SUPABASE_DB_URL, autocommit=True)
+
+
+def applied_versions() -> set[int]:
+    with _connect() as conn:
+        conn.execute(SCHEMA_MIGRATIONS_DDL)
+        return {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+
+def apply_migrations() -> list[Migration]:
+    """Run every migration not yet recorded, each in its own transaction; returns those applied"""
+    applied = []
+    with _connect() as conn:
+        conn.execute(SCHEMA_MIGRATIONS_DDL)
+        done = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+        for migration in MIGRATIONS:
+            if migration.version in done:
+                continue
+            with conn.transaction():
+                conn.execute(migration.sql)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (migration.version, migration.name),
+                )
+            applied.append(migration)
+            print(f"applied {migration.version:03d} {migration.name}")
+        if applied:
+            # Let PostgREST see the new columns and functions without a restart
+            conn.execute("NOTIFY pgrst, 'reload schema'")
+    return applied
+
+
+def render_sql(migrations: list[Migration] = MIGRATIONS) -> str:
+    return "\n".join(f"-- {m.version:03d} {m.name}{m.sql}" for m in migrations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--status", action="store_true", help="probe the table and list missing columns (default)")
+    mode.add_argument("--sql", action="store_true", help="print every migration for the SQL editor")
+    mode.add_argument("--apply", action="store_true", help="apply pending migrations over SUPABASE_DB_URL")
+    args = parser.parse_args()
+
+    if args.sql:
+        print(render_sql())
+        return
+
+    if args.apply:
+        try:
+            applied = apply_migrations()
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+        print(f"{len(applied)} migration(s) applied" if applied else "schema is up to date")
+        print("Restart running API servers and workers so they re-probe the schema")
+        return
+
+    from nodes.report_store import REPORT_COLUMNS, REPORT_STORE, get_report_store
+
+    missing = set(REPORT_COLUMNS) - get_report_store().columns()
+    print(f"report store: {REPORT_STORE}")
+    for migration in MIGRATIONS:
+        if migration.columns:
+            state = "missing" if missing & set(migration.columns) else "present"
+            print(f"{migration.version:03d} {migration.name}: columns {state}")
+    if psycopg is not None and SUPABASE_DB_URL:
+        print(f"recorded in schema_migrations: {sorted(applied_versions())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+"""
+Persistence for violation_reports
+
+ReportStore covers what the pipeline and the admin API need: insert a
+report, fetch one, list with filters and a keyset cursor, update a set of
+ids and compute the dashboard counts. REPORT_STORE selects the backend:
+"supabase" (default, the hosted Postgres table) or "sqlite" (a local WAL
+database at REPORT_STORE_PATH with the same columns and indexes, for
+single-node deployments and offline runs).
+
+insert() is synchronous because store_report runs on worker threads; the
+other methods are awaited from the API routes. columns() reports which of
+the columns the table has, so writes can be shaped for an unmigrated
+Supabase table (see nodes/report_migrations.py).
+"""
+import os
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from pydantic import BaseModel, Field
+from nodes.report_migrations import MIGRATIONS
+from utils.pagination import apply_cursor, decode_cursor, split_page
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+REPORT_STORE = os.getenv("REPORT_STORE", "supabase")
+REPORT_STORE_PATH = os.getenv("REPORT_STORE_PATH", "reports.sqlite3")
+
+TABLE = "violation_reports"
+
+# Columns for report listings; the image and detailed description are left to the detail view
+REPORT_LIST_COLUMNS = (
+    "id,reported_timestamp,reporter_phone,reported_image,license_plate,violations,"
+    "confidence_score,short_description,is_violation,title"
+)
+ADMIN_REPORT_LIST_COLUMNS = REPORT_LIST_COLUMNS + ",needs_manual_verification,admin_reviewed,admin_approved"
+
+# Every column with its SQLite declaration; "bool" and "json" columns are converted on the way out
+REPORT_COLUMNS = {
+    "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+    "reporter_phone": "TEXT",
+    "reported_timestamp": "TEXT NOT NULL",
+    "reported_image": "TEXT",
+    "license_plate": "TEXT",
+    "license_plate_confidence": "REAL",
+    "is_india_location": "INTEGER",
+    "location_confidence": "REAL",
+    "violations": "TEXT NOT NULL DEFAULT '[]' CHECK (json_valid(violations))",
+    "confidence_score": "REAL",
+    "short_description": "TEXT",
+    "is_violation": "INTEGER",
+    "detailed_description": "TEXT",
+    "title": "TEXT",
+    "needs_manual_verification": "INTEGER DEFAULT 0",
+    "admin_reviewed": "INTEGER DEFAULT 0",
+    "admin_approved": "INTEGER DEFAULT 0",
+}
+BOOL_COLUMNS = {"is_india_location", "is_violation", "needs_manual_verification", "admin_reviewed", "admin_approved"}
+JSON_COLUMNS = {"violations"}
+
+# SQLite counterparts of the ADMIN_MIGRATION.md indexes. The partial index
+# predicates must match the WHERE clauses _where() builds
+SQLITE_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS idx_reports_timestamp_id ON {TABLE} (reported_timestamp DESC, id DESC)",
+    f"CREATE INDEX IF NOT EXISTS idx_reports_pending ON {TABLE} (reported_timestamp DESC, id DESC) "
+    "WHERE is_violation = 1 AND admin_reviewed = 0",
+    f"CREATE INDEX IF NOT EXISTS idx_reports_flagged ON {TABLE} (reported_timestamp DESC, id DESC) "
+    "WHERE needs_manual_verification = 1",
+    f"CREATE INDEX IF NOT EXISTS idx_reports_violation_timestamp ON {TABLE} (is_violation, reported_timestamp DESC, id DESC)",
+    f"CREATE INDEX IF NOT EXISTS idx_reports_confidence ON {TABLE} (confidence_score)",
+]
+
+# PostgREST and Postgres codes for a function that has not been created
+_MISSING_FUNCTION_CODES = {"PGRST202", "42883"}
+# ...and for a column that does not exist
+_MISSING_COLUMN_CODES = {"42703", "PGRST204"}
+
+logger = logging.getLogger(__name__)
+
+
+class ReportFilter(BaseModel):
+    flagged_only: Optional[bool] = None
+    has_violations: Optional[bool] = None
+    pending_approval: Optional[bool] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    category: Optional[str] = None
+    min_confidence: Optional[float] = Field(None, ge=0, le=1)
+
+
+def stats_from_counts(total: int, with_violations: int, flagged: int, approved: int, pending: int) -> dict:
+    return {
+        "total_reports": total,
+        "reports_with_violations": with_violations,
+        "flagged_reports": flagged,
+        "reports_without_violations": total - with_violations,
+        "approved_reports": approved,
+        "pending_approval": pending,
+    }
+
+
+class ReportStore(ABC):
+    # How the last stats() call was answered, for the stats cache's metrics
+    stats_source: Optional[str] = None
+
+    def __init__(self):
+        self._known_columns: Optional[frozenset[str]] = None
+        self._columns_lock = threading.Lock()
+
+    def columns(self) -> frozenset[str]:
+        """
+        The known report columns the table has. Probed on first use and kept
+        for the life of the process; a failed probe raises and is retried on
+        the next call
+        """
+        if self._known_columns is None:
+            with self._columns_lock:
+                if self._known_columns is None:
+                    columns = self._probe_columns()
+                    missing = set(REPORT_COLUMNS) - columns
+                    if missing:
+                        logger.warning(
+                            "%s is missing columns %s; see python -m nodes.report_migrations --status",
+                            TABLE,
+                            ", ".join(sorted(missing)),
+                        )
+                    self._known_columns = columns
+        return self._known_columns
+
+    @abstractmethod
+    def _probe_columns(self) -> frozenset[str]:
+        ...
+
+    @abstractmethod
+    def insert(self, row: dict) -> dict:
+        """Insert a report and return it as stored, id included"""
+
+    @abstractmethod
+    async def get(self, report_id: int, columns: str = "*") -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def list_reports(
+        self,
+        columns: str,
+        filters: Optional[ReportFilter] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> tuple[list[dict], Optional[str]]:
+        """A page of reports, newest first, and the cursor for the next page; ValueError on a bad cursor"""
+
+    @abstractmethod
+    async def update(self, ids: list[int], values: dict, columns: str = "*") -> list[dict]:
+        """Apply values to every listed report; returns the rows that exist"""
+
+    @abstractmethod
+    async def stats(self) -> dict:
+        ...
+
+
+class SupabaseReportStore(ReportStore):
+    def __init__(self):
+        super().__init__()
+        # Cleared once report_stats() turns out not to exist, so later calls go straight to the fallback
+        self._rpc_available = True
+
+    @staticmethod
+    def _client():
+        from nodes.supabase_store import get_supabase_client
+
+        return get_supabase_client()
+
+    @staticmethod
+    async def _aclient():
+        from nodes.supabase_store import get_async_supabase_client
+
+        return await get_async_supabase_client()
+
+    @staticmethod
+    def _apply_filters(query, filters: Optional[ReportFilter]):
+        if filters is None:
+            return query
+
+        if filters.flagged_only is True:
+            query = query.eq("needs_manual_verification", True)
+
+        if filters.has_violations is not None:
+            query = query.eq("is_violation", filters.has_violations)
+
+        # Violations nobody has approved or rejected yet
+        if filters.pending_approval is True:
+            query = query.eq("is_violation", True).eq("admin_reviewed", False)
+
+        if filters.date_from is not None:
+            query = query.gte("reported_timestamp", filters.date_from.isoformat())
+
+        if filters.date_to is not None:
+            query = query.lt("reported_timestamp", filters.date_to.isoformat())
+
+        # violations is a jsonb array; match reports with any violation in the category.
+        # Passed pre-encoded since supabase-py renders lists as Postgres arrays
+        if filters.category:
+            query = query.contains("violations", json.dumps([{"category": filters.category}]))
+
+        if filters.min_confidence is not None:
+            query = query.gte("confidence_score", filters.min_confidence)
+
+        return query
+
+    def _probe_columns(self) -> frozenset[str]:
+        """
+        One zero-row select of every column the migrations add; only when
+        that names a missing column, one more per migration to find which
+        """
+        client = self._client()
+        probe = lambda columns: client.table(TABLE).select(",".join(columns)).limit(0).execute()
+
+        def has(columns: list[str]) -> bool:
+            try:
+                probe(columns)
+                return True
+            except Exception as e:
+                if getattr(e, "code", None) in _MISSING_COLUMN_CODES:
+                    return False
+                raise
+
+        added = [c for m in MIGRATIONS for c in m.columns]
+        if has(added):
+            return frozenset(REPORT_COLUMNS)
+        missing = {c for m in MIGRATIONS if m.columns and not has(m.columns) for c in m.columns}
+        return frozenset(REPORT_COLUMNS) - missing
+
+    def insert(self, row: dict) -> dict:
+        result = self._client().table(TABLE).insert(row).execute()
+        return result.data[0] if result.data else {}
+
+    async def get(self, report_id: int, columns: str = "*") -> Optional[dict]:
+        supabase = await self._aclient()
+        result = await supabase.table(TABLE).select(columns).eq("id", report_id).execute()
+        return result.data[0] if result.data else None
+
+    async def list_reports(self, columns, filters=None, cursor=None, limit=50):
+        supabase = await self._aclient()
+        query = apply_cursor(self._apply_filters(supabase.table(TABLE).select(columns), filters), cursor)
+        # One extra row tells whether another page exists
+        result = await query.limit(limit + 1).execute()
+        return split_page(result.data or [], limit)
+
+    async def update(self, ids, values, columns="*"):
+        if not ids:
+            return []
+        supabase = await self._aclient()
+        result = await supabase.table(TABLE).update(values).in_("id", ids).select(columns).execute()
+        return result.data or []
+
+    async def _count_queries(self, supabase) -> dict:
+        table = lambda: supabase.table(TABLE).select("id", count="exact").limit(1)
+        queries = [
+            table(),
+            table().eq("is_violation", True),
+            table().eq("needs_manual_verification", True),
+            table().eq("admin_approved", True),
+            table().eq("is_violation", True).eq("admin_reviewed", False),
+        ]
+        results = await asyncio.gather(*(q.execute() for q in queries))
+        return stats_from_counts(*(r.count or 0 for r in results))
+
+    async def _aggregate(self, supabase) -> dict:
+        result = await supabase.rpc("report_stats").execute()
+        row = result.data[0] if isinstance(result.data, list) else result.data
+        return stats_from_counts(
+            row["total_reports"],
+            row["reports_with_violations"],
+            row["flagged_reports"],
+            row["approved_reports"],
+            row["pending_approval"],
+        )
+
+    async def stats(self) -> dict:
+        """
+        One call to the report_stats() function from ADMIN_MIGRATION.md;
+        until it exists, five count queries issued concurrently
+        """
+        supabase = await self._aclient()
+        if self._rpc_available:
+            try:
+                stats = await self._aggregate(supabase)
+                self.stats_source = "aggregate"
+                return stats
+            except Exception as e:
+                logger.warning("report_stats() failed, falling back to count queries: %s", e)
+                if getattr(e, "code", None) in _MISSING_FUNCTION_CODES:
+                    self._rpc_available = False
+
+        stats = await self._count_queries(supabase)
+        self.stats_source = "counts"
+        return stats
+
+
+class SQLiteReportStore(ReportStore):
+    stats_source = "sqlite"
+
+    def __init__(self, path: str = REPORT_STORE_PATH):
+        super().__init__()
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = ", ".join(f"{name} {decl}" for name, decl in REPORT_COLUMNS.items())
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} ({columns})")
+            for statement in SQLITE_INDEXES:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def _columns(columns: str) -> list[str]:
+        if columns.strip() == "*":
+            return list(REPORT_COLUMNS)
+        names = [c.strip() for c in columns.split(",") if c.strip()]
+        unknown = [c for c in names if c not in REPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown report columns: {', '.join(unknown)}")
+        return names
+
+    @staticmethod
+    def _encode(column: str, value):
+        if column in JSON_COLUMNS:
+            return json.dumps(value if value is not None else [])
+        if column in BOOL_COLUMNS and value is not None:
+            return int(value)
+        return value
+
+    @staticmethod
+    def _decode(names: list[str], row: tuple) -> dict:
+        out = {}
+        for name, value in zip(names, row):
+            if name in JSON_COLUMNS and value is not None:
+                value = json.loads(value)
+            elif name in BOOL_COLUMNS and value is not None:
+                value = bool(value)
+            out[name] = value
+        return out
+
+    @staticmethod
+    def _where(filters: Optional[ReportFilter]) -> tuple[list[str], list]:
+        clauses, params = [], []
+        if filters is None:
+            return clauses, params
+        if filters.flagged_only is True:
+            clauses.append("needs_manual_verification = 1")
+        if filters.has_violations is not None:
+            clauses.append("is_violation = ?")
+            params.append(int(filters.has_violations))
+        if filters.pending_approval is True:
+            clauses.append("is_violation = 1 AND admin_reviewed = 0")
+        if filters.date_from is not None:
+            clauses.append("reported_timestamp >= ?")
+            params.append(filters.date_from.isoformat())
+        if filters.date_to is not None:
+            clauses.append("reported_timestamp < ?")
+            params.append(filters.date_to.isoformat())
+        if filters.category:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM json_each(violations) WHERE json_extract(value, '$.category') = ?)"
+            )
+            params.append(filters.category)
+        if filters.min_confidence is not None:
+            clauses.append("confidence_score >= ?")
+            params.append(filters.min_confidence)
+        return clauses, params
+
+    def _probe_columns(self) -> frozenset[str]:
+        with self._connect() as conn:
+            present = {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE})")}
+        return frozenset(REPORT_COLUMNS) & present
+
+    def insert(self, row: dict) -> dict:
+        names = self._columns(",".join(row))
+        placeholders = ", ".join("?" for _ in names)
+        with self._connect() as conn:
+            stored = conn.execute(
+                f"INSERT INTO {TABLE} ({', '.join(names)}) VALUES ({placeholders}) RETURNING *",
+                [self._encode(name, row[name]) for name in names],
+            ).fetchone()
+        return self._decode(list(REPORT_COLUMNS), stored)
+
+    def _get(self, report_id: int, columns: str) -> Optional[dict]:
+        names = self._columns(columns)
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(names)} FROM {TABLE} WHERE id = ?", (report_id,)).fetchone()
+        return self._decode(names, row) if row else None
+
+    def _list_reports(self, columns, filters, cursor, limit):
+        names = self._columns(columns)
+        clauses, params = self._where(filters)
+        if cursor:
+            timestamp, report_id = decode_cursor(cursor)
+            clauses.append("reported_timestamp <= ? AND (reported_timestamp < ? OR (reported_timestamp = ? AND id < ?))")
+            params += [timestamp, timestamp, timestamp, report_id]
+        # The cursor is built from these two, selected or not
+        selected = list(dict.fromkeys(names + ["reported_timestamp", "id"]))
+        sql = f"SELECT {', '.join(selected)} FROM {TABLE}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY reported_timestamp DESC, id DESC LIMIT ?"
+        with self._connect() as conn:
+            rows = [self._decode(selected, r) for r in conn.execute(sql, params + [limit + 1])]
+        rows, next_cursor = split_page(rows, limit)
+        return [{name: row[name] for name in names} for row in rows], next_cursor
+
+    def _update(self, ids, values, columns):
+        if not ids:
+            return []
+        names = self._columns(columns)
+        assignments = self._columns(",".join(values))
+        sql = (
+            f"UPDATE {TABLE} SET {', '.join(f'{c} = ?' for c in assignments)} "
+            f"WHERE id IN ({', '.join('?' for _ in ids)}) RETURNING {', '.join(names)}"
+        )
+        with self._connect() as conn:
+            rows = conn.execute(sql, [self._encode(c, values[c]) for c in assignments] + list(ids)).fetchall()
+        return [self._decode(names, r) for r in rows]
+
+    def _stats(self) -> dict:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*), "
+                "COUNT(*) FILTER (WHERE is_violation = 1), "
+                "COUNT(*) FILTER (WHERE needs_manual_verification = 1), "
+                "COUNT(*) FILTER (WHERE admin_approved = 1), "
+                "COUNT(*) FILTER (WHERE is_violation = 1 AND admin_reviewed = 0) "
+                f"FROM {TABLE}"
+            ).fetchone()
+        return stats_from_counts(*row)
+
+    async def get(self, report_id, columns="*"):
+        return await asyncio.to_thread(self._get, report_id, columns)
+
+    async def list_reports(self, columns, filters=None, cursor=None, limit=50):
+        return await asyncio.to_thread(self._list_reports, columns, filters, cursor, limit)
+
+    async def update(self, ids, values, columns="*"):
+        return await asyncio.to_thread(self._update, ids, values, columns)
+
+    async def stats(self):
+        return await asyncio.to_thread(self._stats)
+
+
+@lru_cache(maxsize=1)
+def get_report_store() -> ReportStore:
+    if REPORT_STORE == "supabase":
+        return SupabaseReportStore()
+    if REPORT_STORE == "sqlite":
+        return SQLiteReportStore()
+    raise ValueError(f"Unknown REPORT_STORE backend: {REPORT_STORE}")
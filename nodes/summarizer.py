@@ -1,11 +1,28 @@
+import os
+import logging
+from typing import AsyncIterator
 from langchain.chat_models import init_chat_model
 from pydantic import BaseModel
 
 from .violations import ViolationsResult
 from .vision import ImageAnalysisResult
 from .supabase_store import ReportResult
+from .summary_templates import needs_llm_summary, render_template_summary, summary_flags
 from config import SUMMARY_MODEL
 from utils.lazy import chat_model
+from utils.metrics import timed
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# "auto": templates for formulaic outcomes, LLM for multi-violation or
+# low-confidence reports; "llm": always the LLM; "template": never the LLM
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "auto")
+
+logger = logging.getLogger(__name__)
 
 
 class SummaryInput(BaseModel):
@@ -13,33 +30,19 @@ class SummaryInput(BaseModel):
     violations: list[ViolationsResult]
 
 
-def summarize(report_result: ReportResult) -> str:
+def _build_messages(report_result: ReportResult, include_status: bool = True) -> list:
     data = {
         "analysis": report_result.analysis,
         "violations": report_result.violations
     }
     
-    report_status = ""
-    if report_result.success:
-        report_status = f"Report recorded (ID: {report_result.report_id})"
-    else:
-        report_status = f"Report storage failed: {report_result.error}"
-    
-    manual_verification = ""
-    if report_result.analysis.confidence_score < 0.7:
-        manual_verification = "REQUIRES MANUAL VERIFICATION (Low confidence)"
-    elif not report_result.analysis.license_plate and report_result.analysis.vehicle_detected:
-        manual_verification = "REQUIRES MANUAL VERIFICATION (License plate not detected)"
-    
-    # Check if image is not from India with high confidence
-    location_warning = ""
-    if not report_result.analysis.is_india_location and report_result.analysis.location_confidence > 0.99:
-        location_warning = "⚠️ WARNING: This image does not appear to be from India. This application is designed for Indian traffic scenarios only. Analysis may not be accurate."
-    
-    # Check license plate confidence
-    license_plate_note = ""
-    if report_result.analysis.license_plate and report_result.analysis.license_plate_confidence < 0.7:
-        license_plate_note = "Note: License plate reading has low confidence and should be verified."
+    flags = summary_flags(report_result)
+    report_status = flags.report_status
+    if not include_status:
+        report_status = "Not yet known. It is appended after your message, so do not mention it"
+    manual_verification = flags.manual_verification
+    location_warning = flags.location_warning
+    license_plate_note = flags.license_plate_note
     
     system_instructions = """You are an AI assistant summarizing traffic violation reports for an Indian traffic enforcement system.
 
@@ -74,13 +77,15 @@ Guidelines:
 
 Keep the response under 200 words."""
     
+    violation_candidates = "\n".join([v.model_dump_json(indent=2) for v in data["violations"]])
+
     user_message = f"""You are given the following structured input for summarization:
 
 Image Analysis Result:
 {data["analysis"].model_dump_json(indent=2)}
 
 Matched Violation Candidates:
-{"\n".join([ v.model_dump_json(indent=2) for v in data["violations"]])}
+{violation_candidates}
 
 Report Status: {report_status}
 Manual Verification Flag: {manual_verification if manual_verification else "Not required"}
@@ -95,9 +100,89 @@ IMPORTANT:
 
 Follow the style described in the system prompt."""
     
-    response = chat_model(SUMMARY_MODEL).invoke([
+    return [
         {"role": "system", "content": system_instructions},
         {"role": "user", "content": user_message}
-    ])
+    ]
+
+
+def use_template(report_result: ReportResult) -> bool:
+    if SUMMARY_MODE == "template":
+        return True
+    return SUMMARY_MODE == "auto" and not needs_llm_summary(report_result)
+
 
-    return response.content
+def _template_fallback(report_result: ReportResult, error: Exception, include_status: bool = True) -> str:
+    # A summary failure must not fail the pipeline: the report may already be
+    # stored, and a retry would store it again. The template covers every
+    # report, just less fluently for the ones routed to the LLM.
+    logger.warning("LLM summary failed, using the template: %s", error)
+    return render_template_summary(report_result, include_status=include_status)
+
+
+@timed("summary")
+def summarize(report_result: ReportResult) -> str:
+    if use_template(report_result):
+        return render_template_summary(report_result)
+    try:
+        response = chat_model(SUMMARY_MODEL).invoke(_build_messages(report_result))
+        return response.content
+    except Exception as e:
+        return _template_fallback(report_result, e)
+
+
+@timed("summary")
+async def asummarize(report_result: ReportResult) -> str:
+    if use_template(report_result):
+        return render_template_summary(report_result)
+    try:
+        response = await chat_model(SUMMARY_MODEL).ainvoke(_build_messages(report_result))
+        return response.content
+    except Exception as e:
+        return _template_fallback(report_result, e)
+
+
+def _draft_report(data: dict) -> ReportResult:
+    # Stand-in report for summarizing while storage is still in flight
+    return ReportResult(success=True, analysis=data["analysis"], violations=data["violations"])
+
+
+@timed("summary")
+def draft_summary(data: dict) -> str:
+    """Summary without the report status, so it can run alongside storage"""
+    report_result = _draft_report(data)
+    if use_template(report_result):
+        return render_template_summary(report_result, include_status=False)
+    try:
+        response = chat_model(SUMMARY_MODEL).invoke(_build_messages(report_result, include_status=False))
+        return response.content
+    except Exception as e:
+        return _template_fallback(report_result, e, include_status=False)
+
+
+@timed("summary")
+async def adraft_summary(data: dict) -> str:
+    report_result = _draft_report(data)
+    if use_template(report_result):
+        return render_template_summary(report_result, include_status=False)
+    try:
+        response = await chat_model(SUMMARY_MODEL).ainvoke(_build_messages(report_result, include_status=False))
+        return response.content
+    except Exception as e:
+        return _template_fallback(report_result, e, include_status=False)
+
+
+def finalize_summary(draft: str, report_result: ReportResult) -> str:
+    """Append the report status once storage has finished"""
+    separator = " " if use_template(report_result) else "\n\n"
+    return f"{draft.rstrip()}{separator}{summary_flags(report_result).report_status}."
+
+
+async def astream_summary(report_result: ReportResult) -> AsyncIterator[str]:
+    """Summary text as it is generated; template summaries arrive as one chunk"""
+    if use_template(report_result):
+        yield render_template_summary(report_result)
+        return
+    async for chunk in chat_model(SUMMARY_MODEL).astream(_build_messages(report_result)):
+        if chunk.content:
+            yield chunk.content
@@ -0,0 +1,103 @@
+"""
+Deterministic summaries for formulaic report outcomes
+
+Covers reports with no vehicle, no violation, a single confirmed violation
+or a manual-verification flag, following the same rules the summarizer
+prompt gives the LLM: location warning first, plate number withheld below
+0.7 confidence, manual verification emphasised and report status last.
+Multi-violation and low-confidence reports are left to the LLM.
+"""
+from pydantic import BaseModel
+
+from .supabase_store import ReportResult
+
+LOW_CONFIDENCE = 0.7
+
+
+class SummaryFlags(BaseModel):
+    report_status: str
+    manual_verification: str = ""
+    location_warning: str = ""
+    license_plate_note: str = ""
+
+
+def summary_flags(report_result: ReportResult) -> SummaryFlags:
+    analysis = report_result.analysis
+
+    if report_result.success:
+        report_status = f"Report recorded (ID: {report_result.report_id})"
+    else:
+        report_status = f"Report storage failed: {report_result.error}"
+
+    manual_verification = ""
+    if analysis.from_near_hit:
+        manual_verification = "REQUIRES MANUAL VERIFICATION (Matched an earlier similar image; license plate not re-read)"
+    elif analysis.confidence_score < LOW_CONFIDENCE:
+        manual_verification = "REQUIRES MANUAL VERIFICATION (Low confidence)"
+    elif not analysis.license_plate and analysis.vehicle_detected:
+        manual_verification = "REQUIRES MANUAL VERIFICATION (License plate not detected)"
+
+    # Check if image is not from India with high confidence
+    location_warning = ""
+    if not analysis.is_india_location and analysis.location_confidence > 0.99:
+        location_warning = "⚠️ WARNING: This image does not appear to be from India. This application is designed for Indian traffic scenarios only. Analysis may not be accurate."
+
+    # Check license plate confidence
+    license_plate_note = ""
+    if analysis.license_plate and analysis.license_plate_confidence < LOW_CONFIDENCE:
+        license_plate_note = "Note: License plate reading has low confidence and should be verified."
+
+    return SummaryFlags(
+        report_status=report_status,
+        manual_verification=manual_verification,
+        location_warning=location_warning,
+        license_plate_note=license_plate_note,
+    )
+
+
+def needs_llm_summary(report_result: ReportResult) -> bool:
+    return len(report_result.violations) > 1 or report_result.analysis.confidence_score < LOW_CONFIDENCE
+
+
+def render_template_summary(report_result: ReportResult, include_status: bool = True) -> str:
+    analysis = report_result.analysis
+    flags = summary_flags(report_result)
+    parts = []
+
+    if flags.location_warning:
+        parts.append(flags.location_warning)
+
+    if not analysis.vehicle_detected:
+        parts.append("No vehicle was detected in the image, so no traffic violation could be assessed.")
+    else:
+        if analysis.from_near_hit:
+            vehicle = "A vehicle was detected; its license plate was not read again for this copy of an earlier image."
+        elif analysis.license_plate and analysis.license_plate_confidence >= LOW_CONFIDENCE:
+            vehicle = f"A vehicle with license plate {analysis.license_plate} was detected."
+        elif analysis.license_plate:
+            vehicle = "A vehicle was detected, but its license plate could not be read with certainty."
+        else:
+            vehicle = "A vehicle was detected, but its license plate could not be identified."
+        parts.append(vehicle)
+
+        if report_result.violations:
+            for v in report_result.violations:
+                parts.append(
+                    f"Violation identified: {v.name}, under Section {v.section} of the Motor Vehicles Act, "
+                    f"with a fine of INR {v.fine_amount:,}."
+                )
+        elif analysis.is_violation:
+            parts.append("A possible violation was observed but could not be confirmed, so the case requires manual review.")
+        else:
+            parts.append("No traffic violation was found.")
+
+    if flags.license_plate_note:
+        parts.append(flags.license_plate_note)
+
+    if flags.manual_verification:
+        reason = flags.manual_verification.split("(", 1)[-1].rstrip(")").lower()
+        parts.append(f"IMPORTANT: This report REQUIRES MANUAL VERIFICATION ({reason}).")
+
+    if include_status:
+        parts.append(f"{flags.report_status}.")
+    return " ".join(parts)
@@ -1,10 +1,18 @@
 import os
+import asyncio
+import logging
+import threading
+import weakref
 from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel
-from supabase import create_client, Client
+from supabase import AsyncClient, AsyncClientOptions, Client, ClientOptions, acreate_client, create_client
 from .vision import ImageAnalysisResult
 from .violations import ViolationsResult
+from .report_store import get_report_store
+from utils.blobs import store_data_uri
+from utils.metrics import record_stage_error, timed
+from utils.report_stats import invalidate_report_stats
 
 try:
     from dotenv import load_dotenv
@@ -15,6 +23,8 @@ except ImportError:
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
+logger = logging.getLogger(__name__)
+
 
 class ReportResult(BaseModel):
     success: bool
@@ -26,10 +36,61 @@ class ReportResult(BaseModel):
     reported_image: Optional[str] = None
 
 
-def get_supabase_client() -> Client:
+_client: Optional[Client] = None
+_client_lock = threading.Lock()
+# httpx.AsyncClient connections belong to the loop that opened them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient]" = weakref.WeakKeyDictionary()
+_async_client_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def _check_credentials():
     if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
         raise ValueError("Missing Supabase credentials")
-    return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+
+
+def get_supabase_client() -> Client:
+    """
+    Process-wide client. Its httpx session keeps connections alive between
+    requests and is safe to share across the worker threads that run
+    store_report.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    _check_credentials()
+    with _client_lock:
+        if _client is None:
+            # Service-role key, no user session to persist or refresh
+            client = create_client(
+                SUPABASE_URL,
+                SUPABASE_SERVICE_ROLE_KEY,
+                options=ClientOptions(auto_refresh_token=False, persist_session=False),
+            )
+            # The PostgREST client is created lazily; build it here, under the lock
+            client.postgrest
+            _client = client
+    return _client
+
+
+async def get_async_supabase_client() -> AsyncClient:
+    """Client for async routes, one per event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is not None:
+        return client
+    _check_credentials()
+    # Concurrent first calls on a loop wait for one client instead of each opening (and leaking) their own
+    async with _async_client_locks.setdefault(loop, asyncio.Lock()):
+        client = _async_clients.get(loop)
+        if client is None:
+            client = await acreate_client(
+                SUPABASE_URL,
+                SUPABASE_SERVICE_ROLE_KEY,
+                options=AsyncClientOptions(auto_refresh_token=False, persist_session=False),
+            )
+            client.postgrest
+            _async_clients[loop] = client
+    return client
 
 
 def format_violations_for_llm(violations: list[ViolationsResult]) -> str:
@@ -42,25 +103,37 @@ def format_violations_for_llm(violations: list[ViolationsResult]) -> str:
     return "\n".join(lines)
 
 
+@timed("storage")
 def store_report(data: dict) -> ReportResult:
     analysis: ImageAnalysisResult = data["analysis"]
     violations: list[ViolationsResult] = data["violations"]
     
     reporter_phone = data.get("reporter_phone")
     reported_image = data.get("reported_image")
-    
+
     try:
-        supabase = get_supabase_client()
-        
+        store = get_report_store()
+
+        # Keep only the blob key in the row; on a storage failure fall back to the data URI
+        if reported_image and reported_image.startswith("data:"):
+            try:
+                reported_image = store_data_uri(reported_image).key
+            except Exception as blob_error:
+                # Listings only show blob-backed images, so this report will appear without one
+                logger.error("Blob store write failed, keeping inline image: %s", blob_error)
+
         # Determine if manual verification is needed
         # Flag for manual verification if:
         # - License plate confidence is low (<0.7) but plate is present
         # - Location confidence is low (<0.7)
         # - Overall confidence is low (<0.6)
         # - Is a violation but no violations detected
+        # - The analysis was reused from a similar image, without a plate reading
         needs_manual_verification = False
         if analysis.is_violation:
-            if (analysis.license_plate and analysis.license_plate_confidence < 0.7):
+            if analysis.from_near_hit:
+                needs_manual_verification = True
+            elif (analysis.license_plate and analysis.license_plate_confidence < 0.7):
                 needs_manual_verification = True
             elif analysis.location_confidence < 0.7:
                 needs_manual_verification = True
@@ -69,7 +142,6 @@ def store_report(data: dict) -> ReportResult:
             elif not violations:
                 needs_manual_verification = True
         
-        # Try with new schema first (includes new fields)
         report_data = {
             "reporter_phone": reporter_phone,
             "reported_timestamp": datetime.utcnow().isoformat(),
@@ -87,26 +159,13 @@ def store_report(data: dict) -> ReportResult:
             "needs_manual_verification": needs_manual_verification
         }
         
-        try:
-            result = supabase.table("violation_reports").insert(report_data).execute()
-        except Exception as insert_error:
-            # If insert fails (likely due to missing columns), try with old schema
-            # Remove the new fields and retry
-            report_data_old = {
-                "reporter_phone": reporter_phone,
-                "reported_timestamp": datetime.utcnow().isoformat(),
-                "reported_image": reported_image,
-                "license_plate": analysis.license_plate,
-                "violations": [v.model_dump() for v in violations],
-                "confidence_score": analysis.confidence_score,
-                "short_description": analysis.short_description,
-                "is_violation": analysis.is_violation,
-                "detailed_description": analysis.detailed_description,
-                "title": analysis.title or "Traffic Violation Report"
-            }
-            result = supabase.table("violation_reports").insert(report_data_old).execute()
+        # Drop fields an unmigrated table has no column for (the schema is probed once
+        # per process), so the insert is a single round trip and its errors are real ones
+        columns = store.columns()
+        stored = store.insert({k: v for k, v in report_data.items() if k in columns})
         
-        report_id = result.data[0].get("id") if result.data else None
+        report_id = stored.get("id")
+        invalidate_report_stats()
         
         return ReportResult(
             success=True,
@@ -118,6 +177,8 @@ def store_report(data: dict) -> ReportResult:
         )
         
     except Exception as e:
+        # The failure is reported in the result rather than raised, so count it here
+        record_stage_error("storage")
         return ReportResult(
             success=False,
             error=str(e),
@@ -126,3 +187,8 @@ def store_report(data: dict) -> ReportResult:
             reporter_phone=reporter_phone,
             reported_image=reported_image
         )
+
+
+async def astore_report(data: dict) -> ReportResult:
+    # ReportStore.insert is synchronous; keep it off the event loop
+    return await asyncio.to_thread(store_report, data)
@@ -0,0 +1,207 @@
+"""
+Precomputed embedding index for the violation catalogue
+
+The catalogue embeddings are written once to an .npy file next to a JSON
+manifest holding a content hash of the catalogue and embedding model. At
+runtime the matrix is memory-mapped and searched with a vectorized top-k
+cosine similarity, so a cold start makes no embedding calls unless the
+catalogue changed since the file was built.
+
+Serverless deployments cannot write the file at runtime, so the Vercel build
+command builds it (GOOGLE_API_KEY must be available to the build) and bundles
+data/ with the function. --check exits non-zero when the index is missing or
+stale, which fails the deploy instead of shipping a function that re-embeds
+the catalogue on every cold start.
+
+Usage: python -m nodes.violation_index [--check]
+"""
+import os
+import argparse
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+VIOLATION_INDEX_PATH = Path(
+    os.getenv("VIOLATION_INDEX_PATH", str(Path(__file__).parent.parent / "data" / "violation_embeddings.npy"))
+)
+VIOLATION_QUERY_CACHE_SIZE = int(os.getenv("VIOLATION_QUERY_CACHE_SIZE", "512"))
+
+
+def catalogue_hash(documents: list[Document], model_id: str) -> str:
+    h = hashlib.sha256(model_id.encode("utf-8"))
+    for doc in documents:
+        h.update(b"\0")
+        h.update(doc.page_content.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _manifest_path(path: Path) -> Path:
+    return path.with_suffix(".json")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class ViolationIndex:
+    """
+    Read-only vector index over the catalogue documents with the
+    similarity_search interface of a LangChain vector store
+    """
+
+    def __init__(
+        self,
+        documents: list[Document],
+        matrix: np.ndarray,
+        embeddings: Embeddings,
+        query_cache_size: int = VIOLATION_QUERY_CACHE_SIZE,
+    ):
+        self.documents = documents
+        # Rows are unit vectors, so a dot product is the cosine similarity
+        self.matrix = matrix
+        self.embeddings = embeddings
+        self.query_cache_size = query_cache_size
+        self._query_cache: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached_query(self, query: str) -> Optional[list[float]]:
+        with self._lock:
+            vector = self._query_cache.get(query)
+            if vector is not None:
+                self._query_cache.move_to_end(query)
+            return vector
+
+    def _remember_query(self, query: str, vector: list[float]) -> None:
+        with self._lock:
+            self._query_cache[query] = vector
+            self._query_cache.move_to_end(query)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+
+    def query_vector(self, query: str) -> tuple[list[float], bool]:
+        """Embedding for a query and whether a remote embedding call was made"""
+        vector = self._cached_query(query)
+        if vector is not None:
+            return vector, False
+        vector = self.embeddings.embed_query(query)
+        self._remember_query(query, vector)
+        return vector, True
+
+    async def aquery_vector(self, query: str) -> tuple[list[float], bool]:
+        vector = self._cached_query(query)
+        if vector is not None:
+            return vector, False
+        vector = await self.embeddings.aembed_query(query)
+        self._remember_query(query, vector)
+        return vector, True
+
+    def similarity_search_by_vector(self, vector: list[float], k: int = 4) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(vector, k)]
+
+    def similarity_search_with_score_by_vector(self, vector: list[float], k: int = 4) -> list[tuple[Document, float]]:
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+    def similarity_search(self, query: str, k: int = 4) -> list[Document]:
+        return self.similarity_search_by_vector(self.query_vector(query)[0], k)
+
+    async def asimilarity_search(self, query: str, k: int = 4) -> list[Document]:
+        return self.similarity_search_by_vector((await self.aquery_vector(query))[0], k)
+
+
+def _embed_documents(documents: list[Document], embeddings: Embeddings) -> np.ndarray:
+    vectors = embeddings.embed_documents([d.page_content for d in documents])
+    return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def _save_matrix(matrix: np.ndarray, documents: list[Document], model_id: str, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, matrix)
+    _manifest_path(path).write_text(json.dumps({
+        "catalogue_hash": catalogue_hash(documents, model_id),
+        "model": model_id,
+        "count": len(documents),
+        "dimensions": int(matrix.shape[1]),
+    }, indent=2))
+
+
+def build_index(
+    documents: list[Document],
+    embeddings: Embeddings,
+    model_id: str,
+    path: Path = VIOLATION_INDEX_PATH,
+) -> np.ndarray:
+    matrix = _embed_documents(documents, embeddings)
+    _save_matrix(matrix, documents, model_id, path)
+    return matrix
+
+
+def _load_matrix(documents: list[Document], model_id: str, path: Path) -> Optional[np.ndarray]:
+    manifest_path = _manifest_path(path)
+    if not path.exists() or not manifest_path.exists():
+        return None
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get("catalogue_hash") != catalogue_hash(documents, model_id):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def load_or_build_index(
+    documents: list[Document],
+    embeddings: Embeddings,
+    model_id: str,
+    path: Path = VIOLATION_INDEX_PATH,
+) -> ViolationIndex:
+    matrix = _load_matrix(documents, model_id, path)
+    if matrix is None:
+        matrix = _embed_documents(documents, embeddings)
+        try:
+            _save_matrix(matrix, documents, model_id, path)
+        except OSError:
+            # Read-only filesystem (e.g. serverless): keep the rebuilt index in memory only
+            pass
+    return ViolationIndex(documents, matrix, embeddings)
+
+
+def main():
+    from nodes.violations import get_violation_documents
+    from config import GENAI_EMBEDDINGS_MODEL
+    from utils.lazy import embeddings_model
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="verify the index matches the catalogue; build nothing")
+    args = parser.parse_args()
+
+    docs = get_violation_documents()
+    if args.check:
+        if _load_matrix(docs, GENAI_EMBEDDINGS_MODEL, VIOLATION_INDEX_PATH) is None:
+            raise SystemExit(f"{VIOLATION_INDEX_PATH} is missing or stale; run python -m nodes.violation_index")
+        print(f"{VIOLATION_INDEX_PATH} is up to date")
+        return
+
+    build_index(docs, embeddings_model(GENAI_EMBEDDINGS_MODEL), GENAI_EMBEDDINGS_MODEL)
+    print(f"Wrote {len(docs)} embeddings to {VIOLATION_INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
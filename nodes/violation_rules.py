@@ -0,0 +1,106 @@
+"""
+Deterministic rules that settle clear-cut violation candidates
+
+Each entry in DETECTABLE_VIOLATIONS carries a declarative "rules" dict:
+
+- required: cues that must hold, otherwise the candidate is rejected
+- forbidden: cues that must not hold, otherwise the candidate is rejected
+- accept_when: cues that, together with an overall vision confidence of at
+  least accept_confidence, accept the candidate outright
+
+Anything else is escalated to the LLM validator. Cues are evaluated against
+the ImageAnalysisResult only, the same evidence the validator sees. A result
+reused from a similar image (from_near_hit) has no plate reading of its own,
+so it settles nothing and every candidate is escalated.
+"""
+import re
+import threading
+from collections import Counter
+from typing import Callable, Literal
+from pydantic import BaseModel
+
+from .vision import ImageAnalysisResult
+
+Decision = Literal["accept", "reject", "escalate"]
+
+DEFAULT_RULES = {
+    "required": ["vehicle_detected"],
+    "forbidden": [],
+    "accept_when": ["named_by_vision"],
+    "accept_confidence": 0.9,
+}
+
+_TWO_WHEELER_WORDS = ["two-wheeler", "two wheeler", "motorcycle", "motorbike", "bike", "scooter", "scooty", "moped", "rider", "pillion"]
+_FOUR_WHEELER_WORDS = ["four-wheeler", "four wheeler", "car", "suv", "sedan", "hatchback", "jeep", "taxi", "van"]
+
+
+def _description(analysis: ImageAnalysisResult) -> str:
+    return f"{analysis.title or ''} {analysis.short_description or ''} {analysis.detailed_description or ''}".lower()
+
+
+def _mentions(words: list[str]) -> Callable[[ImageAnalysisResult, str], bool]:
+    pattern = re.compile(r"\b(" + "|".join(re.escape(w) for w in words) + r")s?\b")
+    return lambda analysis, _name: bool(pattern.search(_description(analysis)))
+
+
+CUES: dict[str, Callable[[ImageAnalysisResult, str], bool]] = {
+    "vehicle_detected": lambda a, _name: a.vehicle_detected,
+    "named_by_vision": lambda a, name: name in (a.violations or []),
+    "plate_missing": lambda a, _name: not a.license_plate,
+    "plate_read": lambda a, _name: bool(a.license_plate) and a.license_plate_confidence >= 0.7,
+    "two_wheeler": _mentions(_TWO_WHEELER_WORDS),
+    "four_wheeler": _mentions(_FOUR_WHEELER_WORDS),
+}
+
+
+def cue_holds(cue: str, analysis: ImageAnalysisResult, name: str) -> bool:
+    # "mentions:<word>" matches a word in the title or descriptions
+    if cue.startswith("mentions:"):
+        return _mentions([cue.split(":", 1)[1]])(analysis, name)
+    return CUES[cue](analysis, name)
+
+
+class RuleDecision(BaseModel):
+    decision: Decision
+    reason: str
+
+
+def evaluate(rules: dict, name: str, analysis: ImageAnalysisResult) -> RuleDecision:
+    if analysis.from_near_hit:
+        return RuleDecision(decision="escalate", reason="near_hit")
+    rules = {**DEFAULT_RULES, **(rules or {})}
+    for cue in rules["required"]:
+        if not cue_holds(cue, analysis, name):
+            return RuleDecision(decision="reject", reason=f"required:{cue}")
+    for cue in rules["forbidden"]:
+        if cue_holds(cue, analysis, name):
+            return RuleDecision(decision="reject", reason=f"forbidden:{cue}")
+    if analysis.confidence_score >= rules["accept_confidence"] and all(
+        cue_holds(cue, analysis, name) for cue in rules["accept_when"]
+    ):
+        return RuleDecision(decision="accept", reason="accept_when")
+    return RuleDecision(decision="escalate", reason="ambiguous")
+
+
+class RuleStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits: Counter[str] = Counter()
+
+    def record(self, name: str, decision: RuleDecision):
+        with self._lock:
+            self.hits[f"{name}|{decision.decision}|{decision.reason}"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = dict(self.hits)
+        by_decision: Counter[str] = Counter()
+        per_rule: dict[str, dict[str, int]] = {}
+        for key, count in hits.items():
+            name, decision, reason = key.split("|")
+            by_decision[decision] += count
+            per_rule.setdefault(name, {})[f"{decision}:{reason}"] = count
+        return {"decisions": dict(by_decision), "rules": per_rule}
+
+
+RULE_STATS = RuleStats()
@@ -1,14 +1,21 @@
-from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_core.documents import Document
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.chat_models import init_chat_model
 from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+import asyncio
 import json
+import os
+import re
+import threading
+import weakref
 from .vision import ImageAnalysisResult
+from .violation_index import ViolationIndex, load_or_build_index
+from .violation_rules import RULE_STATS, evaluate
 from config import GENAI_EMBEDDINGS_MODEL, VIOLATION_VALIDATOR_MODEL
-from utils.lazy import structured_chat_model
-from typing import List
+from utils.lazy import embeddings_model, structured_chat_model
+from utils.metrics import timed
+from typing import List, Optional
 
 try:
     from dotenv import load_dotenv
@@ -16,6 +23,11 @@ try:
 except ImportError:
     pass
 
+# "batch": one validator call per report; "per_candidate": one call per candidate, run concurrently
+VIOLATION_VALIDATOR_MODE = os.getenv("VIOLATION_VALIDATOR_MODE", "batch")
+VIOLATION_VALIDATOR_CONCURRENCY = int(os.getenv("VIOLATION_VALIDATOR_CONCURRENCY", "4"))
+VIOLATION_RULES_ENABLED = os.getenv("VIOLATION_RULES_ENABLED", "true").lower() == "true"
+
 DETECTABLE_VIOLATIONS = [
     {
         "id": 1,
@@ -24,7 +36,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Rider or pillion on a two-wheeler is not wearing a helmet.",
         "visible_indicators": ["two-wheeler", "human head", "no helmet object"],
         "fine_amount": 1000,
-        "section": "194D(1)"
+        "section": "194D(1)",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision", "two_wheeler"],
+            "accept_confidence": 0.8
+        }
     },
     {
         "id": 2,
@@ -33,7 +50,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "More than two people riding on a two-wheeler.",
         "visible_indicators": ["two-wheeler", "three persons detected"],
         "fine_amount": 2000,
-        "section": "128(1)/177"
+        "section": "128(1)/177",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision", "two_wheeler"],
+            "accept_confidence": 0.8
+        }
     },
     {
         "id": 3,
@@ -42,7 +64,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Driver or front passenger not wearing a seatbelt in a four-wheeler.",
         "visible_indicators": ["car front seat", "person detected", "no seatbelt strap visible"],
         "fine_amount": 1000,
-        "section": "194B(1)"
+        "section": "194B(1)",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision", "four_wheeler"],
+            "accept_confidence": 0.85
+        }
     },
     {
         "id": 4,
@@ -51,7 +78,13 @@ DETECTABLE_VIOLATIONS = [
         "description": "Vehicle is stopped or moving beyond the stop line while traffic signal is red.",
         "visible_indicators": ["traffic signal showing red", "vehicle beyond stop line"],
         "fine_amount": 5000,
-        "section": "184"
+        "section": "184",
+        "rules": {
+            "forbidden": [],
+            # The signal state is only in the image; a description saying "red" is not evidence of it
+            "accept_when": ["named_by_vision"],
+            "accept_confidence": 0.9
+        }
     },
     {
         "id": 5,
@@ -60,7 +93,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Vehicle seen facing or driving in the wrong direction on a one-way road.",
         "visible_indicators": ["vehicle direction opposite lane marking or signage"],
         "fine_amount": 5000,
-        "section": "184"
+        "section": "184",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision"],
+            "accept_confidence": 0.9
+        }
     },
     {
         "id": 6,
@@ -69,7 +107,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Vehicle has missing, obscured, or tampered number plate.",
         "visible_indicators": ["vehicle detected", "license plate region empty or unclear"],
         "fine_amount": 3000,
-        "section": "50/51/177"
+        "section": "50/51/177",
+        "rules": {
+            "forbidden": ["plate_read"],
+            "accept_when": ["named_by_vision", "plate_missing"],
+            "accept_confidence": 0.7
+        }
     },
     {
         "id": 7,
@@ -78,7 +121,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Vehicle parked in a no-parking zone, on footpath, or obstructing road/pedestrian path.",
         "visible_indicators": ["stationary vehicle", "road markings", "no parking signage or footpath"],
         "fine_amount": 500,
-        "section": "122/177"
+        "section": "122/177",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision"],
+            "accept_confidence": 0.85
+        }
     },
     {
         "id": 8,
@@ -87,7 +135,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Vehicle visibly carrying excessive goods or passengers beyond permitted capacity.",
         "visible_indicators": ["goods stacked high", "too many passengers visible"],
         "fine_amount": 20000,
-        "section": "194(1)"
+        "section": "194(1)",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision"],
+            "accept_confidence": 0.85
+        }
     },
     {
         "id": 9,
@@ -96,7 +149,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Vehicle parked in a way that blocks other vehicles, driveways, or crosswalks.",
         "visible_indicators": ["vehicle blocking another vehicle or gate"],
         "fine_amount": 500,
-        "section": "122/177"
+        "section": "122/177",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision"],
+            "accept_confidence": 0.85
+        }
     },
     {
         "id": 10,
@@ -105,7 +163,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Number plate covered, painted, or altered to hide registration details.",
         "visible_indicators": ["plate present but illegible or blurred intentionally"],
         "fine_amount": 3000,
-        "section": "50/51/177"
+        "section": "50/51/177",
+        "rules": {
+            "forbidden": ["plate_read"],
+            "accept_when": ["named_by_vision"],
+            "accept_confidence": 0.85
+        }
     },
     {
         "id": 11,
@@ -114,7 +177,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Vehicle straddling lane markings or encroaching into other lanes improperly.",
         "visible_indicators": ["vehicle crossing lane boundary without indication"],
         "fine_amount": 2000,
-        "section": "184"
+        "section": "184",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision"],
+            "accept_confidence": 0.9
+        }
     },
     {
         "id": 12,
@@ -123,7 +191,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Two-wheeler missing one or both rearview mirrors.",
         "visible_indicators": ["handlebar detected", "mirrors missing on both sides"],
         "fine_amount": 1000,
-        "section": "177"
+        "section": "177",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision", "two_wheeler"],
+            "accept_confidence": 0.85
+        }
     },
     {
         "id": 13,
@@ -132,7 +205,12 @@ DETECTABLE_VIOLATIONS = [
         "description": "Vehicle modified in violation of standard design, e.g., tinted windows, loud exhaust, or altered lights.",
         "visible_indicators": ["dark window tint", "unusual exhaust or lights"],
         "fine_amount": 5000,
-        "section": "190(2)"
+        "section": "190(2)",
+        "rules": {
+            "forbidden": [],
+            "accept_when": ["named_by_vision"],
+            "accept_confidence": 0.9
+        }
     }
 ]
 
@@ -156,20 +234,39 @@ def create_violation_document(violation: dict) -> Document:
     
     return Document(page_content=text_content, metadata=metadata)
 
-_VECTOR_STORE: InMemoryVectorStore | None = None
+def get_violation_documents() -> list[Document]:
+    return [create_violation_document(v) for v in DETECTABLE_VIOLATIONS]
 
 
-def get_vector_store() -> InMemoryVectorStore:
+_VECTOR_STORE: ViolationIndex | None = None
+_VECTOR_STORE_LOCK = threading.Lock()
+# asyncio.Lock binds to the loop that first waits on it; keep one per loop
+_vector_store_loop_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def get_vector_store() -> ViolationIndex:
     global _VECTOR_STORE
     if _VECTOR_STORE is not None:
         return _VECTOR_STORE
-    emb = GoogleGenerativeAIEmbeddings(model=GENAI_EMBEDDINGS_MODEL)
-    store = InMemoryVectorStore(emb)
-    store.add_documents(documents=[create_violation_document(v) for v in DETECTABLE_VIOLATIONS])
-    _VECTOR_STORE = store
+    # Worker threads and other loops share one load (or rebuild) instead of racing
+    with _VECTOR_STORE_LOCK:
+        if _VECTOR_STORE is None:
+            _VECTOR_STORE = load_or_build_index(
+                get_violation_documents(),
+                embeddings_model(GENAI_EMBEDDINGS_MODEL),
+                GENAI_EMBEDDINGS_MODEL,
+            )
     return _VECTOR_STORE
 
 
+async def aget_vector_store() -> ViolationIndex:
+    if _VECTOR_STORE is not None:
+        return _VECTOR_STORE
+    # Concurrent cold-start requests on a loop wait here rather than each holding a thread on the lock above
+    async with _vector_store_loop_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock()):
+        return await asyncio.to_thread(get_vector_store)
+
+
 class ViolationsResult(BaseModel):
     id: int = Field(description="Unique identifier for the violation.")
     name: str = Field(description="Name of the traffic violation.")
@@ -181,12 +278,25 @@ class ViolationsResult(BaseModel):
 class ValidationResult(BaseModel):
     is_valid: bool = Field(description="Indicates if the given violation is applicable for the given scenario.")
 
+
+class ViolationVerdict(BaseModel):
+    id: int = Field(description="Identifier of the candidate violation this verdict is for.")
+    is_valid: bool = Field(description="Indicates if this violation is applicable for the given scenario.")
+
+
+class BatchValidationResult(BaseModel):
+    verdicts: list[ViolationVerdict] = Field(description="One verdict per candidate violation.")
+
 def get_validator():
     return structured_chat_model(VIOLATION_VALIDATOR_MODEL, ValidationResult)
 
 
-def validate_violation(violation_data: ViolationsResult, analysis_result: ImageAnalysisResult) -> bool:
-    return get_validator().invoke([
+def get_batch_validator():
+    return structured_chat_model(VIOLATION_VALIDATOR_MODEL, BatchValidationResult)
+
+
+def _validation_messages(violation_data: ViolationsResult, analysis_result: ImageAnalysisResult) -> list:
+    return [
         {
             "role": "system",
             "content": f"You are an expert traffic violation validator. Given the violation name '{violation_data.name}' and the analysis result, determine if the violation is valid."
@@ -195,7 +305,40 @@ def validate_violation(violation_data: ViolationsResult, analysis_result: ImageA
             "role": "user",
             "content": f"Analysis Result: {analysis_result.model_dump_json()}\nIs the violation: {violation_data.model_dump_json()} applicable?"
         }
-    ]).is_valid
+    ]
+
+
+def validate_violation(violation_data: ViolationsResult, analysis_result: ImageAnalysisResult) -> bool:
+    return get_validator().invoke(_validation_messages(violation_data, analysis_result)).is_valid
+
+
+async def avalidate_violation(violation_data: ViolationsResult, analysis_result: ImageAnalysisResult) -> bool:
+    result = await get_validator().ainvoke(_validation_messages(violation_data, analysis_result))
+    return result.is_valid
+
+
+def _batch_validation_messages(candidates: list[ViolationsResult], analysis_result: ImageAnalysisResult) -> list:
+    return [
+        {
+            "role": "system",
+            "content": "You are an expert traffic violation validator. Given the analysis result and a list of candidate violations, determine for each candidate whether the violation is valid. Return exactly one verdict per candidate id."
+        },
+        {
+            "role": "user",
+            "content": f"Analysis Result: {analysis_result.model_dump_json()}\nCandidate violations: {json.dumps([c.model_dump() for c in candidates])}\nWhich of these violations are applicable?"
+        }
+    ]
+
+
+def validate_violations(candidates: list[ViolationsResult], analysis_result: ImageAnalysisResult) -> dict[int, bool]:
+    """Verdicts for all candidates from a single validator call, keyed by violation id"""
+    result = get_batch_validator().invoke(_batch_validation_messages(candidates, analysis_result))
+    return {v.id: v.is_valid for v in result.verdicts}
+
+
+async def avalidate_violations(candidates: list[ViolationsResult], analysis_result: ImageAnalysisResult) -> dict[int, bool]:
+    result = await get_batch_validator().ainvoke(_batch_validation_messages(candidates, analysis_result))
+    return {v.id: v.is_valid for v in result.verdicts}
      
 def _allowed_violation_names() -> List[str]:
     return [v["name"] for v in DETECTABLE_VIOLATIONS]
@@ -238,39 +381,264 @@ def _candidates_from_text(text: str) -> List[str]:
     return list(chosen)
 
 
-def match_violations(analysis_result: ImageAnalysisResult) -> list[ViolationsResult]:
+def _violation_names(analysis_result: ImageAnalysisResult) -> List[str]:
     if not analysis_result.vehicle_detected or not analysis_result.is_violation:
         return []
 
     # Prefer model-provided violations; if missing, derive from descriptions
-    violation_names: List[str] = []
     if analysis_result.violations:
-        violation_names = list(analysis_result.violations)
-    else:
-        combined = f"{analysis_result.short_description or ''} \n {analysis_result.detailed_description or ''}"
-        violation_names = _candidates_from_text(combined)
+        return list(analysis_result.violations)
+    combined = f"{analysis_result.short_description or ''} \n {analysis_result.detailed_description or ''}"
+    return _candidates_from_text(combined)
 
-    if not violation_names:
-        return []
 
-    matched_violations: list[ViolationsResult] = []
-    store = get_vector_store()
-    for violation in violation_names:
-        try:
-            docs = store.similarity_search(violation, k=2)
-        except Exception:
-            docs = []
-        for doc in docs:
-            violation_data = ViolationsResult.model_validate(json.loads(doc.metadata["violation_data"]))
+def _lookup_key(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+@lru_cache(maxsize=1)
+def _catalogue_lookup() -> dict[str, ViolationsResult]:
+    """Canonical names, ids, names without their parenthetical and synonyms"""
+    by_name = {v["name"]: ViolationsResult.model_validate(v) for v in DETECTABLE_VIOLATIONS}
+    lookup: dict[str, ViolationsResult] = {}
+    for synonym, name in _SYNONYM_MAP.items():
+        lookup[_lookup_key(synonym)] = by_name[name]
+    for name, violation in by_name.items():
+        lookup[_lookup_key(re.sub(r"\s*\(.*?\)", "", name))] = violation
+        lookup[_lookup_key(violation.id)] = violation
+        lookup[_lookup_key(name)] = violation
+    return lookup
+
+
+def resolve_violation(name: str) -> Optional[ViolationsResult]:
+    """Catalogue entry for an exact name, id or synonym, without any embedding call"""
+    violation = _catalogue_lookup().get(_lookup_key(name))
+    return violation.model_copy() if violation else None
+
+
+class MatchStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reports = 0
+        self.catalogue_hits = 0
+        self.semantic_lookups = 0
+        self.remote_embedding_calls = 0
+        self.embedding_calls_per_report: dict[str, int] = {"0": 0, "1": 0, "2": 0, "3+": 0}
+        self.validated_reports = 0
+        self.validator_calls = 0
+        self.batch_fallbacks = 0
+        self.validator_calls_per_report: dict[str, int] = {"0": 0, "1": 0, "2": 0, "3": 0, "4+": 0}
+
+    @staticmethod
+    def _bucket(histogram: dict[str, int], value: int):
+        top = len(histogram) - 1
+        histogram[str(value) if value < top else f"{top}+"] += 1
+
+    def record(self, catalogue_hits: int, semantic_lookups: int, remote_calls: int):
+        with self._lock:
+            self.reports += 1
+            self.catalogue_hits += catalogue_hits
+            self.semantic_lookups += semantic_lookups
+            self.remote_embedding_calls += remote_calls
+            self._bucket(self.embedding_calls_per_report, remote_calls)
+
+    def record_validation(self, calls: int, batch_fallback: bool = False):
+        with self._lock:
+            self.validated_reports += 1
+            self.validator_calls += calls
+            self.batch_fallbacks += batch_fallback
+            self._bucket(self.validator_calls_per_report, calls)
+
+    def stats(self) -> dict:
+        return {
+            "reports": self.reports,
+            "catalogue_hits": self.catalogue_hits,
+            "semantic_lookups": self.semantic_lookups,
+            "remote_embedding_calls": self.remote_embedding_calls,
+            "remote_embedding_calls_per_report": round(self.remote_embedding_calls / self.reports, 4) if self.reports else 0.0,
+            "embedding_calls_per_report": dict(self.embedding_calls_per_report),
+            "validator_mode": VIOLATION_VALIDATOR_MODE,
+            "validator_calls": self.validator_calls,
+            "validator_calls_per_report": round(self.validator_calls / self.validated_reports, 4) if self.validated_reports else 0.0,
+            "validator_calls_histogram": dict(self.validator_calls_per_report),
+            "batch_fallbacks": self.batch_fallbacks,
+        }
+
+
+MATCH_STATS = MatchStats()
+
+
+def _doc_violation(doc: Document) -> ViolationsResult:
+    return ViolationsResult.model_validate(json.loads(doc.metadata["violation_data"]))
+
+
+def _dedupe(violations: list[ViolationsResult]) -> list[ViolationsResult]:
+    unique: dict[int, ViolationsResult] = {}
+    for v in violations:
+        unique.setdefault(v.id, v)
+    return list(unique.values())
+
+
+@timed("violation_search")
+def _candidate_violations(violation_names: List[str]) -> list[ViolationsResult]:
+    candidates: list[ViolationsResult] = []
+    unresolved = []
+    for name in violation_names:
+        resolved = resolve_violation(name)
+        if resolved:
+            candidates.append(resolved)
+        else:
+            unresolved.append(name)
+
+    remote_calls = 0
+    if unresolved:
+        store = get_vector_store()
+        for name in unresolved:
+            try:
+                vector, remote = store.query_vector(name)
+                remote_calls += remote
+                candidates.extend(_doc_violation(d) for d in store.similarity_search_by_vector(vector, k=2))
+            except Exception:
+                pass
+
+    MATCH_STATS.record(len(violation_names) - len(unresolved), len(unresolved), remote_calls)
+    return _dedupe(candidates)
+
+
+@timed("violation_search")
+async def _acandidate_violations(violation_names: List[str]) -> list[ViolationsResult]:
+    candidates: list[ViolationsResult] = []
+    unresolved = []
+    for name in violation_names:
+        resolved = resolve_violation(name)
+        if resolved:
+            candidates.append(resolved)
+        else:
+            unresolved.append(name)
+
+    remote_calls = 0
+    if unresolved:
+        store = await aget_vector_store()
+        for name in unresolved:
             try:
-                is_valid = validate_violation(violation_data, analysis_result)
+                vector, remote = await store.aquery_vector(name)
+                remote_calls += remote
+                candidates.extend(_doc_violation(d) for d in store.similarity_search_by_vector(vector, k=2))
             except Exception:
-                # If validator fails (e.g., network/model), fall back to heuristic accept
-                is_valid = True
-            if is_valid and all(v.name != violation_data.name for v in matched_violations):
-                matched_violations.append(violation_data)
+                pass
+
+    MATCH_STATS.record(len(violation_names) - len(unresolved), len(unresolved), remote_calls)
+    return _dedupe(candidates)
+
+
+def _validate_one(violation_data: ViolationsResult, analysis_result: ImageAnalysisResult) -> bool:
+    try:
+        return validate_violation(violation_data, analysis_result)
+    except Exception:
+        # If validator fails (e.g., network/model), fall back to heuristic accept
+        return True
+
+
+async def _avalidate_one(violation_data: ViolationsResult, analysis_result: ImageAnalysisResult) -> bool:
+    try:
+        return await avalidate_violation(violation_data, analysis_result)
+    except Exception:
+        return True
+
 
-    return matched_violations
+_VALIDATOR_POOL = ThreadPoolExecutor(max_workers=VIOLATION_VALIDATOR_CONCURRENCY, thread_name_prefix="validator")
+
+
+@timed("violation_validation")
+def _validate_candidates(candidates: list[ViolationsResult], analysis_result: ImageAnalysisResult) -> list[ViolationsResult]:
+    verdicts: dict[int, bool] = {}
+    calls = 0
+    batched = VIOLATION_VALIDATOR_MODE == "batch" and len(candidates) > 1
+    if batched:
+        calls += 1
+        try:
+            verdicts = validate_violations(candidates, analysis_result)
+        except Exception:
+            pass
+
+    # Per-candidate calls for anything the batch call did not settle, run concurrently
+    pending = [c for c in candidates if c.id not in verdicts]
+    # A failed, empty or partial batch answer all leave candidates to validate one by one
+    fallback = batched and bool(pending)
+    for candidate, is_valid in zip(pending, _VALIDATOR_POOL.map(lambda c: _validate_one(c, analysis_result), pending)):
+        verdicts[candidate.id] = is_valid
+    calls += len(pending)
+
+    MATCH_STATS.record_validation(calls, fallback)
+    return [c for c in candidates if verdicts[c.id]]
+
+
+@timed("violation_validation")
+async def _avalidate_candidates(candidates: list[ViolationsResult], analysis_result: ImageAnalysisResult) -> list[ViolationsResult]:
+    verdicts: dict[int, bool] = {}
+    calls = 0
+    batched = VIOLATION_VALIDATOR_MODE == "batch" and len(candidates) > 1
+    if batched:
+        calls += 1
+        try:
+            verdicts = await avalidate_violations(candidates, analysis_result)
+        except Exception:
+            pass
+
+    pending = [c for c in candidates if c.id not in verdicts]
+    # A failed, empty or partial batch answer all leave candidates to validate one by one
+    fallback = batched and bool(pending)
+    results = await asyncio.gather(*[_avalidate_one(c, analysis_result) for c in pending])
+    verdicts.update({c.id: is_valid for c, is_valid in zip(pending, results)})
+    calls += len(pending)
+
+    MATCH_STATS.record_validation(calls, fallback)
+    return [c for c in candidates if verdicts[c.id]]
+
+
+def apply_rules(candidates: list[ViolationsResult], analysis_result: ImageAnalysisResult) -> tuple[list[ViolationsResult], list[ViolationsResult]]:
+    """
+    Settle candidates with the catalogue rules. Returns the accepted
+    candidates and those that still need the LLM validator.
+    """
+    if not VIOLATION_RULES_ENABLED:
+        return [], candidates
+    rules_by_id = {v["id"]: v.get("rules") for v in DETECTABLE_VIOLATIONS}
+    accepted, escalated = [], []
+    for candidate in candidates:
+        decision = evaluate(rules_by_id.get(candidate.id), candidate.name, analysis_result)
+        RULE_STATS.record(candidate.name, decision)
+        if decision.decision == "accept":
+            accepted.append(candidate)
+        elif decision.decision == "escalate":
+            escalated.append(candidate)
+    return accepted, escalated
+
+
+def match_violations(analysis_result: ImageAnalysisResult) -> list[ViolationsResult]:
+    violation_names = _violation_names(analysis_result)
+    if not violation_names:
+        return []
+
+    candidates = _candidate_violations(violation_names)
+    if not candidates:
+        return []
+    accepted, escalated = apply_rules(candidates, analysis_result)
+    valid_ids = {c.id for c in accepted + _validate_candidates(escalated, analysis_result)}
+    return [c for c in candidates if c.id in valid_ids]
+
+
+async def amatch_violations(analysis_result: ImageAnalysisResult) -> list[ViolationsResult]:
+    violation_names = _violation_names(analysis_result)
+    if not violation_names:
+        return []
+
+    candidates = await _acandidate_violations(violation_names)
+    if not candidates:
+        return []
+    accepted, escalated = apply_rules(candidates, analysis_result)
+    valid_ids = {c.id for c in accepted + await _avalidate_candidates(escalated, analysis_result)}
+    return [c for c in candidates if c.id in valid_ids]
 
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
+import asyncio
 from langchain.chat_models import init_chat_model
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 from typing import Optional
 
 try:
@@ -8,7 +10,9 @@ try:
 except ImportError:
     pass
 from config import VISION_MODEL
+from utils.analysis_cache import ANALYSIS_CACHE_ENABLED, get_analysis_cache
 from utils.lazy import structured_chat_model
+from utils.metrics import timed
 
 class ImageAnalysisResult(BaseModel):
     vehicle_detected: bool = Field(description="Indicates if a vehicle is detected in the image.")
@@ -22,13 +26,16 @@ class ImageAnalysisResult(BaseModel):
     detailed_description: Optional[str] = Field(description="A detailed description of the traffic violation(s), if any.")
     violations: Optional[list[str]] = Field(description="A list of specific traffic violations detected in the image, if any.")
     confidence_score: float = Field(description="Confidence score of the entire analysis, ranging from 0 to 1.")
+    # Set by the analysis cache, never by the model (kept out of the response schema): the
+    # result was reused from a perceptually similar image and its plate fields are blank
+    from_near_hit: SkipJsonSchema[bool] = False
 
 
 def get_structured_model():
     return structured_chat_model(VISION_MODEL, ImageAnalysisResult)
 
 
-def analyse_image(image_url: str):
+def _build_messages(image_url: str, plate_crop_url: Optional[str] = None) -> list:
      system_prompt = """You are an expert AI traffic violation detection system specialized in analyzing images from Indian roads and traffic scenarios.
 
 Your task is to:
@@ -76,7 +83,46 @@ Return data that conforms strictly to the response schema fields.
                 ],
           },
      ]
-     return get_structured_model().invoke(message)
+     if plate_crop_url:
+          message[1]["content"] += [
+               {"type": "text", "text": "Higher-resolution crop of the lower part of the same image, for reading the license plate:"},
+               {"type": "image_url", "image_url": plate_crop_url},
+          ]
+     return message
+
+
+# A perceptually similar image may show a different plate; never reuse a plate read across
+# images, and mark the result so rules and summaries do not read the blank plate as evidence
+_NEAR_HIT_OVERRIDES = {"license_plate": None, "license_plate_confidence": 0.0, "from_near_hit": True}
+
+
+@timed("vision")
+def analyse_image(image_url: str, plate_crop_url: Optional[str] = None):
+     if not ANALYSIS_CACHE_ENABLED:
+          return get_structured_model().invoke(_build_messages(image_url, plate_crop_url))
+
+     cache = get_analysis_cache()
+     cached, fingerprint = cache.lookup(image_url, plate_crop_url, _NEAR_HIT_OVERRIDES)
+     if cached is not None:
+          return cached
+     result = get_structured_model().invoke(_build_messages(image_url, plate_crop_url))
+     cache.store(fingerprint, result)
+     return result
+
+
+@timed("vision")
+async def aanalyse_image(image_url: str, plate_crop_url: Optional[str] = None):
+     if not ANALYSIS_CACHE_ENABLED:
+          return await get_structured_model().ainvoke(_build_messages(image_url, plate_crop_url))
+
+     cache = get_analysis_cache()
+     # Hashing decodes the image, which is CPU work that should not block the loop
+     cached, fingerprint = await asyncio.to_thread(cache.lookup, image_url, plate_crop_url, _NEAR_HIT_OVERRIDES)
+     if cached is not None:
+          return cached
+     result = await get_structured_model().ainvoke(_build_messages(image_url, plate_crop_url))
+     cache.store(fingerprint, result)
+     return result
 
 
 if __name__ == "__main__":
@@ -1,22 +1,25 @@
 import sys
-import base64
 import mimetypes
 from pathlib import Path
 
 from main import chain
+from utils.images import NormalizedImage, normalize_image
 
 
-def file_to_data_uri(path: Path) -> str:
+def file_to_image(path: Path) -> NormalizedImage:
     mime, _ = mimetypes.guess_type(path.name)
     if not mime:
         mime = "application/octet-stream"
-    b = path.read_bytes()
-    b64 = base64.b64encode(b).decode("utf-8")
-    return f"data:{mime};base64,{b64}"
+    return normalize_image(path.read_bytes(), mime)
+
+
+def file_to_data_uri(path: Path) -> str:
+    return file_to_image(path).data_uri
 
 
 def main():
     arg = sys.argv[1] if len(sys.argv) > 1 else "input.jpg"
+    plate_crop_image = None
     if arg.startswith("http://") or arg.startswith("https://") or arg.startswith("data:"):
         image_ref = arg
     else:
@@ -24,10 +27,12 @@ def main():
         if not p.exists():
             print(f"File not found: {p}")
             sys.exit(1)
-        image_ref = file_to_data_uri(p)
+        image = file_to_image(p)
+        image_ref = image.data_uri
+        plate_crop_image = image.plate_crop_uri
 
     print("Invoking chain...\n")
-    res = chain.invoke(image_ref)
+    res = chain.invoke({"image_url": image_ref, "plate_crop_image": plate_crop_image})
     print("\n=== Result ===\n")
     print(res)
 
@@ -0,0 +1,18 @@
+import argparse
+import asyncio
+
+from utils.worker import QUEUE_CONCURRENCY, run_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consume the ThirdEye work queue")
+    parser.add_argument("--concurrency", type=int, default=QUEUE_CONCURRENCY)
+    parser.add_argument("--drain", action="store_true", help="exit once the queue is empty")
+    args = parser.parse_args()
+
+    print(f"Starting worker with concurrency {args.concurrency}...\n")
+    asyncio.run(run_worker(concurrency=args.concurrency, stop_when_idle=args.drain))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, APIRouter, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
 from dotenv import load_dotenv
 from api.v1.health import router as health_router
+from api.v1.metrics import router as metrics_router
 from api.v1.reports import router as reports_router
 from api.v1.analyze import router as analyze_router
 from api.v1.admin import router as admin_router
+from api.v1.images import router as images_router
 from api.v1.webhook.whatsapp import router as webhook_router
+from nodes.report_store import get_report_store
+from utils.worker import WORKER_MODE, drain_queue
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Probe the report table's columns before the first report; if this fails the first insert retries it
+    try:
+        await asyncio.to_thread(get_report_store().columns)
+    except Exception as e:
+        print(f"Report schema probe failed: {e}")
+    # Inline mode has no worker process: pick up jobs left over from before a restart
+    drain = asyncio.create_task(drain_queue()) if WORKER_MODE == "inline" else None
+    yield
+    if drain is not None:
+        drain.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 api_router = APIRouter(prefix="/api/v1")
 api_router.include_router(health_router)
+api_router.include_router(metrics_router)
 api_router.include_router(reports_router)
 api_router.include_router(analyze_router)
 api_router.include_router(admin_router)
+api_router.include_router(images_router)
 api_router.include_router(webhook_router)
 app.include_router(api_router)
 
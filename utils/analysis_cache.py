@@ -0,0 +1,202 @@
+"""
+Content-addressed cache for vision analysis results
+
+Entries are keyed on the SHA-256 of the image bytes (and of the plate crop
+sent with it) plus a 64-bit perceptual hash (pHash), so a forwarded or
+re-encoded copy of an image already analysed is answered without another
+vision model call. A perceptual near-hit is only a similar image, so callers
+can have detail-dependent fields reset on it. Perceptual matching needs
+Pillow; without it only exact copies hit.
+"""
+import os
+import base64
+import binascii
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+import numpy as np
+from pydantic import BaseModel
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024"))
+ANALYSIS_CACHE_TTL_SECONDS = float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "86400"))
+# Maximum differing bits (out of 64) for two pHashes to count as the same image
+ANALYSIS_CACHE_HAMMING_THRESHOLD = int(os.getenv("ANALYSIS_CACHE_HAMMING_THRESHOLD", "6"))
+
+_PHASH_SIZE = 32
+_PHASH_LOW_FREQ = 8
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+
+_DCT = _dct_matrix(_PHASH_SIZE)
+
+
+class ImageFingerprint(BaseModel):
+    sha256: str
+    phash: Optional[int] = None
+    plate_crop_sha256: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.sha256}:{self.plate_crop_sha256 or ''}"
+
+
+def data_uri_bytes(image_url: str) -> Optional[bytes]:
+    if not image_url.startswith("data:") or ";base64," not in image_url:
+        return None
+    try:
+        return base64.b64decode(image_url.split(";base64,", 1)[1])
+    except (binascii.Error, ValueError):
+        return None
+
+
+def phash(data: bytes) -> Optional[int]:
+    """
+    64-bit DCT perceptual hash: low-frequency DCT coefficients of a 32x32
+    greyscale thumbnail, thresholded at their median
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            gray = img.convert("L").resize((_PHASH_SIZE, _PHASH_SIZE), Image.Resampling.LANCZOS)
+    except Exception:
+        return None
+    pixels = np.asarray(gray, dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:_PHASH_LOW_FREQ, :_PHASH_LOW_FREQ].flatten()
+    # The DC term only encodes average brightness
+    bits = low > np.median(low[1:])
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def _sha256(url: str) -> str:
+    # Remote URLs can only be matched exactly on the URL itself
+    data = data_uri_bytes(url)
+    return hashlib.sha256(data if data is not None else url.encode("utf-8")).hexdigest()
+
+
+def fingerprint(image_url: str, plate_crop_url: Optional[str] = None) -> ImageFingerprint:
+    data = data_uri_bytes(image_url)
+    return ImageFingerprint(
+        sha256=_sha256(image_url),
+        phash=phash(data) if data is not None else None,
+        plate_crop_sha256=_sha256(plate_crop_url) if plate_crop_url else None,
+    )
+
+
+class _Entry(BaseModel):
+    fingerprint: ImageFingerprint
+    result: BaseModel
+    stored_at: float
+
+
+class AnalysisCache:
+    def __init__(
+        self,
+        max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = ANALYSIS_CACHE_TTL_SECONDS,
+        hamming_threshold: int = ANALYSIS_CACHE_HAMMING_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hamming_threshold = hamming_threshold
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expire(self, now: float):
+        for key in [k for k, e in self._entries.items() if e.stored_at <= now - self.ttl_seconds]:
+            del self._entries[key]
+            self.evictions += 1
+
+    def _nearest(self, phash_value: int) -> Optional[str]:
+        best_key, best_distance = None, self.hamming_threshold + 1
+        for key, entry in self._entries.items():
+            if entry.fingerprint.phash is None:
+                continue
+            distance = (entry.fingerprint.phash ^ phash_value).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def lookup(
+        self,
+        image_url: str,
+        plate_crop_url: Optional[str] = None,
+        near_hit_overrides: Optional[dict] = None,
+    ) -> tuple[Optional[BaseModel], ImageFingerprint]:
+        """
+        Return the cached result for this image (or a near-identical one)
+        along with its fingerprint, which store() takes on a miss. On a
+        near-identical hit the fields in near_hit_overrides are replaced.
+        """
+        fp = fingerprint(image_url, plate_crop_url)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            key = fp.key if fp.key in self._entries else None
+            overrides = None
+            if key is None and fp.phash is not None:
+                key = self._nearest(fp.phash)
+                if key is not None:
+                    self.near_hits += 1
+                    overrides = near_hit_overrides
+            elif key is not None:
+                self.hits += 1
+            if key is None:
+                self.misses += 1
+                return None, fp
+            self._entries.move_to_end(key)
+            return self._entries[key].result.model_copy(update=overrides, deep=True), fp
+
+    def store(self, fp: ImageFingerprint, result: BaseModel) -> None:
+        with self._lock:
+            self._entries[fp.key] = _Entry(fingerprint=fp, result=result.model_copy(deep=True), stored_at=time.time())
+            self._entries.move_to_end(fp.key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "enabled": ANALYSIS_CACHE_ENABLED,
+            "perceptual_hashing": Image is not None,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            "model_calls_saved": self.hits + self.near_hits,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_analysis_cache() -> AnalysisCache:
+    return AnalysisCache()
@@ -0,0 +1,256 @@
+"""
+Content-addressed storage for reported images
+
+Images are keyed by the SHA-256 of their bytes, so the same photo reported
+twice is stored once, and a JPEG thumbnail is written next to it at ingest.
+violation_reports.reported_image then holds the image key instead of a
+base64 data URI, and both files are served from /api/v1/images/{key} with
+immutable caching. BLOB_STORE selects "local" (files under BLOB_PATH) or
+"supabase" (the BLOB_BUCKET Supabase Storage bucket). It defaults to
+"supabase" when Supabase credentials are configured, since a serverless
+filesystem cannot hold local files, and to "local" otherwise.
+
+Move existing data-URI rows into the store with: python -m utils.blobs --migrate
+"""
+import os
+import base64
+import hashlib
+import io
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from pydantic import BaseModel
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+BLOB_STORE = os.getenv("BLOB_STORE") or (
+    "supabase" if os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_SERVICE_ROLE_KEY") else "local"
+)
+BLOB_PATH = os.getenv("BLOB_PATH", "blobs")
+BLOB_BUCKET = os.getenv("BLOB_BUCKET", "report-images")
+THUMBNAIL_MAX_SIDE = int(os.getenv("THUMBNAIL_MAX_SIDE", "320"))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "75"))
+
+IMAGE_ROUTE = "/api/v1/images"
+
+_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/gif": "gif"}
+_CONTENT_TYPES = {ext: mime for mime, ext in _EXTENSIONS.items()}
+KEY_PATTERN = re.compile(r"^(images|thumbs)/([0-9a-f]{64})\.(jpg|png|webp|gif)$")
+
+
+class StoredImage(BaseModel):
+    key: str
+    thumbnail_key: Optional[str] = None
+
+
+def content_type_for(key: str) -> str:
+    return _CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def is_blob_key(value: Optional[str]) -> bool:
+    return bool(value) and KEY_PATTERN.match(value) is not None
+
+
+def thumbnail_key_for(key: str) -> str:
+    # Thumbnails are always JPEG and share the source image's digest
+    return f"thumbs/{KEY_PATTERN.match(key).group(2)}.jpg"
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str = BLOB_PATH):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial file
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+
+class SupabaseBlobStore(BlobStore):
+    def __init__(self, bucket: str = BLOB_BUCKET):
+        self.bucket = bucket
+
+    def _bucket(self):
+        from nodes.supabase_store import get_supabase_client
+
+        return get_supabase_client().storage.from_(self.bucket)
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        self._bucket().upload(
+            key,
+            data,
+            {"content-type": content_type, "cache-control": "31536000", "upsert": "true"},
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._bucket().download(key)
+        except Exception:
+            return None
+
+    def exists(self, key: str) -> bool:
+        return bool(self._bucket().exists(key))
+
+
+@lru_cache(maxsize=1)
+def get_blob_store() -> BlobStore:
+    if BLOB_STORE == "local":
+        return LocalBlobStore()
+    if BLOB_STORE == "supabase":
+        return SupabaseBlobStore()
+    raise ValueError(f"Unknown BLOB_STORE backend: {BLOB_STORE}")
+
+
+def decode_data_uri(data_uri: str) -> tuple[bytes, str]:
+    header, _, b64 = data_uri.partition(",")
+    content_type = header[len("data:"):].split(";", 1)[0] or "application/octet-stream"
+    return base64.b64decode(b64), content_type
+
+
+def make_thumbnail(data: bytes, max_side: int = THUMBNAIL_MAX_SIDE, quality: int = THUMBNAIL_QUALITY) -> Optional[bytes]:
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as src:
+            src.draft("RGB", (max_side, max_side))
+            img = ImageOps.exif_transpose(src).convert("RGB")
+    except Exception:
+        return None
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def store_image(data: bytes, content_type: str, store: Optional[BlobStore] = None) -> StoredImage:
+    """Store an image and its thumbnail; already stored images are not rewritten"""
+    store = store or get_blob_store()
+    digest = hashlib.sha256(data).hexdigest()
+    key = f"images/{digest}.{_EXTENSIONS.get(content_type, 'jpg')}"
+    thumbnail_key = thumbnail_key_for(key)
+
+    if not store.exists(key):
+        store.put(key, data, content_type)
+    if store.exists(thumbnail_key):
+        return StoredImage(key=key, thumbnail_key=thumbnail_key)
+    thumbnail = make_thumbnail(data)
+    if thumbnail is None:
+        return StoredImage(key=key)
+    store.put(thumbnail_key, thumbnail, "image/jpeg")
+    return StoredImage(key=key, thumbnail_key=thumbnail_key)
+
+
+def store_data_uri(data_uri: str, store: Optional[BlobStore] = None) -> StoredImage:
+    data, content_type = decode_data_uri(data_uri)
+    return store_image(data, content_type, store)
+
+
+def image_urls(reported_image: Optional[str]) -> dict:
+    """image_url and thumbnail_url for a row's reported_image, whatever form it is in"""
+    if is_blob_key(reported_image):
+        return {
+            "image_url": f"{IMAGE_ROUTE}/{reported_image}",
+            "thumbnail_url": f"{IMAGE_ROUTE}/{thumbnail_key_for(reported_image)}",
+        }
+    # Rows not yet migrated still carry a data URI (or an external URL)
+    return {"image_url": reported_image, "thumbnail_url": reported_image}
+
+
+def with_image_urls(row: dict) -> dict:
+    if "reported_image" not in row:
+        return row
+    return {**row, **image_urls(row["reported_image"])}
+
+
+def with_listing_urls(row: dict) -> dict:
+    """Like with_image_urls, but drops reported_image and any inline data URI"""
+    row = dict(row)
+    reported_image = row.pop("reported_image", None)
+    if is_blob_key(reported_image):
+        row.update(image_urls(reported_image))
+    else:
+        row.update(image_url=None, thumbnail_url=None)
+    return row
+
+
+def migrate_reports(batch_size: int = 50, dry_run: bool = False) -> int:
+    """Move data-URI images in violation_reports into the blob store, batch by batch"""
+    from nodes.supabase_store import get_supabase_client
+
+    supabase = get_supabase_client()
+    migrated = 0
+    last_id = 0
+    while True:
+        rows = (
+            supabase.table("violation_reports")
+            .select("id,reported_image")
+            .like("reported_image", "data:%")
+            .gt("id", last_id)
+            .order("id")
+            .limit(batch_size)
+            .execute()
+        ).data or []
+        if not rows:
+            return migrated
+        for row in rows:
+            last_id = row["id"]
+            stored = store_data_uri(row["reported_image"]) if not dry_run else None
+            if stored:
+                supabase.table("violation_reports").update({"reported_image": stored.key}).eq("id", row["id"]).execute()
+            migrated += 1
+        print(f"{'found' if dry_run else 'migrated'} {migrated} images (last id {last_id})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Blob store maintenance")
+    parser.add_argument("--migrate", action="store_true", help="move data-URI images out of violation_reports")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if args.migrate:
+        count = migrate_reports(args.batch_size, args.dry_run)
+        print(f"Done: {count} reports {'to migrate' if args.dry_run else 'migrated'} to the {BLOB_STORE} blob store")
+    else:
+        parser.print_help()
@@ -0,0 +1,182 @@
+"""
+Streaming export of violation_reports
+
+Rows are read in keyset batches of EXPORT_BATCH_SIZE (the same cursor as the
+admin listing) and each batch is encoded and sent before the next is read,
+so memory stays at one batch whatever the table size. Keep the batch below
+the PostgREST max-rows cap (1000 on Supabase by default): a capped response
+looks like a short last page and would end the export early. Formats:
+
+- "ndjson": one JSON object per line
+- "csv": header row, then one row per report; violations as JSON text
+- "parquet": one row group per batch; needs pyarrow
+
+Images are left out unless asked for; a full export with inline data URIs
+would be mostly base64.
+"""
+import os
+import csv
+import io
+import json
+from typing import AsyncIterator, Optional
+from utils.pagination import encode_cursor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Every exportable column with its Parquet type name
+EXPORT_COLUMNS = {
+    "id": "int64",
+    "reported_timestamp": "string",
+    "reporter_phone": "string",
+    "license_plate": "string",
+    "license_plate_confidence": "float64",
+    "is_india_location": "bool",
+    "location_confidence": "float64",
+    "violations": "json",
+    "confidence_score": "float64",
+    "short_description": "string",
+    "detailed_description": "string",
+    "is_violation": "bool",
+    "title": "string",
+    "needs_manual_verification": "bool",
+    "admin_reviewed": "bool",
+    "admin_approved": "bool",
+    "reported_image": "string",
+}
+IMAGE_COLUMNS = {"reported_image"}
+
+
+def resolve_columns(columns: Optional[list[str]], include_images: bool) -> list[str]:
+    """Validate a requested column list; defaults to every column"""
+    if not columns:
+        return [c for c in EXPORT_COLUMNS if include_images or c not in IMAGE_COLUMNS]
+    unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+    return [c for c in dict.fromkeys(columns) if include_images or c not in IMAGE_COLUMNS]
+
+
+async def iter_batches(
+    store,
+    columns: list[str],
+    filters=None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[list[dict]]:
+    # The cursor needs reported_timestamp and id even when they are not exported
+    selected = ",".join(dict.fromkeys(columns + ["reported_timestamp", "id"]))
+    cursor = None
+    while True:
+        rows, _ = await store.list_reports(selected, filters, cursor, batch_size)
+        if rows:
+            yield [{c: row.get(c) for c in columns} for row in rows]
+        # Only a short page ends the export: a server row cap can swallow the
+        # look-ahead row list_reports uses to hand out a next cursor
+        if len(rows) < batch_size:
+            return
+        cursor = encode_cursor(rows[-1])
+
+
+async def _ndjson(batches: AsyncIterator[list[dict]], columns: list[str]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in rows).encode("utf-8")
+
+
+def _csv_value(value):
+    return json.dumps(value) if isinstance(value, (list, dict)) else value
+
+
+async def _csv(batches: AsyncIterator[list[dict]], columns: list[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in batches:
+        writer.writerows([_csv_value(row[c]) for c in columns] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(columns: list[str]):
+    types = {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "string": pa.string(),
+        "json": pa.string(),
+    }
+    return pa.schema([(c, types[EXPORT_COLUMNS[c]]) for c in columns])
+
+
+async def _parquet(batches: AsyncIterator[list[dict]], columns: list[str]) -> AsyncIterator[bytes]:
+    schema = _arrow_schema(columns)
+    json_columns = [c for c in columns if EXPORT_COLUMNS[c] == "json"]
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in batches:
+            for row in rows:
+                for c in json_columns:
+                    row[c] = json.dumps(row[c]) if row[c] is not None else None
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+_ENCODERS = {"ndjson": _ndjson, "csv": _csv, "parquet": _parquet}
+
+
+def check_format(fmt: str) -> None:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet" and pa is None:
+        raise ValueError("Parquet export needs pyarrow installed")
+
+
+def encode(fmt: str, batches: AsyncIterator[list[dict]], columns: list[str]) -> AsyncIterator[bytes]:
+    return _ENCODERS[fmt](batches, columns)
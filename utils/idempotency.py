@@ -0,0 +1,185 @@
+"""
+Idempotency keys for webhook ingestion
+
+Meta redelivers webhook payloads that were not acknowledged quickly enough.
+Each message id is claimed once; later claims within the TTL are reported as
+duplicates. IDEMPOTENCY_STORE selects "supabase" (the idempotency_keys table,
+shared by every instance), "memory" (bounded LRU, one process) or "sqlite"
+(IDEMPOTENCY_PATH, shared by every worker on the host). It defaults to
+"supabase" when Supabase credentials are configured, since a redelivery can
+reach any serverless instance, and to "memory" otherwise.
+"""
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE") or (
+    "supabase" if os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_SERVICE_ROLE_KEY") else "memory"
+)
+IDEMPOTENCY_PATH = os.getenv("IDEMPOTENCY_PATH", "idempotency.sqlite3")
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+
+
+class IdempotencyStore(ABC):
+    def __init__(self):
+        self.checked = 0
+        self.duplicates_suppressed = 0
+        self._counter_lock = threading.Lock()
+
+    @abstractmethod
+    def _claim(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def _release(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+    def claim(self, key: str) -> bool:
+        """Return True the first time a key is seen, False for a duplicate"""
+        first = self._claim(key)
+        with self._counter_lock:
+            self.checked += 1
+            if not first:
+                self.duplicates_suppressed += 1
+        return first
+
+    def release(self, key: str) -> None:
+        """Forget a claim whose message could not be handed off, so a redelivery is processed"""
+        self._release(key)
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "checked": self.checked,
+            "duplicates_suppressed": self.duplicates_suppressed,
+            "keys": self.size(),
+        }
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    def __init__(self, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self._keys: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _claim(self, key: str) -> bool:
+        now = time.time()
+        with self._lock:
+            # Keys are kept in insertion order, so expired ones sit at the front
+            while self._keys and next(iter(self._keys.values())) <= now - self.ttl_seconds:
+                self._keys.popitem(last=False)
+            if key in self._keys:
+                return False
+            self._keys[key] = now
+            if len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+            return True
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._keys)
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    def __init__(self, path: str = IDEMPOTENCY_PATH, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS):
+        super().__init__()
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS idempotency_keys (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_seen ON idempotency_keys(seen_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _claim(self, key: str) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE seen_at <= ?", (now - self.ttl_seconds,))
+            # The primary key makes the claim atomic across processes
+            cur = conn.execute("INSERT OR IGNORE INTO idempotency_keys (key, seen_at) VALUES (?, ?)", (key, now))
+            return cur.rowcount == 1
+
+    def _release(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+    def size(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()[0]
+
+
+class SupabaseIdempotencyStore(IdempotencyStore):
+    """Keys in the idempotency_keys table (python -m nodes.report_migrations, step 007)"""
+
+    TABLE = "idempotency_keys"
+    # Expired keys are purged on every this many claims rather than on each one
+    PURGE_EVERY = 100
+
+    def __init__(self, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self._claims = 0
+
+    @staticmethod
+    def _client():
+        from nodes.supabase_store import get_supabase_client
+
+        return get_supabase_client()
+
+    def _claim(self, key: str) -> bool:
+        now = time.time()
+        client = self._client()
+        with self._counter_lock:
+            self._claims += 1
+            purge = self._claims % self.PURGE_EVERY == 1
+        if purge:
+            cutoff = datetime.fromtimestamp(now - self.ttl_seconds, timezone.utc).isoformat()
+            client.table(self.TABLE).delete().lt("seen_at", cutoff).execute()
+        # The primary key makes the claim atomic across instances: an ignored
+        # duplicate comes back with no rows
+        result = client.table(self.TABLE).upsert(
+            {"key": key, "seen_at": datetime.fromtimestamp(now, timezone.utc).isoformat()},
+            on_conflict="key",
+            ignore_duplicates=True,
+        ).execute()
+        return bool(result.data)
+
+    def _release(self, key: str) -> None:
+        self._client().table(self.TABLE).delete().eq("key", key).execute()
+
+    def size(self) -> int:
+        return self._client().table(self.TABLE).select("key", count="exact").limit(1).execute().count or 0
+
+
+@lru_cache(maxsize=1)
+def get_idempotency_store() -> IdempotencyStore:
+    if IDEMPOTENCY_STORE == "supabase":
+        return SupabaseIdempotencyStore()
+    if IDEMPOTENCY_STORE == "sqlite":
+        return SQLiteIdempotencyStore()
+    if IDEMPOTENCY_STORE == "memory":
+        return InMemoryIdempotencyStore()
+    raise ValueError(f"Unknown IDEMPOTENCY_STORE backend: {IDEMPOTENCY_STORE}")
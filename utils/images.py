@@ -0,0 +1,110 @@
+"""
+Image normalization ahead of the vision call
+
+Phone photos are decoded, rotated according to their EXIF orientation,
+downsized so the longest side is at most IMAGE_MAX_SIDE and re-encoded at
+IMAGE_QUALITY before being base64-encoded. With IMAGE_PLATE_CROP enabled a
+higher-resolution crop of the lower part of the frame, where number plates
+usually are, is kept alongside for plate reading. Without Pillow, or for
+bytes it cannot decode, the original image is passed through unchanged.
+"""
+import os
+import base64
+import io
+from typing import Optional
+from pydantic import BaseModel
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+IMAGE_NORMALIZE = os.getenv("IMAGE_NORMALIZE", "true").lower() == "true"
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1600"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_PLATE_CROP = os.getenv("IMAGE_PLATE_CROP", "false").lower() == "true"
+IMAGE_PLATE_CROP_MAX_SIDE = int(os.getenv("IMAGE_PLATE_CROP_MAX_SIDE", "1600"))
+
+# Plate crop region as fractions of (left, top, right, bottom)
+_PLATE_REGION = (0.1, 0.4, 0.9, 1.0)
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class NormalizedImage(BaseModel):
+    data_uri: str
+    plate_crop_uri: Optional[str] = None
+    content_type: str
+    original_bytes: int
+    bytes: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+def bytes_to_data_uri(data: bytes, content_type: str) -> str:
+    b64 = base64.b64encode(data).decode("utf-8")
+    return f"data:{content_type};base64,{b64}"
+
+
+def _encode(img, max_side: int, image_format: str, quality: int) -> tuple[bytes, tuple[int, int]]:
+    img = img.copy()
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format=image_format, quality=quality, optimize=True)
+    return out.getvalue(), img.size
+
+
+def normalize_image(
+    data: bytes,
+    content_type: str,
+    max_side: int = IMAGE_MAX_SIDE,
+    image_format: str = IMAGE_FORMAT,
+    quality: int = IMAGE_QUALITY,
+    plate_crop: bool = IMAGE_PLATE_CROP,
+) -> NormalizedImage:
+    passthrough = NormalizedImage(
+        data_uri=bytes_to_data_uri(data, content_type),
+        content_type=content_type,
+        original_bytes=len(data),
+        bytes=len(data),
+    )
+    if not IMAGE_NORMALIZE or Image is None or image_format not in _MIME_TYPES:
+        return passthrough
+
+    try:
+        with Image.open(io.BytesIO(data)) as src:
+            if not plate_crop:
+                # Let the JPEG decoder downscale in the DCT domain; the crop needs full resolution
+                scale = min(1.0, max_side / max(src.size))
+                src.draft("RGB", (int(src.width * scale), int(src.height * scale)))
+            img = ImageOps.exif_transpose(src).convert("RGB")
+    except Exception:
+        return passthrough
+
+    encoded, (width, height) = _encode(img, max_side, image_format, quality)
+    mime = _MIME_TYPES[image_format]
+
+    plate_crop_uri = None
+    if plate_crop:
+        full_width, full_height = img.size
+        left, top, right, bottom = _PLATE_REGION
+        region = img.crop((int(full_width * left), int(full_height * top), int(full_width * right), int(full_height * bottom)))
+        crop, _ = _encode(region, IMAGE_PLATE_CROP_MAX_SIDE, image_format, quality)
+        plate_crop_uri = bytes_to_data_uri(crop, mime)
+
+    return NormalizedImage(
+        data_uri=bytes_to_data_uri(encoded, mime),
+        plate_crop_uri=plate_crop_uri,
+        content_type=mime,
+        original_bytes=len(data),
+        bytes=len(encoded),
+        width=width,
+        height=height,
+    )
@@ -0,0 +1,205 @@
+"""
+Job state for submit-and-poll analysis requests
+
+A job records its overall status, the progress of each pipeline stage and the
+final result, so a client can poll for the outcome after the submitting
+request has already returned. Backends are chosen with JOB_STORE:
+"supabase" (the analysis_jobs table, shared by every instance), "memory"
+(single process) or "sqlite" (JOB_STORE_PATH, shared by every process on the
+host). It defaults to "supabase" when Supabase credentials are configured,
+since a poll on a serverless deployment can reach any instance, and to
+"memory" otherwise.
+"""
+import os
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Literal, Optional
+from pydantic import BaseModel, Field
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+JOB_STORE = os.getenv("JOB_STORE") or (
+    "supabase" if os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_SERVICE_ROLE_KEY") else "memory"
+)
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.sqlite3")
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+JOB_MAX_ENTRIES = int(os.getenv("JOB_MAX_ENTRIES", "1000"))
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+StageStatus = Literal["pending", "running", "done", "failed"]
+
+
+class Job(BaseModel):
+    id: str
+    status: JobStatus = "queued"
+    stages: dict[str, StageStatus] = Field(default_factory=dict)
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = Field(default_factory=time.time)
+    updated_at: float = Field(default_factory=time.time)
+
+
+class JobStore(ABC):
+    def create(self, stages: list[str]) -> Job:
+        job = Job(id=uuid.uuid4().hex, stages={s: "pending" for s in stages})
+        self._save(job)
+        return job
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def _save(self, job: Job) -> None:
+        ...
+
+    def _update(self, job_id: str, mutate) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        mutate(job)
+        job.updated_at = time.time()
+        self._save(job)
+        return job
+
+    def set_stage(self, job_id: str, stage: str, status: StageStatus) -> Optional[Job]:
+        def mutate(job: Job):
+            job.stages[stage] = status
+            if job.status == "queued":
+                job.status = "running"
+        return self._update(job_id, mutate)
+
+    def succeed(self, job_id: str, result: dict) -> Optional[Job]:
+        def mutate(job: Job):
+            job.status = "succeeded"
+            job.result = result
+        return self._update(job_id, mutate)
+
+    def fail(self, job_id: str, error: str) -> Optional[Job]:
+        def mutate(job: Job):
+            job.status = "failed"
+            job.error = error
+            for stage, status in job.stages.items():
+                if status == "running":
+                    job.stages[stage] = "failed"
+        return self._update(job_id, mutate)
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS, max_entries: int = JOB_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        while self._jobs:
+            oldest = next(iter(self._jobs.values()))
+            if len(self._jobs) <= self.max_entries and oldest.created_at >= cutoff:
+                break
+            self._jobs.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job else None
+
+    def _save(self, job: Job) -> None:
+        with self._lock:
+            is_new = job.id not in self._jobs
+            self._jobs[job.id] = job.model_copy(deep=True)
+            if is_new:
+                self._evict()
+
+
+class SQLiteJobStore(JobStore):
+    def __init__(self, path: str = JOB_STORE_PATH, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_jobs ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_jobs_created ON analysis_jobs(created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.model_validate(json.loads(row[0])) if row else None
+
+    def _update(self, job_id: str, mutate) -> Optional[Job]:
+        # Serialise read-modify-write within the process; stages of one job
+        # are only ever written by the process running it
+        with self._lock:
+            return super()._update(job_id, mutate)
+
+    def _save(self, job: Job) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO analysis_jobs (id, data, created_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                (job.id, job.model_dump_json(), job.created_at),
+            )
+            conn.execute("DELETE FROM analysis_jobs WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+
+class SupabaseJobStore(JobStore):
+    """Jobs in the analysis_jobs table (python -m nodes.report_migrations, step 006)"""
+
+    TABLE = "analysis_jobs"
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _client():
+        from nodes.supabase_store import get_supabase_client
+
+        return get_supabase_client()
+
+    def create(self, stages: list[str]) -> Job:
+        job = super().create(stages)
+        cutoff = datetime.fromtimestamp(time.time() - self.ttl_seconds, timezone.utc).isoformat()
+        self._client().table(self.TABLE).delete().lt("created_at", cutoff).execute()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        result = self._client().table(self.TABLE).select("data").eq("id", job_id).limit(1).execute()
+        return Job.model_validate(result.data[0]["data"]) if result.data else None
+
+    def _save(self, job: Job) -> None:
+        # Stages of one job are only ever written by the invocation running it
+        self._client().table(self.TABLE).upsert({
+            "id": job.id,
+            "data": job.model_dump(mode="json"),
+            "created_at": datetime.fromtimestamp(job.created_at, timezone.utc).isoformat(),
+        }).execute()
+
+
+@lru_cache(maxsize=1)
+def get_job_store() -> JobStore:
+    if JOB_STORE == "supabase":
+        return SupabaseJobStore()
+    if JOB_STORE == "sqlite":
+        return SQLiteJobStore()
+    if JOB_STORE == "memory":
+        return InMemoryJobStore()
+    raise ValueError(f"Unknown JOB_STORE backend: {JOB_STORE}")
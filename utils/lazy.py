@@ -1,12 +1,46 @@
 from functools import lru_cache
+from typing import Callable, Optional
 from langchain.chat_models import init_chat_model
 
+from utils.llm_cache import get_llm_cache
+from utils.metrics import MetricsCallbackHandler
+
+# Optional replacements for the real providers, e.g. the offline benchmark fakes
+_chat_model_factory: Optional[Callable] = None
+_embeddings_factory: Optional[Callable] = None
+
+
+def set_model_factories(chat: Optional[Callable] = None, embeddings: Optional[Callable] = None) -> None:
+    """
+    Build chat models with chat(model_id, **model_kwargs) and embeddings with
+    embeddings(model_id) instead of the real providers. None restores them.
+    """
+    global _chat_model_factory, _embeddings_factory
+    _chat_model_factory = chat
+    _embeddings_factory = embeddings
+    chat_model.cache_clear()
+    embeddings_model.cache_clear()
+
 
 @lru_cache(maxsize=8)
 def chat_model(model_id: str):
-    return init_chat_model(model_id)
+    factory = _chat_model_factory or init_chat_model
+    kwargs = {"callbacks": [MetricsCallbackHandler(model_id)]}
+    cache = get_llm_cache()
+    if cache is not None:
+        kwargs["cache"] = cache
+    return factory(model_id, **kwargs)
 
 
 def structured_chat_model(model_id: str, schema):
     return chat_model(model_id).with_structured_output(schema)
 
+
+@lru_cache(maxsize=4)
+def embeddings_model(model_id: str):
+    if _embeddings_factory is not None:
+        return _embeddings_factory(model_id)
+
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(model=model_id)
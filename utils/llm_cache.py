@@ -0,0 +1,197 @@
+"""
+Persistent response cache for chat-model calls
+
+A LangChain BaseCache backed by SQLite and attached to every model built by
+utils.lazy.chat_model. Entries are keyed on a hash of the model's LLM string
+(model id, sampling parameters and any bound output schema or tools) and the
+normalized messages, so vision, validator and summary calls share one file.
+
+LLM_CACHE_MODE:
+- "bypass": no cache (default)
+- "readwrite": serve hits, record misses
+- "replay": serve hits only; a miss raises LLMCacheMiss instead of calling
+  the model, so a replayed benchmark or test never spends tokens silently
+
+Entries older than LLM_CACHE_MAX_AGE_SECONDS are ignored and purged, and the
+least recently used entries are evicted once the file holds more than
+LLM_CACHE_MAX_MB of responses.
+"""
+import os
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "bypass")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "512"))
+LLM_CACHE_MAX_AGE_SECONDS = float(os.getenv("LLM_CACHE_MAX_AGE_SECONDS", str(30 * 86400)))
+# Eviction runs after this many writes rather than on every write
+LLM_CACHE_EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "100"))
+
+# Model name inside a serialized ('"model": "..."') or repr ("('model', '...')") LLM string
+_MODEL_RE = re.compile(r"""["']model(?:_name)?["'](?::|,) ["']([^"']+)["']""")
+
+
+class LLMCacheMiss(LookupError):
+    """A replay-mode lookup found no recorded response"""
+
+
+def _normalize_prompt(prompt: str) -> str:
+    try:
+        return json.dumps(json.loads(prompt), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return prompt
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    h = hashlib.sha256(llm_string.encode("utf-8"))
+    h.update(b"\0")
+    h.update(_normalize_prompt(prompt).encode("utf-8"))
+    return h.hexdigest()
+
+
+class SQLiteLLMCache(BaseCache):
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        mode: str = LLM_CACHE_MODE,
+        max_bytes: int = int(LLM_CACHE_MAX_MB * 1024 * 1024),
+        max_age_seconds: float = LLM_CACHE_MAX_AGE_SECONDS,
+    ):
+        if mode not in ("readwrite", "replay"):
+            raise ValueError(f"Unknown LLM_CACHE_MODE for a cache instance: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            if mode == "readwrite":
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM llm_cache WHERE key = ? AND created_at > ?",
+                (key, now - self.max_age_seconds if self.max_age_seconds else 0),
+            ).fetchone()
+            if row is not None and self.mode == "readwrite":
+                conn.execute("UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (now, key))
+        self._count(row is not None)
+        if row is None:
+            if self.mode == "replay":
+                # LangChain calls the model on a None lookup; raising is the only way to stop it
+                raise LLMCacheMiss(f"No recorded response for {key} in {self.path}")
+            return None
+        return loads(row[0], allowed_objects="core")
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if self.mode != "readwrite":
+            return
+        response = dumps(list(return_val))
+        match = _MODEL_RE.search(llm_string)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key(prompt, llm_string), match.group(1) if match else None, response, len(response), now, now),
+            )
+        with self._lock:
+            self.writes += 1
+            due = self.writes % LLM_CACHE_EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        removed = 0
+        with self._connect() as conn:
+            if self.max_age_seconds:
+                removed += conn.execute(
+                    "DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - self.max_age_seconds,)
+                ).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total > self.max_bytes:
+                doomed = []
+                for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_used_at"):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+                removed += len(doomed)
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+            per_model = dict(conn.execute("SELECT COALESCE(model, 'unknown'), COUNT(*) FROM llm_cache GROUP BY model").fetchall())
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": entries,
+            "bytes": size,
+            "entries_per_model": per_model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    if LLM_CACHE_MODE == "bypass":
+        return None
+    if LLM_CACHE_MODE in ("readwrite", "replay"):
+        return SQLiteLLMCache()
+    raise ValueError(f"Unknown LLM_CACHE_MODE: {LLM_CACHE_MODE}")
+
+
+def llm_cache_stats() -> dict:
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {"mode": LLM_CACHE_MODE}
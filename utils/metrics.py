@@ -0,0 +1,246 @@
+"""
+In-process metrics with Prometheus text exposition
+
+Stages are timed with the timed() decorator, and chat models from
+utils.lazy.chat_model report latency, token usage, errors and estimated cost
+through MetricsCallbackHandler. Everything lives in process memory with a lock
+per metric, so recording a sample costs a dict lookup and a few additions.
+render_prometheus() produces the text served on /api/v1/metrics.
+"""
+import asyncio
+import bisect
+import functools
+import re
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from config import MODEL_COSTS
+from utils.llm_cache import LLMCacheMiss
+
+PREFIX = "thirdeye"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._values.items())
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+STAGE_DURATION = Histogram(f"{PREFIX}_stage_duration_seconds", "Pipeline stage latency", ["stage"])
+STAGE_ERRORS = Counter(f"{PREFIX}_stage_errors_total", "Pipeline stage failures", ["stage"])
+LLM_DURATION = Histogram(f"{PREFIX}_llm_duration_seconds", "Chat model call latency", ["model"])
+LLM_CALLS = Counter(f"{PREFIX}_llm_calls_total", "Chat model calls", ["model"])
+LLM_ERRORS = Counter(f"{PREFIX}_llm_errors_total", "Chat model calls that raised", ["model"])
+LLM_TOKENS = Counter(f"{PREFIX}_llm_tokens_total", "Tokens reported in chat model usage metadata", ["model", "direction"])
+LLM_CACHE_HITS = Counter(f"{PREFIX}_llm_cache_hits_total", "Chat model calls answered from the response cache", ["model"])
+LLM_CACHE_MISSES = Counter(f"{PREFIX}_llm_cache_replay_misses_total", "Chat model calls refused for want of a recorded response in replay mode", ["model"])
+LLM_COST = Counter(f"{PREFIX}_llm_cost_usd_total", "Estimated chat model spend from config.MODEL_COSTS", ["model"])
+
+METRICS = [STAGE_DURATION, STAGE_ERRORS, LLM_DURATION, LLM_CALLS, LLM_ERRORS, LLM_CACHE_HITS, LLM_CACHE_MISSES, LLM_TOKENS, LLM_COST]
+
+
+def record_stage_error(stage: str) -> None:
+    STAGE_ERRORS.inc(stage)
+
+
+def timed(stage: str) -> Callable:
+    """Record the latency of a sync or async function, and count the calls that raise"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    STAGE_ERRORS.inc(stage)
+                    raise
+                finally:
+                    STAGE_DURATION.observe(time.perf_counter() - start, stage)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                STAGE_ERRORS.inc(stage)
+                raise
+            finally:
+                STAGE_DURATION.observe(time.perf_counter() - start, stage)
+        return wrapper
+    return decorator
+
+
+def estimate_cost(model_id: str, input_tokens: int, output_tokens: int) -> float:
+    rates = MODEL_COSTS.get(model_id)
+    if not rates:
+        return 0.0
+    return (input_tokens * rates["input"] + output_tokens * rates["output"]) / 1_000_000
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Per-model latency, token, error and cost accounting for chat model calls"""
+
+    # Cheap enough to run on the event loop instead of a thread-pool hop
+    run_inline = True
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+        self._started: dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: dict, prompts: list[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def _finish(self, run_id: UUID) -> None:
+        start = self._started.pop(run_id, None)
+        LLM_CALLS.inc(self.model_id)
+        if start is not None:
+            LLM_DURATION.observe(time.perf_counter() - start, self.model_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                # LangChain zeroes total_cost on generations served from the cache
+                if usage.get("total_cost", None) == 0:
+                    LLM_CACHE_HITS.inc(self.model_id)
+                    continue
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if input_tokens or output_tokens:
+            LLM_TOKENS.inc(self.model_id, "input", amount=input_tokens)
+            LLM_TOKENS.inc(self.model_id, "output", amount=output_tokens)
+            LLM_COST.inc(self.model_id, amount=estimate_cost(self.model_id, input_tokens, output_tokens))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        if isinstance(error, LLMCacheMiss):
+            # The model was never called
+            self._started.pop(run_id, None)
+            LLM_CACHE_MISSES.inc(self.model_id)
+            return
+        self._finish(run_id)
+        LLM_ERRORS.inc(self.model_id)
+
+
+def _metric_name(*parts: str) -> str:
+    return _NAME_RE.sub("_", "_".join([PREFIX, *parts])).lower()
+
+
+def stats_gauges(component: str, stats: dict) -> list[str]:
+    """
+    Render a component's stats() dict as gauges. Numbers become one gauge each;
+    nested dicts become one gauge labelled by key; strings are skipped.
+    """
+    lines = []
+    for key, value in stats.items():
+        name = _metric_name(component, key)
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            lines += [f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        elif isinstance(value, dict):
+            samples = []
+            for sub_key, sub_value in value.items():
+                if isinstance(sub_value, dict):
+                    for leaf_key, leaf_value in sub_value.items():
+                        if isinstance(leaf_value, (int, float)):
+                            samples.append(f'{name}{{key="{_escape(sub_key)}",subkey="{_escape(leaf_key)}"}} {_number(leaf_value)}')
+                elif isinstance(sub_value, (int, float)):
+                    samples.append(f'{name}{{key="{_escape(sub_key)}"}} {_number(sub_value)}')
+            if samples:
+                lines += [f"# TYPE {name} gauge", *samples]
+    return lines
+
+
+def render_prometheus(components: Optional[dict[str, dict]] = None) -> str:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    for component, stats in (components or {}).items():
+        lines += stats_gauges(component, stats)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,53 @@
+"""
+Keyset pagination over violation_reports
+
+Listings are ordered newest first on (reported_timestamp, id). A cursor is
+the position of the last row of a page, base64-encoded so clients treat it
+as opaque; the next page starts strictly after it, so its cost does not grow
+with depth and rows inserted meanwhile cannot shift the page boundaries.
+"""
+import base64
+import json
+import re
+from typing import Optional
+
+# Cursor timestamps are spliced into a PostgREST filter, so only timestamp characters pass
+_TIMESTAMP_RE = re.compile(r"^[0-9T:. +\-Z]+$")
+
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["reported_timestamp"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, report_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(timestamp, str) or not _TIMESTAMP_RE.match(timestamp) or not isinstance(report_id, int):
+        raise ValueError("Invalid cursor")
+    return timestamp, report_id
+
+
+def apply_cursor(query, cursor: Optional[str]):
+    """Order newest first and, given a cursor, keep only rows after it"""
+    if cursor:
+        timestamp, report_id = decode_cursor(cursor)
+        # The lte bound lets the planner start an index range scan at the cursor;
+        # the or= filter only settles ties on reported_timestamp. Quoted because
+        # timestamps contain ':' and '+'
+        query = query.lte("reported_timestamp", timestamp).or_(
+            f'reported_timestamp.lt."{timestamp}",'
+            f'and(reported_timestamp.eq."{timestamp}",id.lt.{report_id})'
+        )
+    return query.order("reported_timestamp", desc=True).order("id", desc=True)
+
+
+def split_page(rows: list[dict], limit: int) -> tuple[list[dict], Optional[str]]:
+    """Trim a limit + 1 fetch to the page and the cursor for the next one, if any"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
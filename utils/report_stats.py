@@ -0,0 +1,87 @@
+"""
+Admin dashboard statistics over violation_reports
+
+The counts come from ReportStore.stats(): on Supabase one call to the
+report_stats() Postgres function (see ADMIN_MIGRATION.md), falling back to
+five concurrent count queries until it exists; on SQLite a single aggregate
+query. Results are kept for REPORT_STATS_TTL_SECONDS and dropped early whenever this
+process writes a report, so a dashboard refresh normally costs no round trip.
+Writes made by another process (an external worker) show up once the TTL
+expires.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+REPORT_STATS_TTL_SECONDS = float(os.getenv("REPORT_STATS_TTL_SECONDS", "30"))
+
+
+class ReportStatsCache:
+    def __init__(self, ttl_seconds: float = REPORT_STATS_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.source: Optional[str] = None
+        self._value: Optional[dict] = None
+        self._expires_at = 0.0
+        # Bumped on every invalidation so a fetch that raced a write is not cached
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> tuple[Optional[dict], int]:
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+                return self._value, self._generation
+            self.misses += 1
+            return None, self._generation
+
+    def put(self, value: dict, generation: int, source: str) -> None:
+        with self._lock:
+            self.source = source
+            if generation == self._generation:
+                self._value = value
+                self._expires_at = time.monotonic() + self.ttl_seconds
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._value = None
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "source": self.source or "none",
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+REPORT_STATS = ReportStatsCache()
+
+
+def invalidate_report_stats() -> None:
+    REPORT_STATS.invalidate()
+
+
+async def get_report_stats(store) -> dict:
+    """Dashboard counts from the cache, or from the report store on a miss"""
+    cached, generation = REPORT_STATS.get()
+    if cached is not None:
+        return cached
+
+    stats = await store.stats()
+    REPORT_STATS.put(stats, generation, store.stats_source)
+    return stats
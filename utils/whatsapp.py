@@ -1,8 +1,11 @@
 import os
-import base64
+import asyncio
 import traceback
 import requests
 
+from utils.images import NormalizedImage, normalize_image
+from utils.metrics import timed
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -13,9 +16,10 @@ except Exception:
 WABA_TOKEN = os.getenv("WABA_TOKEN")
 WABA_PHONE_NUMBER_ID = os.getenv("WABA_PHONE_NUMBER_ID")
 
-GRAPH_BASE = "https://graph.facebook.com/v22.0"
+GRAPH_BASE = os.getenv("WHATSAPP_GRAPH_BASE", "https://graph.facebook.com/v22.0")
 
 
+@timed("whatsapp_send")
 def send_whatsapp_text(to_wa_id: str, body: str):
     url = f"{GRAPH_BASE}/{WABA_PHONE_NUMBER_ID}/messages"
     headers = {
@@ -37,7 +41,8 @@ def send_whatsapp_text(to_wa_id: str, body: str):
     r.raise_for_status()
 
 
-def download_media_data_uri(media_id: str) -> str:
+@timed("whatsapp_download")
+def download_media(media_id: str) -> NormalizedImage:
     headers = {"Authorization": f"Bearer {WABA_TOKEN}"}
     meta_res = requests.get(f"{GRAPH_BASE}/{media_id}", headers=headers, timeout=30)
     meta_res.raise_for_status()
@@ -47,20 +52,116 @@ def download_media_data_uri(media_id: str) -> str:
     media_res = requests.get(media_url, headers=headers, timeout=60)
     media_res.raise_for_status()
     content_type = media_res.headers.get("Content-Type", "image/jpeg")
-    b64 = base64.b64encode(media_res.content).decode("utf-8")
-    return f"data:{content_type};base64,{b64}"
+    return normalize_image(media_res.content, content_type)
+
+
+def download_media_data_uri(media_id: str) -> str:
+    return download_media(media_id).data_uri
+
+
+async def handle_image(wa_id: str, media_id: str) -> list[tuple[str, dict]]:
+    """
+    Work-queue consumer for one WhatsApp image: download, vision and
+    violation matching. Errors propagate so the queue can retry; the user is
+    told about the failure once the job is dead-lettered. Storage is returned
+    as a follow-up job, so retrying this stage never inserts a report.
+    """
+    from utils.worker import WHATSAPP_STORE_JOB
+
+    data = await analyse_image_message(wa_id, media_id)
+    return [(WHATSAPP_STORE_JOB, {"wa_id": wa_id, **report_payload(data)})]
+
+
+async def handle_store(
+    wa_id: str,
+    reporter_phone: str,
+    reported_image: str,
+    analysis: dict,
+    violations: list[dict],
+) -> list[tuple[str, dict]]:
+    """
+    Work-queue consumer that stores the report and writes the reply.
+    store_report returns its own failures and summary errors fall back to the
+    template, so this stage does not raise once the insert has run and is
+    never retried into a second report. The reply is its own follow-up job:
+    a failed send retries only the send.
+    """
+    from utils.worker import WHATSAPP_REPLY_JOB
+
+    body = await store_image_report(report_from_payload({
+        "reporter_phone": reporter_phone,
+        "reported_image": reported_image,
+        "analysis": analysis,
+        "violations": violations,
+    }))
+    return [(WHATSAPP_REPLY_JOB, {"wa_id": wa_id, "body": body})]
+
+
+async def analyse_image_message(wa_id: str, media_id: str) -> dict:
+    """Download and analyse one image; returns the chain state up to storage"""
+    from main import build_analysis_chain
+
+    # Graph API calls use blocking requests; run them in a worker thread so
+    # concurrent reports keep sharing the event loop
+    image = await asyncio.to_thread(download_media, media_id)
+    return await build_analysis_chain().ainvoke({
+        "image_url": image.data_uri,
+        "plate_crop_image": image.plate_crop_uri,
+        "reporter_phone": wa_id,
+    })
+
 
+async def store_image_report(data: dict) -> str:
+    """Store an analysed image and return the reply text"""
+    from main import build_report_chain
 
-def handle_image(wa_id: str, media_id: str):
-    from main import build_chain
+    return str(await build_report_chain().ainvoke(data))
 
+
+def report_payload(data: dict) -> dict:
+    # JSON-safe subset of the chain state that storage and the summary read
+    return {
+        "reporter_phone": data["reporter_phone"],
+        "reported_image": data["reported_image"],
+        "analysis": data["analysis"].model_dump(),
+        "violations": [v.model_dump() for v in data["violations"]],
+    }
+
+
+def report_from_payload(payload: dict) -> dict:
+    from nodes.violations import ViolationsResult
+    from nodes.vision import ImageAnalysisResult
+
+    return {
+        **payload,
+        "analysis": ImageAnalysisResult.model_validate(payload["analysis"]),
+        "violations": [ViolationsResult.model_validate(v) for v in payload["violations"]],
+    }
+
+
+async def process_image(wa_id: str, media_id: str):
+    """
+    Background-task path used when no work queue is configured: a single
+    attempt in this process, with the error reply sent straight away
+    """
     try:
-        data_uri = download_media_data_uri(media_id)
-        chain = build_chain(reporter_phone=wa_id, reported_image=data_uri)
-        result = chain.invoke(data_uri)
-        send_whatsapp_text(wa_id, str(result))
+        body = await store_image_report(await analyse_image_message(wa_id, media_id))
     except Exception:
+        traceback.print_exc()
         try:
-            send_whatsapp_text(wa_id, "Error processing image")
+            await notify_image_failed(wa_id)
         except Exception:
-            pass
+            traceback.print_exc()
+        return
+    try:
+        await send_reply(wa_id, body)
+    except Exception:
+        traceback.print_exc()
+
+
+async def send_reply(wa_id: str, body: str):
+    await asyncio.to_thread(send_whatsapp_text, wa_id, body)
+
+
+async def notify_image_failed(wa_id: str, **_payload):
+    await asyncio.to_thread(send_whatsapp_text, wa_id, "Error processing image")
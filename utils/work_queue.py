@@ -0,0 +1,242 @@
+"""
+Durable SQLite-backed work queue
+
+Jobs survive restarts of the serving process, are claimed under a lease so a
+crashed worker's jobs are picked up again, are retried with exponential
+backoff and are dead-lettered after QUEUE_MAX_ATTEMPTS failures.
+
+The queue is opt-in: it needs a writable file at QUEUE_PATH, which a
+serverless deployment (Vercel's read-only filesystem) does not have. With
+QUEUE_PATH unset, get_work_queue() returns None and the webhook falls back to
+processing each image in a background task.
+"""
+import os
+import json
+import sqlite3
+import time
+from functools import lru_cache
+from typing import Any, Optional
+from pydantic import BaseModel
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+QUEUE_PATH = os.getenv("QUEUE_PATH")
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "5"))
+QUEUE_BACKOFF_SECONDS = float(os.getenv("QUEUE_BACKOFF_SECONDS", "2"))
+QUEUE_BACKOFF_MAX_SECONDS = float(os.getenv("QUEUE_BACKOFF_MAX_SECONDS", "300"))
+QUEUE_LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "300"))
+QUEUE_RETENTION_SECONDS = float(os.getenv("QUEUE_RETENTION_SECONDS", "86400"))
+# Window used for the wait-time and throughput figures in stats()
+QUEUE_STATS_WINDOW_SECONDS = float(os.getenv("QUEUE_STATS_WINDOW_SECONDS", "300"))
+
+
+class QueueJob(BaseModel):
+    id: int
+    kind: str
+    payload: dict[str, Any]
+    attempts: int
+    enqueued_at: float
+
+
+class SQLiteWorkQueue:
+    def __init__(
+        self,
+        path: str = QUEUE_PATH,
+        max_attempts: int = QUEUE_MAX_ATTEMPTS,
+        backoff_seconds: float = QUEUE_BACKOFF_SECONDS,
+        backoff_max_seconds: float = QUEUE_BACKOFF_MAX_SECONDS,
+        lease_seconds: float = QUEUE_LEASE_SECONDS,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.lease_seconds = lease_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS work_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    enqueued_at REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    started_at REAL,
+                    lease_until REAL,
+                    finished_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_work_queue_ready ON work_queue(status, available_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_work_queue_finished ON work_queue(status, finished_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enqueue(self, kind: str, payload: dict, delay_seconds: float = 0) -> int:
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO work_queue (kind, payload, enqueued_at, available_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload), now, now + delay_seconds),
+            )
+            return cur.lastrowid
+
+    def claim(self) -> Optional[QueueJob]:
+        """
+        Lease the oldest ready job. Running jobs whose lease has expired
+        (their worker died) are ready again.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """
+                SELECT id, kind, payload, attempts, enqueued_at FROM work_queue
+                WHERE (status = 'queued' AND available_at <= ?)
+                   OR (status = 'running' AND lease_until < ?)
+                ORDER BY available_at, id
+                LIMIT 1
+                """,
+                (now, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE work_queue SET status = 'running', attempts = attempts + 1, "
+                "started_at = ?, lease_until = ? WHERE id = ?",
+                (now, now + self.lease_seconds, row[0]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return QueueJob(id=row[0], kind=row[1], payload=json.loads(row[2]), attempts=row[3] + 1, enqueued_at=row[4])
+
+    def ack(self, job_id: int, follow_ups: list[tuple[str, dict]] = ()) -> None:
+        """
+        Mark a job done. Follow-up jobs are enqueued in the same transaction,
+        so a job's later stages are never lost or queued twice.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO work_queue (kind, payload, enqueued_at, available_at) VALUES (?, ?, ?, ?)",
+                [(kind, json.dumps(payload), now, now) for kind, payload in follow_ups],
+            )
+            conn.execute(
+                "UPDATE work_queue SET status = 'done', finished_at = ?, lease_until = NULL WHERE id = ?",
+                (now, job_id),
+            )
+            conn.execute(
+                "DELETE FROM work_queue WHERE status = 'done' AND finished_at < ?",
+                (now - QUEUE_RETENTION_SECONDS,),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def fail(self, job_id: int, attempts: int, error: str) -> bool:
+        """
+        Record a failed attempt. Returns True when the job was dead-lettered,
+        False when it was scheduled for another try.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE work_queue SET status = 'dead', last_error = ?, finished_at = ?, "
+                    "lease_until = NULL WHERE id = ?",
+                    (error, now, job_id),
+                )
+                return True
+            delay = min(self.backoff_seconds * (2 ** (attempts - 1)), self.backoff_max_seconds)
+            conn.execute(
+                "UPDATE work_queue SET status = 'queued', last_error = ?, available_at = ?, "
+                "lease_until = NULL WHERE id = ?",
+                (error, now + delay, job_id),
+            )
+            return False
+
+    def next_available_in(self) -> Optional[float]:
+        """
+        Seconds until the next queued job becomes ready, or None when nothing
+        is queued or running
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MIN(CASE WHEN status = 'queued' THEN available_at ELSE lease_until END) "
+                "FROM work_queue WHERE status IN ('queued', 'running')"
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(row[0] - time.time(), 0.0)
+
+    def dead_letters(self, limit: int = 50) -> list[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, kind, payload, attempts, last_error, finished_at FROM work_queue "
+                "WHERE status = 'dead' ORDER BY finished_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {"id": r[0], "kind": r[1], "payload": json.loads(r[2]), "attempts": r[3], "error": r[4], "failed_at": r[5]}
+            for r in rows
+        ]
+
+    def stats(self) -> dict:
+        now = time.time()
+        since = now - QUEUE_STATS_WINDOW_SECONDS
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM work_queue GROUP BY status").fetchall())
+            oldest = conn.execute(
+                "SELECT MIN(enqueued_at) FROM work_queue WHERE status = 'queued' AND available_at <= ?",
+                (now,),
+            ).fetchone()[0]
+            wait = conn.execute(
+                "SELECT AVG(started_at - enqueued_at), MAX(started_at - enqueued_at) "
+                "FROM work_queue WHERE started_at >= ?",
+                (since,),
+            ).fetchone()
+            completed = conn.execute(
+                "SELECT COUNT(*) FROM work_queue WHERE status = 'done' AND finished_at >= ?",
+                (since,),
+            ).fetchone()[0]
+
+        return {
+            "depth": counts.get("queued", 0),
+            "in_flight": counts.get("running", 0),
+            "dead": counts.get("dead", 0),
+            "oldest_ready_age_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "avg_wait_seconds": round(wait[0] or 0.0, 3),
+            "max_wait_seconds": round(wait[1] or 0.0, 3),
+            "completed_in_window": completed,
+            "throughput_per_minute": round(completed * 60 / QUEUE_STATS_WINDOW_SECONDS, 3),
+            "window_seconds": QUEUE_STATS_WINDOW_SECONDS,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_work_queue() -> Optional[SQLiteWorkQueue]:
+    """The process-wide queue, or None when QUEUE_PATH is not configured"""
+    if not QUEUE_PATH:
+        return None
+    return SQLiteWorkQueue(QUEUE_PATH)
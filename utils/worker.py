@@ -0,0 +1,124 @@
+"""
+Worker pool consuming the durable work queue
+
+Runs QUEUE_CONCURRENCY consumers on one event loop, so at most that many jobs
+(and their model calls) are in flight per worker process. With
+WORKER_MODE=inline the web process drains the queue itself after each
+webhook; with WORKER_MODE=external a separate `python run_worker.py` process
+does the work.
+"""
+import os
+import asyncio
+import time
+import traceback
+
+from utils.work_queue import QueueJob, SQLiteWorkQueue, get_work_queue
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+WORKER_MODE = os.getenv("WORKER_MODE", "inline")
+QUEUE_CONCURRENCY = int(os.getenv("QUEUE_CONCURRENCY", "4"))
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "1"))
+QUEUE_STATS_INTERVAL_SECONDS = float(os.getenv("QUEUE_STATS_INTERVAL_SECONDS", "60"))
+
+WHATSAPP_IMAGE_JOB = "whatsapp_image"
+WHATSAPP_STORE_JOB = "whatsapp_store"
+WHATSAPP_REPLY_JOB = "whatsapp_reply"
+
+_drain_lock = asyncio.Lock()
+
+
+def _handlers() -> dict:
+    # kind -> (handler, on_dead_letter); both are called with the job payload.
+    # A handler may return follow-up jobs as (kind, payload) pairs
+    from utils.whatsapp import handle_image, handle_store, notify_image_failed, send_reply
+
+    return {
+        WHATSAPP_IMAGE_JOB: (handle_image, notify_image_failed),
+        WHATSAPP_STORE_JOB: (handle_store, notify_image_failed),
+        WHATSAPP_REPLY_JOB: (send_reply, None),
+    }
+
+
+async def process_job(queue: SQLiteWorkQueue, job: QueueJob, handlers: dict) -> None:
+    handler, on_dead = handlers.get(job.kind, (None, None))
+    try:
+        if handler is None:
+            raise RuntimeError(f"No handler registered for job kind '{job.kind}'")
+        follow_ups = await handler(**job.payload)
+    except Exception as e:
+        traceback.print_exc()
+        dead = await asyncio.to_thread(queue.fail, job.id, job.attempts, f"{type(e).__name__}: {e}")
+        if dead and on_dead is not None:
+            try:
+                await on_dead(**job.payload)
+            except Exception:
+                traceback.print_exc()
+        return
+    await asyncio.to_thread(queue.ack, job.id, follow_ups or [])
+
+
+async def _consume(queue: SQLiteWorkQueue, handlers: dict, stop_when_idle: bool) -> None:
+    while True:
+        job = await asyncio.to_thread(queue.claim)
+        if job is not None:
+            await process_job(queue, job, handlers)
+            continue
+        if stop_when_idle:
+            wait = await asyncio.to_thread(queue.next_available_in)
+            if wait is None:
+                return
+            await asyncio.sleep(min(wait, QUEUE_POLL_SECONDS))
+        else:
+            await asyncio.sleep(QUEUE_POLL_SECONDS)
+
+
+async def _report_stats(queue: SQLiteWorkQueue) -> None:
+    while True:
+        await asyncio.sleep(QUEUE_STATS_INTERVAL_SECONDS)
+        stats = await asyncio.to_thread(queue.stats)
+        print(
+            f"[worker] depth={stats['depth']} in_flight={stats['in_flight']} dead={stats['dead']} "
+            f"avg_wait={stats['avg_wait_seconds']}s throughput={stats['throughput_per_minute']}/min"
+        )
+
+
+async def run_worker(
+    concurrency: int = QUEUE_CONCURRENCY,
+    stop_when_idle: bool = False,
+    queue: SQLiteWorkQueue | None = None,
+) -> None:
+    queue = queue or get_work_queue()
+    if queue is None:
+        raise RuntimeError("No work queue configured; set QUEUE_PATH")
+    handlers = _handlers()
+    consumers = [asyncio.create_task(_consume(queue, handlers, stop_when_idle)) for _ in range(concurrency)]
+    reporter = None if stop_when_idle else asyncio.create_task(_report_stats(queue))
+    try:
+        await asyncio.gather(*consumers)
+    finally:
+        if reporter:
+            reporter.cancel()
+
+
+async def drain_queue() -> None:
+    """
+    Process queued jobs in this process until none are left, including jobs
+    waiting out a retry backoff. Only one drain runs per process; a webhook
+    arriving mid-drain just adds to the queue.
+    """
+    queue = get_work_queue()
+    if queue is None:
+        return
+    while not _drain_lock.locked():
+        async with _drain_lock:
+            started = time.perf_counter()
+            await run_worker(stop_when_idle=True, queue=queue)
+            print(f"[worker] inline drain finished in {time.perf_counter() - started:.1f}s")
+        # A job enqueued while the drain was winding down saw the lock held and left it to us
+        if await asyncio.to_thread(queue.next_available_in) is None:
+            return